@@ -0,0 +1,185 @@
+# backend/app/domain_cache.py
+"""
+Cache compartido de inteligencia de dominio.
+
+Dos niveles:
+- L1: en proceso (cachetools.TTLCache), acotado en tamaño y con TTL corto.
+- L2: Redis, compartido por todos los workers, con TTL por tipo de señal.
+
+Los valores se codifican con msgpack (fallback a JSON si no está instalado).
+Redis es "best effort": si falla, el cache se degrada a solo L1 durante
+REDIS_RETRY_AFTER segundos en vez de romper la verificación.
+"""
+import os
+import json
+import time
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+from cachetools import TTLCache
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import redis.asyncio as aioredis
+except Exception:
+    aioredis = None
+
+logger = logging.getLogger("domain_cache")
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+KEY_PREFIX = "dc"
+
+# TTL (segundos) en Redis por tipo de señal
+SIGNAL_TTLS = {
+    "mx": 3600,                 # registros MX
+    "probe": 6 * 3600,          # sonda web única (fingerprint + web presence + HTTPS)
+    "infra": 24 * 3600,         # evaluate_domain_infra (WHOIS, SPF, DMARC, HTTPS)
+    "infra_score": 24 * 3600,   # score_domain_infra
+    "catch_all": 7 * 24 * 3600, # veredicto catch-all (caducidad dura; se refresca antes, ver DomainContext)
+    "mx_caps": 24 * 3600,       # puerto / STARTTLS / extensiones EHLO por host MX
+}
+DEFAULT_TTL = 3600
+
+L1_MAXSIZE = int(os.environ.get("DOMAIN_CACHE_L1_SIZE", "20000"))
+L1_MAX_TTL = int(os.environ.get("DOMAIN_CACHE_L1_TTL", "300"))
+REDIS_RETRY_AFTER = 30
+
+_MISSING = object()
+
+
+def _pack(value: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value).encode()
+
+
+def _unpack(raw: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
+class DomainCache:
+    def __init__(self, redis=None, ttls: Optional[dict] = None,
+                 l1_maxsize: int = L1_MAXSIZE, l1_max_ttl: int = L1_MAX_TTL):
+        self.redis = redis
+        self.ttls = {**SIGNAL_TTLS, **(ttls or {})}
+        self.l1_maxsize = l1_maxsize
+        self.l1_max_ttl = l1_max_ttl
+        self._l1: dict[str, TTLCache] = {}
+        self._redis_down_until = 0.0
+        # signal -> {"l1_hits", "l2_hits", "misses"}
+        self.counters = defaultdict(lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0})
+
+    # --------------------------------------------------
+    # Helpers
+    # --------------------------------------------------
+    def ttl_for(self, signal: str) -> int:
+        return self.ttls.get(signal, DEFAULT_TTL)
+
+    def _l1_for(self, signal: str) -> TTLCache:
+        cache = self._l1.get(signal)
+        if cache is None:
+            ttl = min(self.ttl_for(signal), self.l1_max_ttl)
+            cache = self._l1[signal] = TTLCache(maxsize=self.l1_maxsize, ttl=ttl)
+        return cache
+
+    def _redis_key(self, signal: str, key: str) -> str:
+        return f"{KEY_PREFIX}:{signal}:{key}"
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, op: str, exc: Exception):
+        logger.warning("Redis %s failed, using L1 only for %ss: %s", op, REDIS_RETRY_AFTER, exc)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    # --------------------------------------------------
+    # API
+    # --------------------------------------------------
+    async def get(self, signal: str, key: str) -> Any:
+        """
+        Retorna el valor cacheado o _MISSING (usar `DomainCache.is_missing`).
+        None es un valor válido (p.ej. WHOIS sin fecha).
+        """
+        l1 = self._l1_for(signal)
+        value = l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self.counters[signal]["l1_hits"] += 1
+            return value
+
+        if self._redis_available():
+            try:
+                raw = await self.redis.get(self._redis_key(signal, key))
+            except Exception as e:
+                self._redis_failed("GET", e)
+                raw = None
+            if raw is not None:
+                value = _unpack(raw)
+                l1[key] = value
+                self.counters[signal]["l2_hits"] += 1
+                return value
+
+        self.counters[signal]["misses"] += 1
+        return _MISSING
+
+    async def set(self, signal: str, key: str, value: Any, ttl: Optional[int] = None):
+        self._l1_for(signal)[key] = value
+
+        if self._redis_available():
+            try:
+                await self.redis.set(
+                    self._redis_key(signal, key),
+                    _pack(value),
+                    ex=ttl or self.ttl_for(signal),
+                )
+            except Exception as e:
+                self._redis_failed("SET", e)
+
+    async def get_or_compute(self, signal: str, key: str,
+                             factory: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self.get(signal, key)
+        if value is not _MISSING:
+            return value
+
+        value = await factory()
+        await self.set(signal, key, value)
+        return value
+
+    @staticmethod
+    def is_missing(value: Any) -> bool:
+        return value is _MISSING
+
+    def stats(self) -> dict:
+        out = {}
+        for signal, c in self.counters.items():
+            total = c["l1_hits"] + c["l2_hits"] + c["misses"]
+            out[signal] = {
+                **c,
+                "hit_ratio": round((c["l1_hits"] + c["l2_hits"]) / total, 4) if total else 0.0,
+                "l1_size": len(self._l1_for(signal)),
+            }
+        return out
+
+
+# --------------------------------------------------
+# Instancia compartida por proceso
+# --------------------------------------------------
+_domain_cache: Optional[DomainCache] = None
+
+
+def get_domain_cache() -> DomainCache:
+    """
+    Cache del proceso, respaldado por el Redis de REDIS_URL.
+    Sin redis.asyncio instalado funciona solo con L1.
+    """
+    global _domain_cache
+    if _domain_cache is None:
+        client = aioredis.from_url(REDIS_URL) if aioredis is not None else None
+        _domain_cache = DomainCache(redis=client)
+    return _domain_cache
@@ -0,0 +1,163 @@
+# backend/app/greylist_queue.py
+"""
+Cola diferida de reintentos SMTP (greylisting).
+
+Un 450/451 en RCPT TO suele ser greylisting: el servidor acepta el mismo
+intento pasados unos minutos. Reintentar dentro del mismo proceso (sleep)
+bloquea al worker y además llega demasiado pronto. Aquí el email se aparca
+en un sorted set de Redis con score = momento en que toca reintentar, y un
+scheduler del worker recoge los vencidos y los vuelve a verificar.
+
+- GREYLIST_RETRY_DELAYS: espera antes de cada reintento (s); agotados, el
+  último resultado es el definitivo.
+- Por job se lleva un contador de emails pendientes de reintento: el job no
+  se da por terminado hasta que llega a 0.
+- `pop_due` mueve los vencidos (script Lua, atómico) a un sorted set de
+  "en proceso" con score = fin de su lease. Salen de ahí solo cuando el
+  resultado está guardado (`resolve`) o reprogramado (`schedule(claimed=...)`).
+  Si el worker muere o se cancela a mitad, al vencer el lease el reintento
+  vuelve a la cola: nada se pierde y el contador del job llega a 0.
+"""
+import os
+import json
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger("greylist_queue")
+
+GREYLIST_RETRY_KEY = os.environ.get("GREYLIST_RETRY_KEY", "smtp_retry")
+GREYLIST_RETRY_DELAYS = tuple(
+    float(d) for d in os.environ.get("GREYLIST_RETRY_DELAYS", "300,900,1800").split(",") if d.strip()
+)
+GREYLIST_POLL_INTERVAL = float(os.environ.get("GREYLIST_POLL_INTERVAL", "1.0"))
+GREYLIST_POP_BATCH = int(os.environ.get("GREYLIST_POP_BATCH", "500"))
+GREYLIST_LEASE_SECONDS = float(os.environ.get("GREYLIST_LEASE_SECONDS", "600"))
+
+# KEYS: cola, en proceso | ARGV: now, fin del lease, limit
+# 1) leases vencidos -> de vuelta a la cola; 2) vencidos de la cola -> en proceso
+CLAIM_DUE_LUA = """
+local expired = redis.call("ZRANGEBYSCORE", KEYS[2], "-inf", ARGV[1])
+for _, member in ipairs(expired) do
+    redis.call("ZREM", KEYS[2], member)
+    redis.call("ZADD", KEYS[1], ARGV[1], member)
+end
+
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[3]))
+for _, member in ipairs(due) do
+    redis.call("ZREM", KEYS[1], member)
+    redis.call("ZADD", KEYS[2], ARGV[2], member)
+end
+return due
+"""
+
+# KEYS: en proceso | ARGV: member, fin del lease con el que se reclamó
+# Solo lo borra si sigue siendo el mismo lease (no re-reclamado por otro worker)
+RELEASE_LUA = """
+local score = redis.call("ZSCORE", KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    return redis.call("ZREM", KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+def retry_delay(attempt: int, delays=GREYLIST_RETRY_DELAYS) -> Optional[float]:
+    """Espera antes del reintento número `attempt + 1`; None si ya no quedan."""
+    return delays[attempt] if attempt < len(delays) else None
+
+
+class GreylistQueue:
+    def __init__(self, redis, key: str = GREYLIST_RETRY_KEY, delays=GREYLIST_RETRY_DELAYS,
+                 lease: float = GREYLIST_LEASE_SECONDS):
+        self.redis = redis
+        self.key = key
+        self.processing_key = f"{key}:processing"
+        self.delays = tuple(delays)
+        self.lease = lease
+        self._claim = redis.register_script(CLAIM_DUE_LUA)
+        self._release_script = redis.register_script(RELEASE_LUA)
+
+    def can_retry(self, attempt: int) -> bool:
+        return retry_delay(attempt, self.delays) is not None
+
+    def _pending_key(self, job_id) -> str:
+        return f"{self.key}:pending:{job_id}"
+
+    async def schedule(self, job_id, index: int, email: str, attempt: int,
+                       claimed: Optional[dict] = None) -> bool:
+        """
+        Aparca el email para reintentarlo. `attempt` = reintentos ya hechos;
+        `claimed` = el elemento de `pop_due` que se está reintentando (sale
+        de "en proceso" antes de volver a la cola).
+        Retorna False si no quedan reintentos (el resultado actual es el final).
+        """
+        delay = retry_delay(attempt, self.delays)
+        if delay is None:
+            return False
+
+        if claimed is not None and not await self._release(claimed):
+            # Lease vencido y ya re-encolado: lo reprograma quien lo tenga ahora
+            return True
+
+        member = json.dumps({"job_id": job_id, "index": index, "email": email, "attempt": attempt})
+        pipe = self.redis.pipeline()
+        pipe.zadd(self.key, {member: time.time() + delay})
+        if attempt == 0:
+            # Solo la primera vez: los reintentos siguientes ya cuentan como pendientes
+            pipe.incr(self._pending_key(job_id))
+        await pipe.execute()
+        return True
+
+    async def pop_due(self, now: Optional[float] = None, limit: int = GREYLIST_POP_BATCH) -> list[dict]:
+        """
+        Reintentos vencidos, reclamados por este proceso durante `lease` s.
+        Cada elemento lleva `member` (su valor en Redis) y `lease_until` para
+        `schedule`/`resolve`.
+        """
+        now = time.time() if now is None else now
+        deadline = repr(now + self.lease)
+        members = await self._claim(keys=[self.key, self.processing_key], args=[repr(now), deadline, limit])
+
+        items = []
+        for member in members:
+            if isinstance(member, bytes):
+                member = member.decode()
+            item = json.loads(member)
+            item["member"] = member
+            item["lease_until"] = deadline
+            items.append(item)
+        return items
+
+    async def resolve(self, job_id, claimed: Optional[dict] = None) -> int:
+        """
+        Un email del job tiene resultado final (ya guardado); retorna los que
+        quedan pendientes. Con `claimed` lo retira además de "en proceso".
+        """
+        key = self._pending_key(job_id)
+        if claimed is not None and not await self._release(claimed):
+            # Otro worker lo reclamó tras vencer el lease: él descuenta
+            return await self.pending(job_id)
+        remaining = await self.redis.decr(key)
+        if remaining <= 0:
+            await self.redis.delete(key)
+            return 0
+        return remaining
+
+    async def _release(self, claimed: dict) -> bool:
+        """Saca el elemento de "en proceso"; False si ya no era nuestro."""
+        released = await self._release_script(
+            keys=[self.processing_key], args=[claimed["member"], claimed["lease_until"]]
+        )
+        return bool(released)
+
+    async def pending(self, job_id) -> int:
+        value = await self.redis.get(self._pending_key(job_id))
+        return int(value) if value else 0
+
+    async def size(self) -> int:
+        """Reintentos en cola + en proceso."""
+        pipe = self.redis.pipeline()
+        pipe.zcard(self.key)
+        pipe.zcard(self.processing_key)
+        return sum(await pipe.execute())
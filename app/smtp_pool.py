@@ -2,10 +2,16 @@ import smtplib
 import ssl
 import threading
 import time
+import logging
 from contextlib import contextmanager
-from collections import defaultdict, deque
+from collections import deque
+
+logger = logging.getLogger("smtp_pool")
 
 DEFAULT_TIMEOUT = 10
+NOOP_AFTER = 5          # segundos inactiva a partir de los cuales se comprueba con NOOP antes de reusar
+WHEEL_TICK = 1.0        # resolución (s) de la rueda de expiración de conexiones inactivas
+CREATED_WINDOW = 60     # ventana (s) para created_per_second
 
 class SMTPConnection:
     def __init__(self, host, port=25, use_ssl=False, timeout=DEFAULT_TIMEOUT, helo_host="verifier.local"):
@@ -16,6 +22,7 @@ class SMTPConnection:
         self.helo_host = helo_host
         self.lock = threading.Lock()
         self.server = None
+        self.tls = False
         self.last_used = 0
         self._connect()
 
@@ -30,6 +37,7 @@ class SMTPConnection:
             self.server = smtplib.SMTP_SSL(host=self.host, port=self.port, timeout=self.timeout, context=ctx)
         else:
             self.server = smtplib.SMTP(host=self.host, port=self.port, timeout=self.timeout)
+        self.tls = False
         # EHLO
         try:
             self.server.ehlo(name=self.helo_host)
@@ -41,20 +49,40 @@ class SMTPConnection:
         self.last_used = time.time()
 
     def starttls_if_supported(self):
+        # True si la sesión queda cifrada con STARTTLS
+        if self.tls:
+            return True
         try:
             if not isinstance(self.server, smtplib.SMTP_SSL) and self.server.has_extn('starttls'):
                 self.server.starttls(context=ssl.create_default_context())
                 self.server.ehlo(name=self.helo_host)
+                self.tls = True
         except Exception:
             pass
+        return self.tls
 
     def mail_from(self, from_addr):
         # returns (code, msg)
         return self.server.mail(from_addr)
 
+    def esmtp_features(self):
+        return sorted(getattr(self.server, "esmtp_features", None) or {})
+
     def rcpt_to(self, rcpt):
         return self.server.rcpt(rcpt)
 
+    def rset(self):
+        # Limpia la transacción (MAIL FROM / RCPT) sin cerrar la sesión
+        return self.server.rset()
+
+    def noop(self):
+        # Comprobación de vida antes de reusar una conexión del pool
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
     def quit(self):
         try:
             self.server.quit()
@@ -64,60 +92,186 @@ class SMTPConnection:
             except Exception:
                 pass
 
+class _HostPool:
+    """Conexiones de un (host, puerto), con su propio lock."""
+    __slots__ = ("lock", "idle", "in_use")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = deque()     # SMTPConnection libres (la más reciente al final)
+        self.in_use = 0
+
+
 class SMTPPool:
-    def __init__(self, max_per_host=3, idle_timeout=60):
+    """
+    Pool de sesiones SMTP por (host, puerto).
+
+    - Lock por host: un MX lento no bloquea los checkouts de los demás.
+    - El connect + EHLO de una conexión nueva ocurre fuera de cualquier lock.
+    - Antes de reusar una conexión inactiva más de `noop_after` s se manda NOOP.
+    - La expiración por inactividad la hace un hilo con una rueda de timers
+      (un bucket por tick), no un recorrido de todos los hosts en cada checkout.
+    """
+
+    def __init__(self, max_per_host=3, idle_timeout=60, noop_after=NOOP_AFTER, tick=WHEEL_TICK):
         self.max_per_host = max_per_host
         self.idle_timeout = idle_timeout
-        self.pools = defaultdict(deque)  # host -> deque of SMTPConnection
-        self._global_lock = threading.Lock()
+        self.noop_after = noop_after
+        self.tick = tick
+        self.pools = {}                 # (host, port) -> _HostPool
+        self._pools_lock = threading.Lock()
+
+        # Rueda de timers: bucket -> [(key, host_pool, conn, last_used)]
+        self._wheel = [[] for _ in range(max(2, int(idle_timeout / tick) + 2))]
+        self._wheel_lock = threading.Lock()
+        self._wheel_thread = None
+
+        self._created = deque()         # timestamps de creación (ventana CREATED_WINDOW)
+        self.created_total = 0
+        self.evicted_total = 0
+
+    # --------------------------------------------------
+    # Helpers
+    # --------------------------------------------------
+    def _host_pool(self, key):
+        hp = self.pools.get(key)
+        if hp is None:
+            with self._pools_lock:
+                hp = self.pools.get(key)
+                if hp is None:
+                    hp = self.pools[key] = _HostPool()
+        return hp
+
+    def _checkout_idle(self, key, hp):
+        """Conexión libre y viva del host, o None. El NOOP va fuera del lock."""
+        while True:
+            with hp.lock:
+                if not hp.idle:
+                    return None
+                conn = hp.idle.pop()
+                hp.in_use += 1
 
-    def _prune_idle(self):
-        # close idle connections
+            idle_for = time.time() - conn.last_used
+            if idle_for <= self.idle_timeout and (idle_for < self.noop_after or conn.noop()):
+                return conn
+
+            with hp.lock:
+                hp.in_use -= 1
+            conn.quit()
+
+    def _create(self, key, hp, port, use_ssl, timeout, helo_host):
+        with hp.lock:
+            hp.in_use += 1
+        try:
+            conn = SMTPConnection(host=key[0], port=port, use_ssl=use_ssl, timeout=timeout, helo_host=helo_host)
+        except Exception:
+            with hp.lock:
+                hp.in_use -= 1
+            raise
         now = time.time()
-        for host, dq in list(self.pools.items()):
-            newdq = deque()
-            while dq:
-                conn = dq.popleft()
-                if now - conn.last_used > self.idle_timeout:
-                    try:
-                        conn.quit()
-                    except Exception:
-                        pass
-                else:
-                    newdq.append(conn)
-            self.pools[host] = newdq
+        with self._wheel_lock:
+            self._created.append(now)
+            self.created_total += 1
+        return conn
+
+    def _release(self, key, hp, conn, reusable):
+        conn.last_used = time.time()
+        with hp.lock:
+            hp.in_use -= 1
+            keep = reusable and len(hp.idle) < self.max_per_host
+            if keep:
+                hp.idle.append(conn)
+        if keep:
+            self._schedule_expiry(key, hp, conn)
+        else:
+            conn.quit()
+
+    # --------------------------------------------------
+    # Rueda de expiración
+    # --------------------------------------------------
+    def _slot(self, when):
+        return int(when / self.tick) % len(self._wheel)
+
+    def _schedule_expiry(self, key, hp, conn):
+        with self._wheel_lock:
+            self._wheel[self._slot(conn.last_used + self.idle_timeout)].append((key, hp, conn, conn.last_used))
+            if self._wheel_thread is None:
+                self._wheel_thread = threading.Thread(target=self._run_wheel, name="smtp-pool-wheel", daemon=True)
+                self._wheel_thread.start()
 
+    def _run_wheel(self):
+        slot = self._slot(time.time())
+        while True:
+            time.sleep(self.tick)
+            now_slot = self._slot(time.time())
+            while slot != now_slot:
+                slot = (slot + 1) % len(self._wheel)
+                self._expire_slot(slot)
+
+    def _expire_slot(self, slot):
+        with self._wheel_lock:
+            entries, self._wheel[slot] = self._wheel[slot], []
+
+        expired = []
+        for key, hp, conn, stamp in entries:
+            # Se usa el _HostPool de la entrada (no el del dict): si se retiró
+            # mientras alguien aún lo usaba, sus conexiones también expiran
+            with hp.lock:
+                # Entrada obsoleta si la conexión se reusó desde entonces
+                if conn.last_used == stamp and conn in hp.idle:
+                    hp.idle.remove(conn)
+                    expired.append(conn)
+                empty = not hp.idle and not hp.in_use
+            if empty:
+                with self._pools_lock:
+                    if self.pools.get(key) is hp and not hp.idle and not hp.in_use:
+                        del self.pools[key]
+
+        for conn in expired:
+            conn.quit()
+        if expired:
+            logger.debug("evicted %d idle SMTP connections", len(expired))
+            with self._wheel_lock:
+                self.evicted_total += len(expired)
+
+    # --------------------------------------------------
+    # API
+    # --------------------------------------------------
     @contextmanager
     def get_connection(self, host, port=25, use_ssl=False, timeout=DEFAULT_TIMEOUT, helo_host="verifier.local"):
-        self._prune_idle()
-        dq = self.pools[host]
-        conn = None
-        # acquire or create
-        with self._global_lock:
-            while dq:
-                candidate = dq.popleft()
-                # test liveness
-                try:
-                    if time.time() - candidate.last_used > self.idle_timeout:
-                        candidate.quit()
-                        continue
-                    conn = candidate
-                    break
-                except Exception:
-                    continue
-            if conn is None:
-                conn = SMTPConnection(host=host, port=port, use_ssl=use_ssl, timeout=timeout, helo_host=helo_host)
+        key = (host, port)
+        hp = self._host_pool(key)
+        conn = self._checkout_idle(key, hp)
+        if conn is None:
+            conn = self._create(key, hp, port, use_ssl, timeout, helo_host)
+
+        reusable = False
         try:
             yield conn
+            reusable = True
         finally:
-            conn.last_used = time.time()
-            # return to pool if under limit
-            with self._global_lock:
-                dq = self.pools[host]
-                if len(dq) < self.max_per_host:
-                    dq.append(conn)
-                else:
-                    try:
-                        conn.quit()
-                    except Exception:
-                        pass
+            # Una conexión que falló a mitad de uso no vuelve al pool
+            self._release(key, hp, conn, reusable)
+
+    def stats(self) -> dict:
+        idle = in_use = 0
+        for hp in list(self.pools.values()):
+            with hp.lock:
+                idle += len(hp.idle)
+                in_use += hp.in_use
+
+        cutoff = time.time() - CREATED_WINDOW
+        with self._wheel_lock:
+            while self._created and self._created[0] < cutoff:
+                self._created.popleft()
+            recent = len(self._created)
+
+        return {
+            "hosts": len(self.pools),
+            "open": idle + in_use,
+            "idle": idle,
+            "in_use": in_use,
+            "created_total": self.created_total,
+            "created_per_second": round(recent / CREATED_WINDOW, 3),
+            "evicted_total": self.evicted_total,
+        }
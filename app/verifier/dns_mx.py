@@ -1,12 +1,27 @@
 # backend/app/verifier/dns_mx.py
 
+import time
+import asyncio
+
+import dns.asyncresolver
 import dns.resolver
 import dns.exception
 import dns.name
 import logging
+from cachetools import LRUCache
 
 logger = logging.getLogger("dns_mx")
 
+# --------------------------------------------------
+# Parámetros del resolver async / cache
+# --------------------------------------------------
+DNS_LIFETIME = 4.0
+DNS_CACHE_SIZE = 100_000
+MIN_TTL = 30            # nunca cachear respuestas positivas menos de esto
+MAX_TTL = 6 * 3600      # ni más que esto, aunque el TTL del registro sea mayor
+NXDOMAIN_TTL = 300      # dominio inexistente (typos, dominios muertos)
+NOANSWER_TTL = 120      # dominio existe pero no tiene ese tipo de registro
+
 
 class MXRecord:
     def __init__(self, host: str, priority: int = 0):
@@ -18,6 +33,10 @@ class MXLookupError(Exception):
     pass
 
 
+class ParkedMXError(MXLookupError):
+    """El dominio publica MX de parking / basura (ver PARKING_KEYWORDS)."""
+
+
 PARKING_KEYWORDS = [
     "example.com",
     "invalid",
@@ -50,7 +69,7 @@ def get_mx_records(domain: str) -> list[MXRecord]:
         for record in mx_records:
             for parking in PARKING_KEYWORDS:
                 if parking in record.host:
-                    raise MXLookupError(f"MX sospechoso/parking: {record.host}")
+                    raise ParkedMXError(f"MX sospechoso/parking: {record.host}")
 
         return mx_records
 
@@ -65,16 +84,140 @@ def get_mx_records(domain: str) -> list[MXRecord]:
 
 
 # ---------------------------------------------------------
-# resolve_mx — Wrapper estándar para verify_engine
+# Resolver async con cache positivo / negativo
+# ---------------------------------------------------------
+class DNSResult:
+    """
+    status: "ok" | "nxdomain" | "noanswer"
+    records: valores ya convertidos a tipos python
+      - MX  -> [(priority, host), ...]
+      - TXT -> ["v=spf1 ...", ...]
+      - A / AAAA / otros -> ["1.2.3.4", ...]
+    """
+    __slots__ = ("status", "records", "expires_at")
+
+    def __init__(self, status: str, records: list, ttl: float):
+        self.status = status
+        self.records = records
+        self.expires_at = time.monotonic() + ttl
+
+    def remaining_ttl(self) -> int:
+        """Segundos de validez que le quedan (>= 1, apto para `EX` de Redis)."""
+        return max(1, int(self.expires_at - time.monotonic()))
+
+
+_dns_cache: LRUCache = LRUCache(maxsize=DNS_CACHE_SIZE)
+_inflight: dict[tuple[str, str], asyncio.Future] = {}
+_async_resolver = None
+
+
+def _get_async_resolver():
+    global _async_resolver
+    if _async_resolver is None:
+        _async_resolver = dns.asyncresolver.Resolver()
+        _async_resolver.lifetime = DNS_LIFETIME
+    return _async_resolver
+
+
+def _convert_rdata(rdtype: str, rdata):
+    if rdtype == "MX":
+        return (int(rdata.preference), str(rdata.exchange).rstrip("."))
+    if rdtype == "TXT":
+        return "".join(
+            part.decode(errors="ignore") if isinstance(part, bytes) else part
+            for part in rdata.strings
+        )
+    return rdata.to_text()
+
+
+async def _query(name: str, rdtype: str) -> DNSResult:
+    try:
+        answer = await _get_async_resolver().resolve(name, rdtype, lifetime=DNS_LIFETIME)
+    except dns.resolver.NXDOMAIN:
+        return DNSResult("nxdomain", [], NXDOMAIN_TTL)
+    except dns.resolver.NoAnswer:
+        return DNSResult("noanswer", [], NOANSWER_TTL)
+
+    ttl = answer.rrset.ttl if answer.rrset is not None else MIN_TTL
+    ttl = max(MIN_TTL, min(MAX_TTL, ttl))
+    return DNSResult("ok", [_convert_rdata(rdtype, r) for r in answer], ttl)
+
+
+async def resolve_records(name: str, rdtype: str) -> DNSResult:
+    """
+    Consulta DNS async con cache en proceso:
+    - respuestas positivas respetan el TTL del registro (acotado a MIN_TTL..MAX_TTL)
+    - NXDOMAIN y NoAnswer se cachean aparte, con TTL negativo corto
+    - timeouts / SERVFAIL NUNCA se cachean: la excepción se propaga
+    - consultas concurrentes al mismo (name, rdtype) comparten la misma petición
+    """
+    key = (name.lower().rstrip("."), rdtype)
+
+    cached = _dns_cache.get(key)
+    if cached is not None:
+        if cached.expires_at > time.monotonic():
+            return cached
+        _dns_cache.pop(key, None)
+
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(_query(name, rdtype))
+        _inflight[key] = fut
+
+        def _done(f: asyncio.Future, key=key):
+            _inflight.pop(key, None)
+            if not f.cancelled() and f.exception() is None:
+                _dns_cache[key] = f.result()
+
+        fut.add_done_callback(_done)
+
+    return await asyncio.shield(fut)
+
+
+def clear_dns_cache():
+    _dns_cache.clear()
+
+
+# ---------------------------------------------------------
+# resolve_mx — versión async estándar para verify_engine
 # ---------------------------------------------------------
 async def resolve_mx(domain: str) -> list[MXRecord]:
     """
-    Wrapper async para mantener compatibilidad con verify_engine.
+    Igual contrato que get_mx_records, pero async y cacheado por TTL:
+    [] si el dominio no existe o no tiene MX, MXLookupError en timeout / parking.
     """
+    records, _ = await resolve_mx_result(domain)
+    return records
+
+
+async def resolve_mx_result(domain: str) -> tuple[list[MXRecord], DNSResult]:
+    """
+    Igual que resolve_mx, pero retorna también el DNSResult (status + TTL) para
+    que los caches de nivel superior no sobrevivan al TTL del registro.
+    """
+    if not domain or "." not in domain:
+        raise MXLookupError(f"Dominio inválido: {domain}")
+
     try:
-        return get_mx_records(domain)
-    except MXLookupError as e:
+        normalized = dns.name.from_text(domain).to_text()
+        result = await resolve_records(normalized, "MX")
+    except dns.exception.Timeout:
+        logger.error(f"MX lookup error for {domain}: timeout")
+        raise MXLookupError(f"Timeout consultando MX de {domain}")
+    except Exception as e:
         logger.error(f"MX lookup error for {domain}: {e}")
-        raise
+        raise MXLookupError(f"Error inesperado MX lookup: {e}")
+
+    mx_records = sorted(
+        (MXRecord(host=host, priority=priority) for priority, host in result.records),
+        key=lambda x: x.priority,
+    )
 
+    # Detectar MX basura / parking
+    for record in mx_records:
+        for parking in PARKING_KEYWORDS:
+            if parking in record.host:
+                logger.error(f"MX lookup error for {domain}: parking MX {record.host}")
+                raise ParkedMXError(f"MX sospechoso/parking: {record.host}")
 
+    return mx_records, result
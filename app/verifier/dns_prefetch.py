@@ -0,0 +1,92 @@
+# backend/app/verifier/dns_prefetch.py
+
+"""
+Prefetch DNS masivo al inicio de un job
+---------------------------------------
+Antes de cualquier trabajo SMTP se resuelven, en un único fan-out concurrente,
+los MX (y opcionalmente A / TXT / _dmarc TXT) de todos los dominios distintos
+del job. Las respuestas quedan en el cache de dns_mx, así que la verificación
+por email encuentra todo "caliente".
+
+Además permite cerrar en bloque los dominios sin MX o con MX de parking.
+"""
+
+import os
+import asyncio
+import logging
+
+from app.verifier.dns_mx import resolve_mx, resolve_records, MXLookupError, ParkedMXError, MXRecord
+
+logger = logging.getLogger("dns_prefetch")
+
+DNS_PREFETCH_CONCURRENCY = int(os.environ.get("DNS_PREFETCH_CONCURRENCY", "200"))
+# Registros extra a precargar: "A", "TXT" (SPF) y/o "DMARC" (TXT en _dmarc.<dominio>)
+DNS_PREFETCH_EXTRA = tuple(
+    r.strip().upper() for r in os.environ.get("DNS_PREFETCH_EXTRA", "").split(",") if r.strip()
+)
+
+
+class DomainDNS:
+    """
+    status:
+      - "ok":      tiene MX utilizables
+      - "no_mx":   NXDOMAIN / sin MX
+      - "parked":  MX de parking (dns_mx.PARKING_KEYWORDS)
+      - "error":   timeout u otro error transitorio (se reintentará por email)
+    """
+    __slots__ = ("domain", "status", "mx_records")
+
+    def __init__(self, domain: str, status: str, mx_records: list[MXRecord] = None):
+        self.domain = domain
+        self.status = status
+        self.mx_records = mx_records or []
+
+    @property
+    def is_dead(self) -> bool:
+        return self.status in ("no_mx", "parked")
+
+
+async def _warm(name: str, rdtype: str):
+    try:
+        await resolve_records(name, rdtype)
+    except Exception as e:
+        logger.debug(f"Prefetch {rdtype} {name} failed: {e}")
+
+
+async def _prefetch_one(domain: str, extra: tuple) -> DomainDNS:
+    warmers = [
+        _warm(f"_dmarc.{domain}", "TXT") if rtype == "DMARC" else _warm(domain, rtype)
+        for rtype in extra
+    ]
+    mx_res, *_ = await asyncio.gather(resolve_mx(domain), *warmers, return_exceptions=True)
+
+    if isinstance(mx_res, ParkedMXError):
+        return DomainDNS(domain, "parked")
+    if isinstance(mx_res, MXLookupError):
+        return DomainDNS(domain, "error")
+    if isinstance(mx_res, BaseException):
+        raise mx_res
+
+    return DomainDNS(domain, "ok" if mx_res else "no_mx", mx_res)
+
+
+async def prefetch_domains(domains, concurrency: int = DNS_PREFETCH_CONCURRENCY,
+                           extra: tuple = DNS_PREFETCH_EXTRA) -> dict[str, DomainDNS]:
+    """
+    Resuelve todos los dominios (deduplicados) con como máximo `concurrency`
+    consultas en vuelo. Retorna dominio -> DomainDNS.
+    """
+    unique = sorted({d.lower() for d in domains if d})
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(domain: str) -> DomainDNS:
+        async with sem:
+            return await _prefetch_one(domain, extra)
+
+    results = await asyncio.gather(*(run(d) for d in unique))
+    summary = {}
+    for r in results:
+        summary[r.status] = summary.get(r.status, 0) + 1
+    logger.info("DNS prefetch: %d domains %s", len(unique), summary)
+
+    return {r.domain: r for r in results}
@@ -0,0 +1,265 @@
+# backend/app/verifier/domain_context.py
+
+"""
+Contexto de dominio (scope: un job / un verify_batch)
+----------------------------------------------------
+Las señales a nivel DOMINIO (MX, clasificación, sonda web) son iguales
+para todos los emails del mismo dominio. Este contexto las calcula una sola
+vez por dominio y las comparte entre todos los emails del job.
+
+- Llamadas concurrentes para el mismo dominio esperan la MISMA tarea en vuelo.
+- Si el cálculo falla, la excepción llega a quienes estaban esperando, pero no
+  se memoiza: el siguiente llamador vuelve a intentarlo.
+- Con un DomainCache (app.domain_cache) las señales se leen/escriben además en
+  el cache compartido entre workers, con TTL por señal.
+- El veredicto catch-all es propiedad del dominio: se guarda con fecha de
+  comprobación y, pasado CATCH_ALL_FRESH_TTL, se sigue usando mientras se
+  refresca en segundo plano (stale-while-revalidate).
+- Las capacidades SMTP aprendidas por host MX (puerto, STARTTLS, EHLO) se
+  guardan igual, con clave el host MX en vez del dominio (mx_capabilities).
+- La salud por host MX (latencia, errores, circuito) es de proceso
+  (mx_health.get_mx_health) salvo que se pase otra instancia.
+- Con un RcptBatcher los RCPT TO del mismo dominio se agrupan en sesiones
+  SMTP compartidas (ver rcpt_batcher).
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from app.domain_cache import DomainCache
+from app.verifier.dns_mx import resolve_mx_result, MXRecord
+from app.verifier.domain_classifier import classify_domain
+from app.verifier.domain_infra import evaluate_domain_infra_async
+from app.verifier.domain_infra_score import score_domain_infra
+from app.verifier.domain_probe import DomainProbe, probe_domain
+from app.verifier.mx_capabilities import MXCapabilities, capabilities_from_result
+from app.verifier.mx_health import MXHealth, get_mx_health
+from app.verifier.rcpt_batcher import probe_catch_all
+from app.verifier.web_fingerprint import fingerprint_from_probe
+
+logger = logging.getLogger("domain_context")
+
+# Infra incompleta (alguna señal no llegó a tiempo): cachear poco para completarla pronto
+PARTIAL_INFRA_TTL = 300
+
+# Edad a partir de la cual el veredicto catch-all se refresca en segundo plano
+CATCH_ALL_FRESH_TTL = int(os.environ.get("CATCH_ALL_FRESH_TTL", str(24 * 3600)))
+# Al cerrar el contexto: espera máxima a tareas en vuelo (p.ej. refrescos catch-all)
+CONTEXT_CLOSE_TIMEOUT = float(os.environ.get("DOMAIN_CONTEXT_CLOSE_TIMEOUT", "5"))
+
+
+class DomainContext:
+    def __init__(self, cache: Optional[DomainCache] = None, rcpt_batcher=None,
+                 mx_health: Optional[MXHealth] = None):
+        self.cache = cache
+        self.rcpt_batcher = rcpt_batcher
+        self.mx_health = mx_health if mx_health is not None else get_mx_health()
+        self._tasks: dict[tuple[str, str], asyncio.Future] = {}
+        # dominio -> {"catch_all": bool, "checked_at": epoch}
+        self._catch_all: dict[str, dict] = {}
+        # host MX -> MXCapabilities
+        self._mx_caps: dict[str, MXCapabilities] = {}
+
+    # --------------------------------------------------
+    # Memoización de tareas en vuelo
+    # --------------------------------------------------
+    async def _memo(self, signal: str, domain: str, factory: Callable[[], Awaitable]):
+        key = (signal, domain.lower())
+        task = self._tasks.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+
+            def _forget_failures(t: asyncio.Future, key=key):
+                if t.cancelled() or t.exception() is not None:
+                    if self._tasks.get(key) is t:
+                        del self._tasks[key]
+
+            task.add_done_callback(_forget_failures)
+
+        # shield: si un email se cancela, la tarea compartida sigue viva
+        return await asyncio.shield(task)
+
+    async def _cached(self, signal: str, domain: str, factory: Callable[[], Awaitable],
+                      encode: Callable[[Any], Any] = None, decode: Callable[[Any], Any] = None,
+                      ttl: Callable[[Any], Optional[int]] = None):
+        """
+        Igual que _memo, pero pasando por el cache compartido si existe.
+        encode/decode convierten el valor a tipos serializables (msgpack).
+        ttl(value) permite acortar el TTL según el valor (p.ej. respuestas negativas).
+        """
+        if self.cache is None:
+            return await self._memo(signal, domain, factory)
+
+        async def through_cache():
+            key = domain.lower()
+            cached = await self.cache.get(signal, key)
+            if not DomainCache.is_missing(cached):
+                return decode(cached) if decode else cached
+            value = await factory()
+            await self.cache.set(
+                signal, key,
+                encode(value) if encode else value,
+                ttl=ttl(value) if ttl else None,
+            )
+            return value
+
+        return await self._memo(signal, domain, through_cache)
+
+    # --------------------------------------------------
+    # Señales de dominio
+    # --------------------------------------------------
+    async def mx(self, domain: str) -> list[MXRecord]:
+        # El TTL en el cache compartido sale de la respuesta DNS: nunca más que
+        # el TTL del registro, y NXDOMAIN / NoAnswer con su TTL negativo propio
+        answer = {}
+
+        async def lookup():
+            records, answer["dns"] = await resolve_mx_result(domain)
+            return records
+
+        def ttl(records):
+            if "dns" not in answer:
+                return None
+            return min(answer["dns"].remaining_ttl(), self.cache.ttl_for("mx"))
+
+        return await self._cached(
+            "mx", domain, lookup,
+            encode=lambda records: [[r.host, r.priority] for r in records],
+            decode=lambda rows: [MXRecord(host=h, priority=p) for h, p in rows],
+            ttl=ttl,
+        )
+
+    async def classification(self, domain: str) -> dict:
+        async def compute():
+            return classify_domain(domain, await self.mx(domain))
+
+        return await self._memo("classification", domain, compute)
+
+    async def probe(self, domain: str) -> DomainProbe:
+        """Sonda web única: alimenta tanto el fingerprint como domain_infra."""
+        return await self._cached(
+            "probe", domain, lambda: probe_domain(domain),
+            encode=DomainProbe.to_dict,
+            decode=DomainProbe.from_dict,
+        )
+
+    async def web(self, domain: str) -> dict:
+        return fingerprint_from_probe(await self.probe(domain))
+
+    async def infra(self, domain: str) -> dict:
+        # Señales en paralelo con deadline; la sonda web se comparte con web()
+        return await self._cached(
+            "infra", domain,
+            lambda: evaluate_domain_infra_async(domain, probe_factory=lambda: self.probe(domain)),
+            ttl=lambda infra: PARTIAL_INFRA_TTL if infra.get("missing") else None,
+        )
+
+    async def infra_score(self, domain: str) -> dict:
+        async def compute():
+            return score_domain_infra(await self.infra(domain))
+
+        return await self._cached(
+            "infra_score", domain, compute,
+            ttl=lambda score: PARTIAL_INFRA_TTL if score.get("infra_missing") else None,
+        )
+
+    # --------------------------------------------------
+    # Catch-all (veredicto por dominio, stale-while-revalidate)
+    # --------------------------------------------------
+    async def catch_all(self, domain: str) -> Optional[bool]:
+        """
+        Veredicto catch-all conocido del dominio o None si no se conoce.
+        Un veredicto vencido se devuelve igual y se refresca en segundo plano.
+        """
+        key = domain.lower()
+        entry = self._catch_all.get(key)
+
+        if entry is None and self.cache is not None:
+            cached = await self.cache.get("catch_all", key)
+            if not DomainCache.is_missing(cached):
+                entry = self._catch_all[key] = cached
+
+        if entry is None:
+            return None
+
+        if time.time() - entry["checked_at"] > CATCH_ALL_FRESH_TTL:
+            self._refresh_catch_all(key)
+
+        return entry["catch_all"]
+
+    async def record_catch_all(self, domain: str, verdict: bool):
+        key = domain.lower()
+        entry = self._catch_all.get(key)
+        if entry is not None and entry["catch_all"] == verdict \
+                and time.time() - entry["checked_at"] <= CATCH_ALL_FRESH_TTL:
+            return
+
+        entry = self._catch_all[key] = {"catch_all": bool(verdict), "checked_at": time.time()}
+        if self.cache is not None:
+            await self.cache.set("catch_all", key, entry)
+
+    def _refresh_catch_all(self, key: str):
+        # Una sola revalidación por dominio y contexto
+        if ("catch_all_refresh", key) in self._tasks:
+            return
+
+        async def refresh():
+            try:
+                records = await self.mx(key)
+                if not records:
+                    return
+                verdict = await probe_catch_all(key, records[0].host)
+                if verdict is not None:
+                    await self.record_catch_all(key, verdict)
+            except Exception as e:
+                logger.debug(f"Catch-all refresh failed for {key}: {e}")
+
+        self._tasks[("catch_all_refresh", key)] = asyncio.ensure_future(refresh())
+
+    # --------------------------------------------------
+    # Cierre
+    # --------------------------------------------------
+    async def aclose(self, timeout: float = CONTEXT_CLOSE_TIMEOUT):
+        """
+        Espera hasta `timeout` s a las tareas aún en vuelo (refrescos catch-all
+        en segundo plano, señales sin esperas) y cancela las que no terminen:
+        ninguna sobrevive al batch/job que creó el contexto.
+        """
+        pending = [t for t in self._tasks.values() if not t.done()]
+        if not pending:
+            return
+        _, still_pending = await asyncio.wait(pending, timeout=timeout)
+        for task in still_pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    # --------------------------------------------------
+    # Capacidades SMTP por host MX
+    # --------------------------------------------------
+    async def mx_capabilities(self, mx_host: str) -> Optional[MXCapabilities]:
+        key = mx_host.lower()
+        caps = self._mx_caps.get(key)
+
+        if caps is None and self.cache is not None:
+            cached = await self.cache.get("mx_caps", key)
+            if not DomainCache.is_missing(cached):
+                caps = self._mx_caps[key] = MXCapabilities.from_dict(cached)
+
+        return caps
+
+    async def record_mx_capabilities(self, smtp_res):
+        """Aprende del resultado de una sesión SMTP (no hace nada si ningún puerto respondió)."""
+        key = smtp_res.mx_host.lower()
+        previous = self._mx_caps.get(key)
+        caps = capabilities_from_result(smtp_res, previous)
+        if caps is None or caps == previous:
+            return
+
+        self._mx_caps[key] = caps
+        if self.cache is not None:
+            await self.cache.set("mx_caps", key, caps.to_dict())
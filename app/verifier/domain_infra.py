@@ -12,12 +12,19 @@ Objetivo:
 - Base para scoring tipo MyEmailVerification / Clearout
 """
 
+import os
 import socket
 import ssl
+import asyncio
+import threading
 import datetime
 import logging
 import requests
 import dns.resolver
+from concurrent.futures import ThreadPoolExecutor
+
+from app.verifier.dns_mx import resolve_records
+from app.verifier.whois_store import get_whois_store
 
 try:
     import whois
@@ -30,6 +37,24 @@ logger = logging.getLogger("domain_infra")
 # WHOIS – antigüedad del dominio
 # --------------------------------------------------
 def get_domain_age_days(domain: str) -> int | None:
+    """
+    Primero el store local de fechas de creación (whois_store); si no está,
+    WHOIS en vivo y se guarda el resultado para las próximas veces (también
+    "sin fecha", con TTL corto).
+    """
+    today = datetime.datetime.utcnow().date()
+    store = get_whois_store()
+
+    if store is not None:
+        try:
+            created = store.get_creation_date(domain)
+            if created is not None:
+                return (today - created).days
+            if store.has_recent_no_date(domain):
+                return None
+        except Exception as e:
+            logger.debug(f"WHOIS store read failed for {domain}: {e}")
+
     if not whois:
         return None
 
@@ -40,10 +65,24 @@ def get_domain_age_days(domain: str) -> int | None:
         if isinstance(created, list):
             created = created[0]
 
+        if isinstance(created, datetime.datetime):
+            created = created.date()
+
         if not isinstance(created, datetime.date):
+            if store is not None:
+                try:
+                    store.put_no_date(domain)
+                except Exception as e:
+                    logger.debug(f"WHOIS store write failed for {domain}: {e}")
             return None
 
-        return (datetime.datetime.utcnow().date() - created).days
+        if store is not None:
+            try:
+                store.put(domain, created)
+            except Exception as e:
+                logger.debug(f"WHOIS store write failed for {domain}: {e}")
+
+        return (today - created).days
 
     except Exception as e:
         logger.debug(f"WHOIS failed for {domain}: {e}")
@@ -80,33 +119,56 @@ def has_dmarc(domain: str) -> bool:
 # --------------------------------------------------
 # Web presence / parking detection (light)
 # --------------------------------------------------
+WEB_PARKING_KEYWORDS = [
+    "buy this domain",
+    "domain for sale",
+    "parking",
+    "sedo",
+    "afternic",
+    "godaddy cashparking",
+]
+
+
+def _classify_web(status: int, text: str) -> str | None:
+    """ "parking" | "active" | None (respuesta no concluyente) """
+    if status >= 500:
+        return None
+
+    if any(x in text for x in WEB_PARKING_KEYWORDS):
+        return "parking"
+
+    if status in (200, 301, 302) and len(text.strip()) > 200:
+        return "active"
+
+    return None
+
+
 def check_web_presence(domain: str) -> str:
     urls = [f"https://{domain}", f"http://{domain}"]
 
     for url in urls:
         try:
             r = requests.get(url, timeout=4, allow_redirects=True)
-            status = r.status_code
-            text = (r.text or "").lower()
+            web = _classify_web(r.status_code, (r.text or "").lower())
+            if web:
+                return web
 
-            if status >= 500:
-                continue
+        except Exception:
+            continue
 
-            if any(x in text for x in [
-                "buy this domain",
-                "domain for sale",
-                "parking",
-                "sedo",
-                "afternic",
-                "godaddy cashparking",
-            ]):
-                return "parking"
+    return "none"
 
-            if status in (200, 301, 302) and len(text.strip()) > 200:
-                return "active"
 
-        except Exception:
-            continue
+def web_status_from_probe(probe) -> str:
+    """ "active" | "parking" | "none" a partir de una DomainProbe (domain_probe). """
+    if probe.http_status is None or probe.http_status >= 500:
+        return "none"
+
+    if any(k in probe.parking_hits for k in WEB_PARKING_KEYWORDS):
+        return "parking"
+
+    if probe.http_status in (200, 301, 302) and probe.text_length > 200:
+        return "active"
 
     return "none"
 
@@ -123,15 +185,37 @@ def has_valid_https(domain: str) -> bool:
     except Exception:
         return False
 
+
+async def has_valid_https_async(domain: str, timeout: float = 3) -> bool:
+    """Igual que has_valid_https (handshake TLS verificado en :443), sin bloquear el loop."""
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(domain, 443, ssl=ssl.create_default_context(), server_hostname=domain),
+            timeout,
+        )
+        return True
+    except Exception:
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+
 # --------------------------------------------------
 # MASTER – evaluación completa de infraestructura
 # --------------------------------------------------
-def evaluate_domain_infra(domain: str) -> dict:
+def evaluate_domain_infra(domain: str, web_status: str | None = None,
+                          https_ok: bool | None = None) -> dict:
+    """
+    `web_status` / `https_ok` permiten pasar señales ya calculadas por la
+    sonda única del dominio (domain_probe) y evitar las conexiones bloqueantes.
+    """
     age_days = get_domain_age_days(domain)
     spf = has_spf(domain)
     dmarc = has_dmarc(domain)
-    web = check_web_presence(domain)
-    https_ok = has_valid_https(domain)
+    web = web_status if web_status is not None else check_web_presence(domain)
+    if https_ok is None:
+        https_ok = has_valid_https(domain)
 
     return {
         "domain": domain,
@@ -142,6 +226,113 @@ def evaluate_domain_infra(domain: str) -> dict:
         "https": https_ok,
     }
 
+# --------------------------------------------------
+# MASTER async – señales en paralelo con deadline
+# --------------------------------------------------
+INFRA_DEADLINE = float(os.environ.get("INFRA_DEADLINE", "4.0"))
+# WHOIS bloqueante en un pool propio y acotado: un lookup que agota su deadline
+# sigue ocupando su hilo hasta terminar, pero no el executor por defecto del
+# loop (compartido con DNS, HTTP y SMTP)
+WHOIS_THREADS = int(os.environ.get("WHOIS_THREADS", "8"))
+# Deadline individual por señal (acotado además por INFRA_DEADLINE)
+SIGNAL_DEADLINES = {
+    "domain_age_days": 4.0,   # WHOIS: la más lenta
+    "has_spf": 2.0,
+    "has_dmarc": 2.0,
+    "web": 4.0,               # web_status + https (una sola sonda)
+}
+
+
+_whois_executor: ThreadPoolExecutor | None = None
+_whois_executor_lock = threading.Lock()
+
+
+def _get_whois_executor() -> ThreadPoolExecutor:
+    global _whois_executor
+    if _whois_executor is None:
+        with _whois_executor_lock:
+            if _whois_executor is None:
+                _whois_executor = ThreadPoolExecutor(max_workers=WHOIS_THREADS, thread_name_prefix="whois")
+    return _whois_executor
+
+
+async def get_domain_age_days_async(domain: str) -> int | None:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_whois_executor(), get_domain_age_days, domain)
+
+
+def _txt_starts_with(records: list, prefix: str) -> bool:
+    return any(txt.lower().startswith(prefix) for txt in records)
+
+
+async def has_spf_async(domain: str) -> bool:
+    result = await resolve_records(domain, "TXT")
+    return _txt_starts_with(result.records, "v=spf1")
+
+
+async def has_dmarc_async(domain: str) -> bool:
+    result = await resolve_records(f"_dmarc.{domain}", "TXT")
+    return _txt_starts_with(result.records, "v=dmarc1")
+
+
+async def evaluate_domain_infra_async(domain: str, deadline: float = INFRA_DEADLINE,
+                                      probe_factory=None) -> dict:
+    """
+    Igual contrato que evaluate_domain_infra, pero WHOIS, SPF, DMARC y la
+    sonda web (web_status + https) corren a la vez bajo un único deadline.
+
+    Las señales que no llegan a tiempo (o fallan) quedan en None y se listan
+    en "missing"; score_domain_infra puntúa solo lo que llegó.
+    `probe_factory` permite reutilizar una DomainProbe ya en vuelo / cacheada.
+    """
+    if probe_factory is None:
+        from app.verifier.domain_probe import probe_domain
+        probe_factory = lambda: probe_domain(domain)
+
+    async def web_signals():
+        probe = await probe_factory()
+        return web_status_from_probe(probe), probe.https_valid
+
+    coros = {
+        "domain_age_days": get_domain_age_days_async(domain),
+        "has_spf": has_spf_async(domain),
+        "has_dmarc": has_dmarc_async(domain),
+        "web": web_signals(),
+    }
+    tasks = {
+        asyncio.ensure_future(asyncio.wait_for(coro, min(SIGNAL_DEADLINES[name], deadline))): name
+        for name, coro in coros.items()
+    }
+
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    values = {}
+    missing = []
+    for task, name in tasks.items():
+        if task in done and not task.cancelled() and task.exception() is None:
+            values[name] = task.result()
+        else:
+            missing.append(name)
+            if task in done and not task.cancelled():
+                logger.debug(f"Infra signal {name} failed for {domain}: {task.exception()!r}")
+
+    web_status, https_ok = values.get("web", (None, None))
+    if "web" in missing:
+        missing.remove("web")
+        missing += ["web_status", "https"]
+
+    return {
+        "domain": domain,
+        "domain_age_days": values.get("domain_age_days"),
+        "has_spf": values.get("has_spf"),
+        "has_dmarc": values.get("has_dmarc"),
+        "web_status": web_status,  # active | parking | none | None (missing)
+        "https": https_ok,
+        "missing": missing,
+    }
+
 # --------------------------------------------------
 # Helper para verify_engine.py
 # --------------------------------------------------
@@ -46,6 +46,8 @@ BASE_SCORE = 50
 def score_domain_infra(infra: Dict) -> Dict:
     score = BASE_SCORE
     reasons = []
+    # Señales que no llegaron a tiempo (evaluate_domain_infra_async): no suman ni restan
+    missing = set(infra.get("missing") or ())
 
     age = infra.get("domain_age_days")
 
@@ -66,7 +68,9 @@ def score_domain_infra(infra: Dict) -> Dict:
     # -------------------------------
     # SPF
     # -------------------------------
-    if infra.get("has_spf"):
+    if "has_spf" in missing:
+        reasons.append("SPF not checked")
+    elif infra.get("has_spf"):
         score += WEIGHTS["has_spf"]
         reasons.append("SPF configured")
     else:
@@ -76,7 +80,9 @@ def score_domain_infra(infra: Dict) -> Dict:
     # -------------------------------
     # DMARC
     # -------------------------------
-    if infra.get("has_dmarc"):
+    if "has_dmarc" in missing:
+        reasons.append("DMARC not checked")
+    elif infra.get("has_dmarc"):
         score += WEIGHTS["has_dmarc"]
         reasons.append("DMARC configured")
     else:
@@ -87,7 +93,9 @@ def score_domain_infra(infra: Dict) -> Dict:
     # Web presence
     # -------------------------------
     web = infra.get("web_status")
-    if web == "active":
+    if "web_status" in missing:
+        reasons.append("Website not checked")
+    elif web == "active":
         score += WEIGHTS["web_active"]
         reasons.append("Active website")
     elif web == "parking":
@@ -100,7 +108,9 @@ def score_domain_infra(infra: Dict) -> Dict:
     # -------------------------------
     # HTTPS
     # -------------------------------
-    if infra.get("https"):
+    if "https" in missing:
+        reasons.append("HTTPS not checked")
+    elif infra.get("https"):
         score += WEIGHTS["https"]
         reasons.append("HTTPS enabled")
     else:
@@ -114,4 +124,5 @@ def score_domain_infra(infra: Dict) -> Dict:
         "domain": infra.get("domain"),
         "infra_score": score,
         "infra_reasons": reasons,
+        "infra_missing": sorted(missing),
     }
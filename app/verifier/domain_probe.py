@@ -0,0 +1,106 @@
+# backend/app/verifier/domain_probe.py
+
+"""
+Sonda web única por dominio
+---------------------------
+web_fingerprint (title, meta, favicon, parking) y domain_infra (web presence,
+HTTPS válido) necesitan la misma información del sitio. En vez de abrir hasta
+5 conexiones (2 fetch del fingerprint, 2 de check_web_presence y un handshake
+TLS suelto en has_valid_https), se hace UN solo fetch TLS-aware en carrera
+https/http y se derivan todas las señales de esa respuesta.
+
+- https_valid: aiohttp verifica el certificado, así que una respuesta por
+  https (o un redirect final a https) con status < 500 implica TLS válido.
+  La carrera cancela https si http gana antes: solo en ese caso (sin
+  respuesta https útil) se hace después un handshake TLS suelto
+  (has_valid_https_async). Con https ganador no hay conexión extra.
+- parking_hits se calcula para cualquier respuesta < 500 (también páginas
+  4xx), como check_web_presence.
+- Consumidores: web_fingerprint.fingerprint_from_probe,
+  domain_infra.web_status_from_probe y DomainContext.
+"""
+
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from app.verifier.html_head import make_keyword_matcher, parse_head, visible_text
+from app.verifier.http_client import race_schemes, HTTP_MAX_BYTES
+from app.verifier.web_fingerprint import PARKING_KEYWORDS
+from app.verifier.domain_infra import WEB_PARKING_KEYWORDS, has_valid_https_async
+
+# Unión de las keywords de parking de ambos consumidores
+PROBE_PARKING_KEYWORDS = sorted(set(PARKING_KEYWORDS) | set(WEB_PARKING_KEYWORDS))
+_PROBE_PARKING_RE = make_keyword_matcher(PROBE_PARKING_KEYWORDS)
+
+
+@dataclass
+class DomainProbe:
+    domain: str
+    scheme: Optional[str] = None            # esquema ganador (https | http) o None
+    http_status: Optional[int] = None
+    final_url: Optional[str] = None
+    https_valid: bool = False
+    title: Optional[str] = None
+    meta_description: Optional[str] = None
+    has_favicon: bool = False
+    parking_hits: list = field(default_factory=list)  # keywords de parking encontradas
+    content_length: int = 0                 # bytes leídos (acotado a HTTP_MAX_BYTES)
+    text_length: int = 0                    # len(texto.strip()), para "web activa"
+
+    @property
+    def reachable(self) -> bool:
+        return self.scheme is not None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DomainProbe":
+        return cls(**data)
+
+
+def _parking_hits(html: str) -> list:
+    text = visible_text(html, max_bytes=HTTP_MAX_BYTES)
+    # Camino rápido: una sola regex; solo si hay match se detalla cuáles
+    if not _PROBE_PARKING_RE.search(text):
+        return []
+    return [k for k in PROBE_PARKING_KEYWORDS if k in text]
+
+
+async def probe_domain(domain: str) -> DomainProbe:
+    probe = DomainProbe(domain=domain)
+
+    race = await race_schemes(domain, usable=lambda r: r.status < 400, max_bytes=HTTP_MAX_BYTES)
+    resp = race.response
+
+    https_resp = race.responses.get("https")
+    if https_resp is None and resp is not None and resp.final_url.startswith("https"):
+        https_resp = resp
+    if https_resp is not None and https_resp.status < 500:
+        probe.https_valid = True
+    else:
+        probe.https_valid = await has_valid_https_async(domain)
+
+    if resp is None:
+        return probe
+
+    probe.http_status = resp.status
+    if resp.status >= 500:
+        return probe
+
+    html = resp.text
+    probe.parking_hits = _parking_hits(html)
+    if not race.usable:
+        return probe
+
+    head = parse_head(html, max_bytes=HTTP_MAX_BYTES)
+
+    probe.scheme = race.scheme
+    probe.final_url = resp.final_url
+    probe.title = head.title
+    probe.meta_description = head.meta_description
+    probe.has_favicon = head.has_favicon
+    probe.content_length = len(resp.body)
+    probe.text_length = len(html.strip())
+
+    return probe
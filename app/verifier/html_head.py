@@ -0,0 +1,101 @@
+# backend/app/verifier/html_head.py
+
+"""
+Parser HTML incremental "solo <head>" para el fingerprint web.
+
+En lugar de construir el árbol completo con BeautifulSoup y recorrer todo el
+documento, se alimenta un html.parser.HTMLParser por bloques y se corta en
+cuanto aparece </head> / <body> o se alcanza el límite de bytes.
+Extrae: title, meta description y links de icono.
+
+Las keywords de parking se buscan con una única regex precompilada
+(alternancia) sobre el texto del documento sin tags.
+"""
+
+import re
+from html.parser import HTMLParser
+
+HEAD_MAX_BYTES = 64 * 1024
+FEED_CHUNK = 4096
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def make_keyword_matcher(keywords) -> re.Pattern:
+    """Regex de alternancia (una sola pasada) para una lista de keywords."""
+    return re.compile("|".join(re.escape(k.lower()) for k in keywords))
+
+
+class HeadInfo:
+    __slots__ = ("title", "meta_description", "has_favicon")
+
+    def __init__(self):
+        self.title = None
+        self.meta_description = None
+        self.has_favicon = False
+
+
+class _HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.info = HeadInfo()
+        self.done = False
+        self._in_title = False
+        self._title_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.done = True
+            return
+
+        if tag == "title":
+            self._in_title = True
+            return
+
+        if tag == "meta":
+            a = dict(attrs)
+            if (a.get("name") or "").lower() == "description" and a.get("content"):
+                if self.info.meta_description is None:
+                    self.info.meta_description = a["content"].strip()
+            return
+
+        if tag == "link":
+            rel = (dict(attrs).get("rel") or "").lower()
+            if "icon" in rel:
+                self.info.has_favicon = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            title = "".join(self._title_parts).strip()
+            if title and self.info.title is None:
+                self.info.title = title
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+
+
+def parse_head(html: str, max_bytes: int = HEAD_MAX_BYTES) -> HeadInfo:
+    """
+    Parsea incrementalmente hasta </head>, <body> o `max_bytes` caracteres.
+    """
+    parser = _HeadParser()
+    limit = min(len(html), max_bytes)
+
+    for pos in range(0, limit, FEED_CHUNK):
+        parser.feed(html[pos:min(pos + FEED_CHUNK, limit)])
+        if parser.done:
+            break
+
+    return parser.info
+
+
+def visible_text(html: str, max_bytes: int = HEAD_MAX_BYTES) -> str:
+    """Texto aproximado sin tags (en minúsculas) de los primeros `max_bytes`."""
+    return _TAG_RE.sub(" ", html[:max_bytes]).lower()
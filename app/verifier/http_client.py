@@ -0,0 +1,192 @@
+# backend/app/verifier/http_client.py
+
+"""
+Cliente HTTP async compartido para las sondas web (web_fingerprint, domain_infra).
+
+- Una sola aiohttp.ClientSession por event loop, con pool de conexiones,
+  cache DNS del connector y límite de conexiones por host.
+- Lecturas acotadas: solo se descargan los primeros HTTP_MAX_BYTES del body,
+  suficiente para <title>, meta description, favicon y keywords de parking.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger("http_client")
+
+HTTP_TIMEOUT = float(os.environ.get("HTTP_PROBE_TIMEOUT", "6"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_PROBE_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_BYTES = int(os.environ.get("HTTP_PROBE_MAX_BYTES", str(64 * 1024)))
+HTTP_POOL_LIMIT = int(os.environ.get("HTTP_POOL_LIMIT", "200"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "4"))
+HTTP_DNS_CACHE_TTL = 300
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (EmailVerifierBot/1.0)"
+}
+
+
+class FetchResult:
+    __slots__ = ("url", "final_url", "status", "body", "truncated", "charset")
+
+    def __init__(self, url: str, final_url: str, status: int, body: bytes,
+                 truncated: bool, charset: Optional[str]):
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.body = body
+        self.truncated = truncated
+        self.charset = charset
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.body.decode(self.charset or "utf-8", errors="ignore")
+        except (LookupError, TypeError):
+            # Charset desconocido en Content-Type (p.ej. "utf8mb4")
+            return self.body.decode("utf-8", errors="replace")
+
+
+# --------------------------------------------------
+# Sesión compartida (una por event loop)
+# --------------------------------------------------
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT),
+        )
+        _session_loop = loop
+
+    return _session
+
+
+async def close_http_session():
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+# --------------------------------------------------
+# GET con lectura acotada
+# --------------------------------------------------
+async def fetch_capped(url: str, max_bytes: int = HTTP_MAX_BYTES) -> FetchResult:
+    """
+    GET siguiendo redirects que lee como máximo `max_bytes` del body.
+    Lanza aiohttp.ClientError / asyncio.TimeoutError en errores de red.
+    """
+    session = get_http_session()
+
+    async with session.get(url, allow_redirects=True) as resp:
+        buf = bytearray()
+        while len(buf) < max_bytes:
+            chunk = await resp.content.read(max_bytes - len(buf))
+            if not chunk:
+                break
+            buf.extend(chunk)
+
+        truncated = not resp.content.at_eof()
+        if truncated:
+            # No drenar el resto del body: se descarta la conexión
+            resp.close()
+
+        return FetchResult(
+            url=url,
+            final_url=str(resp.url),
+            status=resp.status,
+            body=bytes(buf),
+            truncated=truncated,
+            charset=resp.charset,
+        )
+
+
+# --------------------------------------------------
+# Carrera HTTPS vs HTTP
+# --------------------------------------------------
+HTTPS_HEAD_START = float(os.environ.get("HTTP_PROBE_HTTPS_HEAD_START", "0.3"))
+
+
+class RaceResult:
+    """
+    scheme:   esquema ganador ("https" | "http") o None si ninguno fue utilizable
+    response: respuesta ganadora; si no hubo ganador, la última respuesta
+              recibida (para reportar http_status) o None
+    usable:   True si `response` cumplió el criterio del llamador
+    responses: todas las respuestas HTTP recibidas, por esquema
+    """
+    __slots__ = ("scheme", "response", "usable", "responses")
+
+    def __init__(self, scheme: Optional[str], response: Optional[FetchResult], usable: bool,
+                 responses: Optional[dict] = None):
+        self.scheme = scheme
+        self.response = response
+        self.usable = usable
+        self.responses = responses or {}
+
+
+async def race_schemes(domain: str, usable, head_start: float = HTTPS_HEAD_START,
+                       max_bytes: int = HTTP_MAX_BYTES) -> RaceResult:
+    """
+    Lanza https:// y, tras `head_start` segundos (o antes si https ya falló),
+    http:// en paralelo. Gana la primera respuesta que cumpla `usable(resp)`,
+    con preferencia por https si ambas llegan a la vez; la otra se cancela.
+
+    Para hosts muertos el peor caso pasa de timeout_https + timeout_http a
+    ~ head_start + timeout.
+    """
+    https = asyncio.ensure_future(fetch_capped(f"https://{domain}", max_bytes=max_bytes))
+    schemes = {https: "https"}
+    pending = {https}
+    http_started = False
+    fallback: Optional[FetchResult] = None
+    responses: dict[str, FetchResult] = {}
+
+    try:
+        while pending or not http_started:
+            timeout = None if http_started else head_start
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in sorted(done, key=lambda t: schemes[t] != "https"):
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                resp = task.result()
+                responses[schemes[task]] = resp
+                if usable(resp):
+                    return RaceResult(schemes[task], resp, True, responses)
+                fallback = resp
+
+            if not http_started:
+                # https falló / no sirve, o se agotó su ventaja
+                http = asyncio.ensure_future(fetch_capped(f"http://{domain}", max_bytes=max_bytes))
+                schemes[http] = "http"
+                pending.add(http)
+                http_started = True
+
+        return RaceResult(None, fallback, False, responses)
+
+    finally:
+        for task in schemes:
+            if not task.done():
+                task.cancel()
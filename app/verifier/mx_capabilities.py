@@ -0,0 +1,66 @@
+# backend/app/verifier/mx_capabilities.py
+
+"""
+Capacidades aprendidas por host MX
+----------------------------------
+smtp_verify recorre los puertos 25, 587 y 465 en orden para cada email; un MX
+que bloquea el 25 cuesta un timeout completo por dirección antes de pasar al
+siguiente puerto. Aquí se recuerda, por host MX, qué puerto respondió, si se
+usó STARTTLS y las extensiones anunciadas en EHLO (PIPELINING, SIZE, ...).
+
+Se guarda en el DomainCache (señal "mx_caps", compartida entre workers y con
+TTL), y las sesiones siguientes prueban primero el transporte conocido.
+"""
+
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+DEFAULT_PORTS = (25, 587, 465)
+
+
+@dataclass
+class MXCapabilities:
+    host: str
+    port: int                           # puerto que respondió
+    starttls: bool = False              # la sesión necesitó/negoció STARTTLS
+    esmtp_features: list = field(default_factory=list)  # extensiones EHLO (minúsculas)
+
+    @property
+    def pipelining(self) -> bool:
+        return "pipelining" in self.esmtp_features
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MXCapabilities":
+        return cls(**data)
+
+
+def port_order(caps: Optional[MXCapabilities], ports=DEFAULT_PORTS) -> tuple:
+    """Puertos a probar: primero el conocido, luego el resto como respaldo."""
+    if caps is None or caps.port not in ports:
+        return tuple(ports)
+    return (caps.port,) + tuple(p for p in ports if p != caps.port)
+
+
+def capabilities_from_result(smtp_res, previous: Optional[MXCapabilities] = None) -> Optional[MXCapabilities]:
+    """
+    MXCapabilities a partir de un SMTPVerifyResult, o None si ningún puerto respondió.
+    Las extensiones EHLO se conservan de `previous` si la sesión no las reportó
+    (p.ej. sesiones reutilizadas del pool).
+    """
+    port = getattr(smtp_res, "port", None)
+    if smtp_res is None or port is None:
+        return None
+
+    features = smtp_res.esmtp_features
+    if features is None and previous is not None and previous.port == port:
+        features = previous.esmtp_features
+
+    return MXCapabilities(
+        host=smtp_res.mx_host.lower(),
+        port=port,
+        starttls=bool(smtp_res.starttls),
+        esmtp_features=sorted(features or []),
+    )
@@ -0,0 +1,155 @@
+# backend/app/verifier/mx_health.py
+
+"""
+Salud por host MX y failover entre prioridades
+----------------------------------------------
+El motor solo probaba mx_records[0]: con el MX primario caído o haciendo
+tarpitting, todos los emails del dominio acababan en "unknown" tras un
+timeout aunque los MX secundarios estuvieran sanos.
+
+Por host MX (en proceso) se lleva:
+- latencia reciente (EWMA de la duración de las sesiones SMTP),
+- tasa de error reciente (EWMA de sesiones sin respuesta),
+- circuito: tras MX_CIRCUIT_THRESHOLD fallos seguidos el host se salta durante
+  MX_CIRCUIT_OPEN_SECONDS; pasado ese tiempo se deja pasar una prueba
+  (half-open) y un nuevo fallo lo vuelve a abrir.
+
+`order_hosts` respeta la prioridad MX, deja al final los hosts degradados
+(lentos o con muchos errores) y omite los que tienen el circuito abierto.
+"""
+
+import os
+import time
+import threading
+from typing import Optional
+
+MX_EWMA_ALPHA = 0.3
+MX_CIRCUIT_THRESHOLD = int(os.environ.get("MX_CIRCUIT_THRESHOLD", "3"))
+MX_CIRCUIT_OPEN_SECONDS = float(os.environ.get("MX_CIRCUIT_OPEN_SECONDS", "120"))
+MX_SLOW_MS = float(os.environ.get("MX_SLOW_MS", "8000"))     # por encima: probable tarpit
+MX_DEGRADED_ERROR_RATE = 0.5
+MX_MAX_FAILOVER = int(os.environ.get("MX_MAX_FAILOVER", "3"))  # hosts a probar por email
+
+
+class HostHealth:
+    __slots__ = ("latency_ms", "error_rate", "consecutive_failures", "open_until", "samples")
+
+    def __init__(self):
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.samples = 0
+
+    @property
+    def degraded(self) -> bool:
+        return self.error_rate > MX_DEGRADED_ERROR_RATE or \
+            (self.latency_ms is not None and self.latency_ms > MX_SLOW_MS)
+
+
+class MXHealth:
+    def __init__(self, threshold: int = MX_CIRCUIT_THRESHOLD,
+                 open_seconds: float = MX_CIRCUIT_OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self._hosts: dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host: str) -> HostHealth:
+        key = host.lower()
+        health = self._hosts.get(key)
+        if health is None:
+            health = self._hosts[key] = HostHealth()
+        return health
+
+    # --------------------------------------------------
+    # Registro de resultados
+    # --------------------------------------------------
+    def record_success(self, host: str, latency_ms: float):
+        with self._lock:
+            h = self._get(host)
+            h.latency_ms = latency_ms if h.latency_ms is None else \
+                MX_EWMA_ALPHA * latency_ms + (1 - MX_EWMA_ALPHA) * h.latency_ms
+            h.error_rate *= (1 - MX_EWMA_ALPHA)
+            h.consecutive_failures = 0
+            h.open_until = 0.0
+            h.samples += 1
+
+    def record_failure(self, host: str, latency_ms: Optional[float] = None):
+        with self._lock:
+            h = self._get(host)
+            if latency_ms is not None:
+                h.latency_ms = latency_ms if h.latency_ms is None else \
+                    MX_EWMA_ALPHA * latency_ms + (1 - MX_EWMA_ALPHA) * h.latency_ms
+            h.error_rate = MX_EWMA_ALPHA + (1 - MX_EWMA_ALPHA) * h.error_rate
+            h.consecutive_failures += 1
+            h.samples += 1
+            if h.consecutive_failures >= self.threshold:
+                h.open_until = time.monotonic() + self.open_seconds
+
+    def record(self, host: str, smtp_res) -> bool:
+        """
+        Registra un SMTPVerifyResult. Éxito = algún puerto respondió (aunque
+        el RCPT se rechace). Retorna True si el host respondió.
+        """
+        if smtp_res is not None and getattr(smtp_res, "port", None) is not None:
+            self.record_success(host, smtp_res.duration_ms)
+            return True
+        self.record_failure(host, getattr(smtp_res, "duration_ms", None))
+        return False
+
+    # --------------------------------------------------
+    # Consulta
+    # --------------------------------------------------
+    def is_open(self, host: str) -> bool:
+        h = self._hosts.get(host.lower())
+        if h is None or not h.open_until:
+            return False
+        if time.monotonic() < h.open_until:
+            return True
+        # half-open: se deja pasar una prueba y se rearma el circuito
+        with self._lock:
+            h.open_until = time.monotonic() + self.open_seconds
+        return False
+
+    def order_hosts(self, mx_records) -> list[str]:
+        """
+        Hosts a probar, en orden: sanos por prioridad (empate: menor latencia),
+        luego degradados; los de circuito abierto se omiten.
+        """
+        candidates = []
+        for r in mx_records:
+            if self.is_open(r.host):
+                continue
+            h = self._hosts.get(r.host.lower())
+            degraded = h is not None and h.degraded
+            latency = h.latency_ms if h is not None and h.latency_ms is not None else 0.0
+            candidates.append((degraded, r.priority, latency, r.host))
+
+        candidates.sort(key=lambda c: c[:3])
+        return [host for *_, host in candidates]
+
+    def snapshot(self, host: str) -> Optional[dict]:
+        h = self._hosts.get(host.lower())
+        if h is None:
+            return None
+        return {
+            "latency_ms": h.latency_ms,
+            "error_rate": round(h.error_rate, 4),
+            "consecutive_failures": h.consecutive_failures,
+            "open": bool(h.open_until) and time.monotonic() < h.open_until,
+            "samples": h.samples,
+        }
+
+
+# --------------------------------------------------
+# Instancia compartida por proceso
+# --------------------------------------------------
+_mx_health: Optional[MXHealth] = None
+
+
+def get_mx_health() -> MXHealth:
+    global _mx_health
+    if _mx_health is None:
+        _mx_health = MXHealth()
+    return _mx_health
@@ -0,0 +1,241 @@
+# backend/app/verifier/rcpt_batcher.py
+
+"""
+RCPT TO agrupados por host MX
+-----------------------------
+smtp_verify abre una sesión SMTP nueva por email (y por puerto). Aquí los
+emails que resuelven al mismo host MX y llegan casi a la vez (aunque sean de
+dominios distintos: hosting compartido, Google Workspace, Microsoft 365...)
+se juntan y se verifican en UNA sesión SMTP async
+(smtp_verify_async.batch_rcpt_check_async): un MAIL FROM y muchos RCPT TO
+(en pipeline si el servidor lo anuncia), con RSET entre transacciones y
+reparto automático cuando el servidor responde 452 "too many recipients".
+
+- Un lote se envía al llenarse (`max_batch`) o tras `max_wait` segundos desde
+  el primer email pendiente (smtp_async.batcher.DomainBatcher, con clave
+  el host MX).
+- Una instancia por worker agrupa los emails de TODOS los jobs en curso:
+  menos sesiones y handshakes por MX.
+- Cada lote añade una dirección aleatoria por dominio para detectar catch-all,
+  salvo que el veredicto ya se conozca (`known_catch_all`, cacheado por dominio).
+- Los puertos se conectan en carrera escalonada en el orden recibido
+  (mx_capabilities.port_order): gana el primero que saluda.
+- Las sesiones salen de un SMTPConnectionPool (smtp_async.smtp_pool): como
+  mucho RCPT_MAX_SESSIONS_PER_MX sesiones simultáneas por host MX (el resto
+  de lotes espera turno) y la conexión se reusa entre lotes del mismo MX.
+- Con un RateLimiter (smtp_async.redis_lua) cada lote toma antes un token
+  del bucket `bucket:mx:{host}`, compartido en Redis con el resto de
+  workers; sin token el lote espera RCPT_RATE_LIMIT_RETRY s y reintenta.
+- La salud del host MX (mx_health) se registra una vez por sesión, no por
+  email: una sesión fallida con 25 emails es un fallo, no 25.
+- Devuelve el mismo SMTPVerifyResult que smtp_verify, así el motor no cambia.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from smtp_async.batcher import DomainBatcher
+from smtp_async.redis_lua import RateLimiter
+from smtp_async.smtp_pool import SMTPConnectionPool
+from app.verifier.mx_capabilities import DEFAULT_PORTS
+from app.verifier.mx_health import MXHealth, get_mx_health
+from app.verifier.smtp_verify_async import batch_rcpt_check_async
+from app.verifier.smtp_verify import (
+    SMTPVerifyResult, NON_VERIFIABLE_DOMAINS, catch_all_from_probe, classify_rcpt_code, smtp_verify,
+    _random_address,
+)
+
+logger = logging.getLogger("rcpt_batcher")
+
+SMTP_FROM_ADDRESS = os.environ.get("SMTP_FROM_ADDRESS", "verify@checker.com")
+SMTP_HELO_HOST = os.environ.get("SMTP_HELO_HOST", "verifier.local")
+RCPT_BATCH_SIZE = int(os.environ.get("RCPT_BATCH_SIZE", "25"))
+RCPT_BATCH_MAX_WAIT = float(os.environ.get("RCPT_BATCH_MAX_WAIT", "0.25"))
+RCPT_BATCH_TIMEOUT = float(os.environ.get("RCPT_BATCH_TIMEOUT", "10"))
+RCPT_MAX_SESSIONS_PER_MX = int(os.environ.get("RCPT_MAX_SESSIONS_PER_MX", "2"))
+RCPT_RATE_LIMIT_RETRY = float(os.environ.get("RCPT_RATE_LIMIT_RETRY", "0.5"))
+
+
+class RcptBatcher:
+    """
+    Agregador de RCPT TO. Pensado para compartirse a nivel de worker: los
+    emails de todos los jobs en curso se encolan por host MX en un
+    DomainBatcher y cada resultado vuelve al `check` (job) que lo pidió.
+    """
+
+    def __init__(self, max_batch: int = RCPT_BATCH_SIZE, max_wait: float = RCPT_BATCH_MAX_WAIT,
+                 from_address: str = SMTP_FROM_ADDRESS, timeout: float = RCPT_BATCH_TIMEOUT,
+                 pool: Optional[SMTPConnectionPool] = None, mx_health: Optional[MXHealth] = None,
+                 rate: Optional[RateLimiter] = None):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.from_address = from_address
+        self.timeout = timeout
+        # mx_host -> [(email, future, known_catch_all, ports)]
+        self._batcher = DomainBatcher(batch_size=self.max_batch, max_wait_ms=max_wait * 1000)
+        self.pool = pool if pool is not None else SMTPConnectionPool(
+            max_connections_per_domain=RCPT_MAX_SESSIONS_PER_MX
+        )
+        self.mx_health = mx_health if mx_health is not None else get_mx_health()
+        self.rate = rate
+        self._pump: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()
+        self.sessions = 0
+        self.emails = 0
+        self.rate_limited = 0
+
+    async def check(self, email: str, mx_host: str,
+                    known_catch_all: Optional[bool] = None, ports=DEFAULT_PORTS) -> SMTPVerifyResult:
+        domain = email.split("@", 1)[1].lower()
+
+        # Dominios no verificables / sin MX: smtp_verify responde sin red
+        if domain in NON_VERIFIABLE_DOMAINS or not mx_host:
+            return smtp_verify(email=email, mx_host=mx_host, known_catch_all=known_catch_all)
+
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.ensure_future(self._pump_ready())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._batcher.add_email_nowait(mx_host.lower(), (email, fut, known_catch_all, tuple(ports)))
+        return await fut
+
+    # --------------------------------------------------
+    # Envío de lotes
+    # --------------------------------------------------
+    def _start(self, mx_host: str, batch: list):
+        task = asyncio.ensure_future(self._run(mx_host, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _pump_ready(self):
+        while True:
+            key, batch = await self._batcher.next_ready()
+            self._start(key, batch)
+
+    async def _wait_for_token(self, mx_host: str):
+        """Espera un token del bucket del MX; si Redis falla, no limita."""
+        if self.rate is None:
+            return
+        while True:
+            try:
+                if self.rate.script is None:
+                    await self.rate.load()
+                if await self.rate.allow(mx_host):
+                    return
+            except Exception as e:
+                logger.warning(f"Rate limiter unavailable for {mx_host}, sending unthrottled: {e}")
+                return
+            self.rate_limited += 1
+            await asyncio.sleep(RCPT_RATE_LIMIT_RETRY)
+
+    async def _run(self, mx_host: str, batch: list):
+        # Antes de abrir o reusar sesión: el límite es del servidor remoto
+        await self._wait_for_token(mx_host)
+        start = time.time()
+        # Un mismo email pedido por varios jobs se comprueba una sola vez
+        emails = list(dict.fromkeys(email for email, _, _, _ in batch))
+        self.sessions += 1
+        self.emails += len(emails)
+        rcpts = list(emails)
+
+        # Una prueba catch-all por dominio del lote, salvo que todos sus
+        # emails traigan el veredicto
+        by_domain: dict[str, list] = {}
+        for item in batch:
+            by_domain.setdefault(item[0].split("@", 1)[1].lower(), []).append(item)
+        probes: dict[str, Optional[str]] = {}
+        for domain, items in by_domain.items():
+            if any(hint is None for _, _, hint, _ in items):
+                probes[domain] = _random_address(domain)
+                rcpts.append(probes[domain])
+
+        session: dict = {}
+        try:
+            replies = await batch_rcpt_check_async(
+                self.from_address, mx_host, rcpts, ports=batch[0][3],
+                helo_host=SMTP_HELO_HOST, timeout=self.timeout, session_info=session,
+                pool=self.pool,
+            )
+        except Exception as e:
+            logger.debug(f"RCPT batch failed for {len(by_domain)} domain(s) via {mx_host}: {e}")
+            replies = {email: (None, str(e)) for email in emails}
+            session = {}
+
+        duration_ms = int((time.time() - start) * 1000)
+        answered = session.get("port") is not None or any(code is not None for code, _ in replies.values())
+        if answered:
+            self.mx_health.record_success(mx_host, duration_ms)
+        else:
+            self.mx_health.record_failure(mx_host, duration_ms)
+
+        for domain, items in by_domain.items():
+            probe = probes.get(domain)
+            hints = [hint for _, _, hint, _ in items if hint is not None]
+            # Solo 2xx / 5xx concluyen; un 4xx (greylisting, 421) queda sin veredicto
+            verdict = catch_all_from_probe(replies.get(probe, (None, ""))[0]) if probe else None
+            checked = verdict is not None
+            is_catch = verdict if checked else bool(hints and hints[0])
+
+            for email, fut, _, _ in items:
+                if fut.done():      # el email se canceló mientras esperaba
+                    continue
+                code, msg = replies.get(email, (None, "no reply"))
+                fut.set_result(SMTPVerifyResult(
+                    smtp_status=classify_rcpt_code(code),
+                    code=code or 0,
+                    message=msg,
+                    mx_host=mx_host,
+                    is_catch_all=is_catch,
+                    anti_spam=msg.startswith("mail_from_rejected"),
+                    greylisted=code in (450, 451),
+                    duration_ms=duration_ms,
+                    catch_all_checked=checked,
+                    port=session.get("port"),
+                    starttls=session.get("starttls", False),
+                    esmtp_features=session.get("esmtp_features"),
+                ))
+
+    def stats(self) -> dict:
+        return {
+            "pending_keys": self._batcher.active_domains,
+            "in_flight": len(self._running),
+            "sessions": self.sessions,
+            "emails": self.emails,
+            "rate_limited": self.rate_limited,
+            "pool": self.pool.stats(),
+        }
+
+    async def close(self):
+        """Envía lo pendiente, espera a los lotes en curso y cierra el pool."""
+        self._batcher.flush()
+        while not self._batcher.ready.empty():
+            self._start(*self._batcher.ready.get_nowait())
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._pump is not None:
+            self._pump.cancel()
+            await asyncio.gather(self._pump, return_exceptions=True)
+            self._pump = None
+        await self.pool.close()
+
+
+async def probe_catch_all(domain: str, mx_host: str, from_address: str = SMTP_FROM_ADDRESS,
+                          timeout: float = RCPT_BATCH_TIMEOUT) -> Optional[bool]:
+    """
+    Un solo RCPT TO a una dirección aleatoria del dominio.
+    True (2xx) / False (5xx); None si no se pudo comprobar o la respuesta
+    fue temporal (4xx).
+    """
+    probe = _random_address(domain)
+    try:
+        replies = await batch_rcpt_check_async(
+            from_address, mx_host, [probe], helo_host=SMTP_HELO_HOST, timeout=timeout,
+        )
+    except Exception as e:
+        logger.debug(f"Catch-all probe failed for {domain} via {mx_host}: {e}")
+        return None
+    code, _ = replies.get(probe, (None, ""))
+    return catch_all_from_probe(code)
@@ -0,0 +1,175 @@
+# backend/app/verifier/smtp_connect.py
+
+"""
+Conexión SMTP "happy eyeballs"
+------------------------------
+Montar la conexión es la mayor parte de la latencia SMTP, y smtp_verify
+probaba hosts y puertos en serie con un timeout completo antes de cada
+alternativa. Aquí se lanzan intentos escalonados en paralelo (cada
+CONNECT_STAGGER segundos, o en cuanto falla el anterior) contra los mejores
+MX y puertos.
+
+Gana el primer intento que recibe un saludo 220; los demás se descartan
+(los que aún estén conectando cierran su socket al terminar).
+
+Este módulo define también lo que comparte con la versión asyncio
+(smtp_verify_async.connect_first_async): orden de candidatos (puerto, luego
+prioridad de host), orden de direcciones (IPv6/IPv4 intercaladas, RFC 8305),
+tope de intentos y registro de hosts que fallaron.
+
+Es síncrono: los intentos corren en un pool de hilos acotado y compartido
+(CONNECT_THREADS), no un hilo nuevo por intento. smtplib resuelve el nombre
+en connect(); el intercalado por familia de direcciones lo hace la versión
+async, que abre los sockets ella misma.
+"""
+
+import os
+import socket
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Optional
+
+CONNECT_STAGGER = float(os.environ.get("SMTP_CONNECT_STAGGER", "0.25"))
+CONNECT_MAX_ATTEMPTS = int(os.environ.get("SMTP_CONNECT_MAX_ATTEMPTS", "8"))
+CONNECT_THREADS = int(os.environ.get("SMTP_CONNECT_THREADS", "32"))
+
+
+class SMTPConnectError(Exception):
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__("; ".join(errors) or "no SMTP candidates")
+
+
+@dataclass
+class ConnectResult:
+    server: smtplib.SMTP
+    host: str
+    port: int
+    code: int
+    banner: str
+
+
+# --------------------------------------------------
+# Compartido con smtp_verify_async
+# --------------------------------------------------
+def connect_candidates(mx_host: str, ports, fallback_hosts=()) -> list:
+    """[(host, port), ...]: por puerto y, dentro de cada puerto, por prioridad de host."""
+    hosts = [mx_host] + [h for h in fallback_hosts if h and h != mx_host]
+    return [(h, p) for p in ports for h in hosts]
+
+
+def order_addresses(infos) -> list:
+    """
+    Resultado de getaddrinfo -> [(family, sockaddr)]: una dirección por
+    familia, IPv6 primero e intercaladas (RFC 8305).
+    """
+    by_family = {}
+    for family, _, _, _, sockaddr in infos:
+        by_family.setdefault(family, sockaddr)
+    return [(f, by_family[f]) for f in (socket.AF_INET6, socket.AF_INET) if f in by_family]
+
+
+def limit_attempts(targets: list) -> list:
+    return targets[:CONNECT_MAX_ATTEMPTS]
+
+
+def describe_failure(host: str, port: int, exc: BaseException, address: Optional[str] = None) -> str:
+    return f"{host}:{port}{f' [{address}]' if address else ''}: {exc}"
+
+
+# --------------------------------------------------
+# Versión síncrona
+# --------------------------------------------------
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=CONNECT_THREADS, thread_name_prefix="smtp-connect")
+    return _executor
+
+
+def _attempt(host: str, port: int, timeout: float) -> ConnectResult:
+    server = smtplib.SMTP_SSL(timeout=timeout) if port == 465 else smtplib.SMTP(timeout=timeout)
+    try:
+        # connect() público: fija el host para SNI / STARTTLS
+        code, msg = server.connect(host, port)
+    except Exception:
+        server.close()
+        raise
+
+    banner = msg.decode(errors="ignore") if isinstance(msg, bytes) else str(msg)
+    if code != 220:
+        server.close()
+        raise smtplib.SMTPConnectError(code, banner)
+    return ConnectResult(server, host, port, code, banner)
+
+
+def _close_late_winner(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().server.close()
+
+
+def connect_first(candidates, timeout: float = 4, stagger: float = CONNECT_STAGGER,
+                  failed_hosts: Optional[set] = None) -> ConnectResult:
+    """
+    `candidates`: [(host, port), ...] en orden de preferencia.
+    Retorna la primera conexión con saludo 220; lanza SMTPConnectError si
+    ninguna lo consigue. `failed_hosts` (opcional) recibe los hosts con algún
+    intento fallido (no los descartados porque otro ganó antes).
+    """
+    targets = limit_attempts(list(candidates))
+    executor = _get_executor()
+    futures: dict = {}
+    pending: set = set()
+    errors = []
+    started = 0
+
+    try:
+        while True:
+            if started < len(targets):
+                host, port = targets[started]
+                future = executor.submit(_attempt, host, port, timeout)
+                futures[future] = targets[started]
+                pending.add(future)
+                started += 1
+            elif not pending:
+                raise SMTPConnectError(errors)
+
+            wait_for = stagger if started < len(targets) else timeout + 1
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done and started >= len(targets):
+                # Ningún intento respondió dentro del timeout (tarpit)
+                for future in pending:
+                    host, port = futures[future]
+                    errors.append(describe_failure(host, port, "connect timed out"))
+                    if failed_hosts is not None:
+                        failed_hosts.add(host)
+                raise SMTPConnectError(errors)
+
+            winner = None
+            for future in done:
+                host, port = futures[future]
+                if future.exception() is None:
+                    if winner is None:
+                        winner = future
+                    else:
+                        future.result().server.close()     # ganador simultáneo
+                else:
+                    errors.append(describe_failure(host, port, future.exception()))
+                    if failed_hosts is not None:
+                        failed_hosts.add(host)
+            if winner is not None:
+                return winner.result()
+            # Un fallo adelanta el siguiente intento (sin esperar el escalonado)
+    finally:
+        # Los intentos que siguen en vuelo cierran su conexión al terminar
+        for future in pending:
+            if not future.cancel():
+                future.add_done_callback(_close_late_winner)
@@ -6,6 +6,10 @@ import time
 import random
 import string
 from dataclasses import dataclass
+from typing import Optional
+
+from app.verifier.mx_capabilities import DEFAULT_PORTS
+from app.verifier.smtp_connect import SMTPConnectError, connect_candidates, connect_first
 
 
 # ------------------------------------------------------------
@@ -22,6 +26,11 @@ class SMTPVerifyResult:
     greylisted: bool
     duration_ms: int
     server_banner: str = None
+    catch_all_checked: bool = False     # is_catch_all viene de una prueba en esta sesión
+    port: int = None                    # puerto que respondió (None si ninguno)
+    starttls: bool = False              # se negoció STARTTLS
+    esmtp_features: list = None         # extensiones anunciadas en EHLO
+    failed_hosts: list = None           # hosts MX con algún intento de conexión fallido
 
 
 # ------------------------------------------------------------
@@ -41,11 +50,43 @@ def _random_address(domain: str) -> str:
     return f"{rand}@{domain}"
 
 
-# ------------------------------------------------------------
-# SMTP VERIFICATION estable y profesional
-# ------------------------------------------------------------
-def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
-    start = time.time()
+def classify_rcpt_code(code) -> str:
+    """deliverable / invalid / unknown a partir del código de RCPT TO."""
+    if code is None:
+        return "unknown"
+    if 200 <= code < 300:
+        return "deliverable"
+    if code in (450, 451, 452):
+        return "unknown"        # greylisting / temp fail
+    if code in (550, 551, 553):
+        return "invalid"
+    return "unknown"
+
+
+def catch_all_from_probe(code) -> Optional[bool]:
+    """
+    Veredicto catch-all a partir del RCPT a una dirección aleatoria:
+    2xx = acepta todo, 5xx = no; 4xx (greylisting, 421...) o sin respuesta
+    no concluyen y no deben cachearse como veredicto.
+    """
+    if code is None:
+        return None
+    if 200 <= code < 300:
+        return True
+    if 500 <= code < 600:
+        return False
+    return None
+
+
+ANTI_SPAM_BANNERS = ("Proofpoint", "Barracuda", "Google Frontend", "Spamhaus")
+
+
+def is_anti_spam_banner(banner: str) -> bool:
+    return any(x in (banner or "") for x in ANTI_SPAM_BANNERS)
+
+
+def precheck(email: str, mx_host: str, start: float):
+    """Veredictos sin red (dominio no verificable / sin MX) o None para seguir."""
     domain = email.split("@")[1]
 
     # 1. Dominios que no exponen RCPT verification → unknown
@@ -74,32 +115,66 @@ def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
             duration_ms=int((time.time() - start) * 1000)
         )
 
-    ports = [25, 587, 465]
+    return None
+
+
+# ------------------------------------------------------------
+# SMTP VERIFICATION estable y profesional
+# ------------------------------------------------------------
+def smtp_verify(email: str, mx_host: str, timeout=4, known_catch_all: bool = None,
+                ports=DEFAULT_PORTS, fallback_hosts=()) -> SMTPVerifyResult:
+    """
+    `known_catch_all`: veredicto catch-all ya conocido del dominio (cache);
+    si se pasa, se omite el RCPT TO de prueba con una dirección aleatoria.
+    `ports`: orden de puertos a probar (mx_capabilities.port_order pone
+    primero el que ya respondió para este MX).
+    `fallback_hosts`: otros MX del dominio; se conectan en carrera escalonada
+    con `mx_host` (smtp_connect.connect_first) y gana el primer saludo 220.
+    El resultado lleva en mx_host el host que respondió.
+    """
+    start = time.time()
+    domain = email.split("@")[1]
+
+    early = precheck(email, mx_host, start)
+    if early is not None:
+        return early
+
     last_error = ""
     server_banner = None
 
-    for port in ports:
+    # Candidatos por puerto y, dentro de cada puerto, por prioridad de host
+    candidates = connect_candidates(mx_host, ports, fallback_hosts)
+    failed = set()
+
+    while candidates:
         server = None
         try:
             # -------------------------------
-            # Conexión a servidor SMTP
+            # Conexión a servidor SMTP (happy eyeballs hosts / puertos / familias)
             # -------------------------------
-            if port == 465:
-                server = smtplib.SMTP_SSL(mx_host, port, timeout=timeout)
-            else:
-                server = smtplib.SMTP(mx_host, port, timeout=timeout)
+            try:
+                conn = connect_first(candidates, timeout=timeout, failed_hosts=failed)
+            except SMTPConnectError as e:
+                last_error = str(e)
+                break
+            server, port, mx_host = conn.server, conn.port, conn.host
+            # Si la sesión falla más adelante, se reintenta con el resto
+            candidates.remove((conn.host, conn.port))
 
-            # Banner
-            banner = server.docmd("EHLO")
+            # Banner (ehlo() además registra las extensiones ESMTP)
+            banner = server.ehlo()
             server_banner = banner[1].decode(errors="ignore") if isinstance(banner[1], bytes) else str(banner[1])
 
             # STARTTLS para 587 si soporta
+            used_starttls = False
             if port == 587:
                 try:
                     server.starttls()
                     server.ehlo()
+                    used_starttls = True
                 except Exception:
                     pass
+            esmtp_features = sorted(server.esmtp_features)
 
             # MAIL FROM
             mf_code, mf_msg = server.mail("verify@checker.com")
@@ -115,7 +190,11 @@ def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
                     anti_spam=True,
                     greylisted=False,
                     duration_ms=int((time.time() - start) * 1000),
-                    server_banner=server_banner
+                    server_banner=server_banner,
+                    port=port,
+                    starttls=used_starttls,
+                    esmtp_features=esmtp_features,
+                    failed_hosts=sorted(failed) or None,
                 )
 
             # RCPT TO: email real
@@ -123,31 +202,27 @@ def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
             msg = msg.decode() if isinstance(msg, bytes) else str(msg)
 
             # -------------------------------
-            # Catch-all test (seguro)
+            # Catch-all test (seguro), solo si no se conoce ya
             # -------------------------------
-            fake_email = _random_address(domain)
-            fake_code, _ = server.rcpt(fake_email)
-
-            is_catch = (200 <= fake_code < 300)
+            catch_all_checked = False
+            if known_catch_all is None:
+                fake_email = _random_address(domain)
+                fake_code, _ = server.rcpt(fake_email)
+                verdict = catch_all_from_probe(fake_code)
+                catch_all_checked = verdict is not None
+                is_catch = bool(verdict)
+            else:
+                is_catch = known_catch_all
 
             # -------------------------------
             # Clasificación de status
             # -------------------------------
-            if 200 <= code < 300:
-                status = "deliverable"
-            elif code in (450, 451, 452):
-                status = "unknown"      # greylisting / temp fail
-            elif code in (550, 551, 553):
-                status = "invalid"
-            else:
-                status = "unknown"
+            status = classify_rcpt_code(code)
 
             # -------------------------------
             # Anti-spam heuristics
             # -------------------------------
-            is_anti_spam = any(x in server_banner for x in [
-                "Proofpoint", "Barracuda", "Google Frontend", "Spamhaus"
-            ])
+            is_anti_spam = is_anti_spam_banner(server_banner)
 
             return SMTPVerifyResult(
                 smtp_status=status,
@@ -158,11 +233,18 @@ def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
                 anti_spam=is_anti_spam,
                 greylisted=(code in (450, 451)),
                 duration_ms=int((time.time() - start) * 1000),
-                server_banner=server_banner
+                server_banner=server_banner,
+                catch_all_checked=catch_all_checked,
+                port=port,
+                starttls=used_starttls,
+                esmtp_features=esmtp_features,
+                failed_hosts=sorted(failed) or None,
             )
 
         except (socket.timeout, socket.error, smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected) as e:
             last_error = str(e)
+            if server:
+                failed.add(mx_host)     # conectó pero la sesión falló
             continue
 
         finally:
@@ -182,7 +264,8 @@ def smtp_verify(email: str, mx_host: str, timeout=4) -> SMTPVerifyResult:
         anti_spam=False,
         greylisted=False,
         duration_ms=int((time.time() - start) * 1000),
-        server_banner=server_banner
+        server_banner=server_banner,
+        failed_hosts=sorted(failed) or None,
     )
 
 
@@ -0,0 +1,448 @@
+# backend/app/verifier/smtp_verify_async.py
+
+"""
+Verificador SMTP nativo asyncio (aiosmtplib) con PIPELINING
+-----------------------------------------------------------
+Mismo contrato que smtp_verify (SMTPVerifyResult), sin hilos: el motor puede
+tener cientos de sesiones SMTP en vuelo en el propio event loop.
+
+- Conexión "happy eyeballs" async: intentos escalonados contra MX / puertos /
+  familias de direcciones; gana el primer saludo 220. Orden de candidatos y
+  direcciones, tope de intentos y hosts fallidos vienen de smtp_connect.
+- Si el servidor anuncia PIPELINING (RFC 2920), MAIL FROM y todos los RCPT TO
+  de una transacción se envían en una sola escritura y las respuestas se leen
+  juntas: N idas y vueltas por lote pasan a ~1. Requiere leer respuestas
+  encadenadas, que aiosmtplib no expone: _PipeliningProtocol usa internos de
+  SMTPProtocol (versión fijada); sin ellos se usan comandos uno a uno.
+- Lotes (rcpt_batch_async): transacciones de MAX_RCPT_PER_TRANSACTION, nueva
+  transacción si el servidor responde 452 "too many recipients", RSET entre
+  transacciones. Es la única implementación de lotes RCPT: las sesiones se
+  reusan a través de smtp_async.smtp_pool.SMTPConnectionPool.
+"""
+
+import time
+import socket
+import asyncio
+import logging
+from typing import Optional
+
+import aiosmtplib
+from aiosmtplib.protocol import SMTPProtocol
+
+from app.verifier.mx_capabilities import DEFAULT_PORTS
+from app.verifier.smtp_connect import (
+    CONNECT_STAGGER, SMTPConnectError, connect_candidates, describe_failure, limit_attempts, order_addresses,
+)
+from app.verifier.smtp_verify import (
+    SMTPVerifyResult, catch_all_from_probe, classify_rcpt_code, is_anti_spam_banner, precheck, _random_address,
+)
+
+logger = logging.getLogger("smtp_verify_async")
+
+DEFAULT_FROM = "verify@checker.com"
+DEFAULT_HELO = "verifier.local"
+
+# Máximo de RCPT TO por transacción antes de hacer RSET + nuevo MAIL FROM
+MAX_RCPT_PER_TRANSACTION = 50
+
+
+def _is_too_many_recipients(code, msg):
+    # 452 4.5.3 "Too many recipients" (RFC 5321 §4.5.3.1.10); algunos servidores usan 451/552
+    return (code == 452 and ("recipient" in msg.lower() or "4.5.3" in msg)) or \
+        (code in (451, 552) and "too many recipients" in msg.lower())
+
+
+# --------------------------------------------------
+# Lectura de respuestas en pipeline
+# --------------------------------------------------
+class _PipeliningProtocol(SMTPProtocol):
+    """
+    SMTPProtocol espera UNA respuesta por comando: si llegan varias en el
+    mismo segmento (o mientras no hay lector esperando) las descarta. Con
+    PIPELINING eso pierde respuestas, así que aquí se guardan en el buffer y
+    read_response las sirve en orden antes de esperar más datos.
+    """
+    __slots__ = ()
+
+    def data_received(self, data: bytes) -> None:
+        if self._response_waiter is not None and self._response_waiter.done():
+            self._buffer.extend(data)
+            return
+        super().data_received(data)
+
+    async def read_response(self, timeout: Optional[float] = None):
+        waiter = self._response_waiter
+        if waiter is not None and not waiter.done():
+            buffered = self._read_response_from_buffer()
+            if buffered is not None:
+                return buffered
+        return await super().read_response(timeout=timeout)
+
+
+# Atributos internos de SMTPProtocol de los que depende _PipeliningProtocol.
+# aiosmtplib va fijado en requirements.txt (tests/test_smtp_verify_async.py
+# lo comprueba); si una versión los cambia, se cae a comandos uno a uno.
+_PIPELINING_INTERNALS = ("_response_waiter", "_buffer", "_read_response_from_buffer")
+_pipelining_warned = False
+
+
+def _enable_pipelining(smtp: aiosmtplib.SMTP) -> bool:
+    """
+    aiosmtplib crea el protocolo internamente; se cambia su clase por la
+    subclase compatible (sin estado nuevo) una vez conectado. Retorna False
+    (sin tocar nada) si el protocolo no tiene los internos esperados.
+    """
+    global _pipelining_warned
+    protocol = smtp.protocol
+    if type(protocol) is not SMTPProtocol or not all(hasattr(protocol, a) for a in _PIPELINING_INTERNALS):
+        if not _pipelining_warned:
+            _pipelining_warned = True
+            logger.warning("aiosmtplib %s: SMTPProtocol internals changed, PIPELINING disabled",
+                           aiosmtplib.__version__)
+        return False
+    protocol.__class__ = _PipeliningProtocol
+    return True
+
+
+def _can_pipeline(smtp: aiosmtplib.SMTP) -> bool:
+    return smtp.supports_extension("pipelining") and isinstance(smtp.protocol, _PipeliningProtocol)
+
+
+# --------------------------------------------------
+# Conexión (happy eyeballs async)
+# --------------------------------------------------
+async def _targets(candidates) -> list:
+    loop = asyncio.get_running_loop()
+
+    async def addresses(host, port):
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return [(host, port, None, None)]
+        ordered = [(host, port, f, sockaddr) for f, sockaddr in order_addresses(infos)]
+        return ordered or [(host, port, None, None)]
+
+    groups = await asyncio.gather(*(addresses(h, p) for h, p in candidates))
+    return limit_attempts([t for group in groups for t in group])
+
+
+async def _open(host: str, port: int, family, sockaddr, timeout: float, helo_host: str) -> aiosmtplib.SMTP:
+    options = dict(
+        hostname=host, use_tls=(port == 465), start_tls=False, validate_certs=False,
+        timeout=timeout, local_hostname=helo_host,
+    )
+    if sockaddr is None:
+        smtp = aiosmtplib.SMTP(port=port, **options)
+        await smtp.connect()
+    else:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, sockaddr), timeout)
+            smtp = aiosmtplib.SMTP(sock=sock, **options)
+            await smtp.connect()
+        except BaseException:
+            sock.close()
+            raise
+    _enable_pipelining(smtp)
+    return smtp
+
+
+async def connect_first_async(candidates, timeout: float = 4, stagger: float = CONNECT_STAGGER,
+                              helo_host: str = DEFAULT_HELO, failed_hosts: Optional[set] = None):
+    """
+    `candidates`: [(host, port), ...] en orden de preferencia.
+    Retorna (smtp, host, port) de la primera conexión con saludo 220;
+    lanza SMTPConnectError si ninguna lo consigue. `failed_hosts` (opcional)
+    recibe los hosts con algún intento fallido, como smtp_connect.connect_first.
+    """
+    targets = await _targets(candidates)
+    tasks: dict[asyncio.Task, tuple] = {}
+    pending: set = set()
+    winner = None
+    errors = []
+    started = 0
+
+    try:
+        while winner is None:
+            if started < len(targets):
+                host, port, family, sockaddr = targets[started]
+                task = asyncio.ensure_future(_open(host, port, family, sockaddr, timeout, helo_host))
+                tasks[task] = targets[started]
+                pending.add(task)
+                started += 1
+            elif not pending:
+                raise SMTPConnectError(errors)
+
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=stagger if started < len(targets) else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            # Un fallo adelanta el siguiente intento (sin esperar el escalonado)
+            for task in done:
+                host, port, _, sockaddr = tasks[task]
+                if task.exception() is None:
+                    winner = winner or task
+                else:
+                    errors.append(describe_failure(host, port, task.exception(), sockaddr[0] if sockaddr else None))
+                    if failed_hosts is not None:
+                        failed_hosts.add(host)
+
+        host, port, _, _ = tasks[winner]
+        return winner.result(), host, port
+
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif task is not winner and not task.cancelled() and task.exception() is None:
+                task.result().close()     # ganador simultáneo descartado
+
+
+# --------------------------------------------------
+# Sesión: EHLO / STARTTLS / transacciones RCPT
+# --------------------------------------------------
+async def _setup(smtp: aiosmtplib.SMTP, port: int) -> dict:
+    """EHLO (y STARTTLS en 587, como smtp_verify). Retorna info de sesión."""
+    resp = await smtp.ehlo()
+    banner = resp.message
+    tls = False
+    if port == 587 and smtp.supports_extension("starttls"):
+        try:
+            await smtp.starttls()
+            await smtp.ehlo()
+            tls = True
+        except aiosmtplib.SMTPException:
+            pass
+    return {
+        "port": port,
+        "starttls": tls,
+        "esmtp_features": sorted(smtp.esmtp_extensions),
+        "banner": banner,
+    }
+
+
+async def _transaction(smtp: aiosmtplib.SMTP, from_address: str, rcpts: list,
+                       pipelining: bool, timeout: float):
+    """MAIL FROM + RCPT TO de `rcpts`; retorna (respuesta MAIL, [respuestas RCPT])."""
+    mail = f"MAIL FROM:<{from_address}>\r\n".encode("utf-8")
+    rcpt_cmds = [f"RCPT TO:<{r}>\r\n".encode("utf-8") for r in rcpts]
+
+    if pipelining:
+        # Una sola escritura; las respuestas llegan en el mismo orden
+        smtp.protocol.write(mail + b"".join(rcpt_cmds))
+        mail_resp = await smtp.protocol.read_response(timeout=timeout)
+        rcpt_resps = [await smtp.protocol.read_response(timeout=timeout) for _ in rcpt_cmds]
+        return mail_resp, rcpt_resps
+
+    mail_resp = await smtp.execute_command(b"MAIL", f"FROM:<{from_address}>".encode("utf-8"))
+    if mail_resp.code >= 400:
+        return mail_resp, []
+    rcpt_resps = []
+    for r in rcpts:
+        resp = await smtp.execute_command(b"RCPT", f"TO:<{r}>".encode("utf-8"))
+        rcpt_resps.append(resp)
+        if _is_too_many_recipients(resp.code, resp.message):
+            break
+    return mail_resp, rcpt_resps
+
+
+async def rcpt_batch_async(smtp: aiosmtplib.SMTP, from_address: str, rcpts: list,
+                           timeout: float = 10,
+                           max_rcpt_per_transaction: int = MAX_RCPT_PER_TRANSACTION) -> dict:
+    """
+    RCPT TO de `rcpts` sobre una sesión ya preparada (con PIPELINING si se anuncia).
+    Devuelve dict email -> (code, message); code None si no se pudo verificar.
+    """
+    pipelining = _can_pipeline(smtp)
+    results = {}
+    pending = list(rcpts)
+
+    while pending:
+        chunk = pending[:max_rcpt_per_transaction]
+        try:
+            mail_resp, rcpt_resps = await _transaction(smtp, from_address, chunk, pipelining, timeout)
+        except aiosmtplib.SMTPException as e:
+            for r in pending:
+                results[r] = (None, f"mail_from_error: {e}")
+            return results
+
+        if mail_resp.code >= 400:
+            for r in pending:
+                results[r] = (None, f"mail_from_rejected: {mail_resp.code} {mail_resp.message}")
+            return results
+
+        consumed = 0
+        for rcpt, resp in zip(chunk, rcpt_resps):
+            if consumed > 0 and _is_too_many_recipients(resp.code, resp.message):
+                # Límite del servidor: el resto va en otra transacción
+                break
+            results[rcpt] = (resp.code, resp.message)
+            consumed += 1
+        pending = pending[consumed:]
+        if not pending:
+            break
+
+        # RSET solo entre transacciones: al terminar, la sesión vuelve al pool
+        # (que manda RSET al devolverla) o se cierra con QUIT
+        try:
+            await smtp.execute_command(b"RSET")
+        except aiosmtplib.SMTPException as e:
+            for r in pending:
+                results[r] = (None, f"rset_error: {e}")
+            return results
+
+    return results
+
+
+async def _close(smtp: aiosmtplib.SMTP):
+    try:
+        await smtp.quit()
+    except Exception:
+        smtp.close()
+
+
+async def open_session(mx_host: str, ports=DEFAULT_PORTS, helo_host: str = DEFAULT_HELO,
+                       timeout: float = 10) -> aiosmtplib.SMTP:
+    """
+    Sesión lista para transacciones (puertos en carrera + EHLO/STARTTLS). La
+    info de sesión (_setup) queda en `smtp.session_info`, para quien la reuse
+    desde un pool.
+    """
+    smtp, _, port = await connect_first_async(connect_candidates(mx_host, ports), timeout=timeout,
+                                              helo_host=helo_host)
+    try:
+        smtp.session_info = await _setup(smtp, port)
+    except BaseException:
+        await _close(smtp)
+        raise
+    return smtp
+
+
+async def batch_rcpt_check_async(from_address: str, mx_host: str, emails: list, ports=DEFAULT_PORTS,
+                                 helo_host: str = DEFAULT_HELO, timeout: float = 10,
+                                 max_rcpt_per_transaction: int = MAX_RCPT_PER_TRANSACTION,
+                                 session_info: Optional[dict] = None, pool=None) -> dict:
+    """
+    Un MAIL FROM y muchos RCPT TO: una sesión (puertos en carrera) para todos
+    los `emails`. Devuelve dict email -> (code, message); code None si no se
+    pudo verificar. Lanza SMTPConnectError si no conecta.
+
+    Con `pool` (smtp_async.smtp_pool.SMTPConnectionPool) la sesión se toma del
+    pool y vuelve a él: límite de sesiones simultáneas por MX y reuso de la
+    conexión entre lotes (sin handshake ni EHLO nuevos).
+    """
+    async def run(smtp):
+        if session_info is not None:
+            session_info.update(smtp.session_info)
+        return await rcpt_batch_async(smtp, from_address, emails, timeout=timeout,
+                                      max_rcpt_per_transaction=max_rcpt_per_transaction)
+
+    if pool is not None:
+        async def factory(host):
+            return await open_session(host, ports, helo_host=helo_host, timeout=timeout)
+
+        async with pool.acquire(mx_host, factory=factory) as smtp:
+            return await run(smtp)
+
+    smtp = await open_session(mx_host, ports, helo_host=helo_host, timeout=timeout)
+    try:
+        return await run(smtp)
+    finally:
+        await _close(smtp)
+
+
+# --------------------------------------------------
+# Verificación de un email (mismo contrato que smtp_verify)
+# --------------------------------------------------
+async def smtp_verify_async(email: str, mx_host: str, timeout=4, known_catch_all: bool = None,
+                            ports=DEFAULT_PORTS, fallback_hosts=(),
+                            from_address: str = DEFAULT_FROM) -> SMTPVerifyResult:
+    start = time.time()
+    domain = email.split("@")[1]
+
+    early = precheck(email, mx_host, start)
+    if early is not None:
+        return early
+
+    candidates = connect_candidates(mx_host, ports, fallback_hosts)
+    failed = set()
+    last_error = ""
+    server_banner = None
+
+    while candidates:
+        try:
+            smtp, host, port = await connect_first_async(candidates, timeout=timeout, failed_hosts=failed)
+        except SMTPConnectError as e:
+            last_error = str(e)
+            break
+        # Si la sesión falla más adelante, se reintenta con el resto
+        candidates.remove((host, port))
+
+        try:
+            info = await _setup(smtp, port)
+            server_banner = info["banner"]
+
+            # Email real + dirección aleatoria (catch-all) en la misma transacción
+            probe = _random_address(domain) if known_catch_all is None else None
+            rcpts = [email] + ([probe] if probe else [])
+            replies = await rcpt_batch_async(smtp, from_address, rcpts, timeout=timeout)
+        except (aiosmtplib.SMTPException, OSError) as e:
+            last_error = str(e)
+            failed.add(host)        # conectó pero la sesión falló
+            continue
+        finally:
+            await _close(smtp)
+
+        code, msg = replies.get(email, (None, ""))
+        common = dict(
+            mx_host=host,
+            duration_ms=int((time.time() - start) * 1000),
+            server_banner=server_banner,
+            port=port,
+            starttls=info["starttls"],
+            esmtp_features=info["esmtp_features"],
+            failed_hosts=sorted(failed) or None,
+        )
+
+        if code is None and msg.startswith("mail_from_rejected"):
+            # No se puede verificar → servidor bloquea RCPT
+            return SMTPVerifyResult(
+                smtp_status="unknown",
+                code=int(msg.split()[1]),
+                message="Server rejected MAIL FROM (anti-spam).",
+                is_catch_all=False,
+                anti_spam=True,
+                greylisted=False,
+                **common,
+            )
+
+        verdict = catch_all_from_probe(replies.get(probe, (None, ""))[0]) if probe else None
+        is_catch = bool(verdict) if probe else known_catch_all
+
+        return SMTPVerifyResult(
+            smtp_status=classify_rcpt_code(code),
+            code=code or 0,
+            message=msg,
+            is_catch_all=is_catch,
+            anti_spam=is_anti_spam_banner(server_banner),
+            greylisted=code in (450, 451),
+            catch_all_checked=verdict is not None,
+            **common,
+        )
+
+    # Si NINGÚN host / puerto respondió
+    return SMTPVerifyResult(
+        smtp_status="unknown",
+        code=0,
+        message=last_error,
+        mx_host=mx_host,
+        is_catch_all=False,
+        anti_spam=False,
+        greylisted=False,
+        duration_ms=int((time.time() - start) * 1000),
+        server_banner=server_banner,
+        failed_hosts=sorted(failed) or None,
+    )
@@ -1,9 +1,13 @@
 # backend/app/verifier/web_fingerprint.py
 
 import requests
-from bs4 import BeautifulSoup
+
+from app.verifier.html_head import make_keyword_matcher, parse_head, visible_text
+from app.verifier.http_client import HTTP_MAX_BYTES
 
 TIMEOUT = 6
+# Solo se leen los primeros N bytes: alcanza para <head> y keywords de parking
+MAX_BYTES = HTTP_MAX_BYTES
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (EmailVerifierBot/1.0)"
 }
@@ -19,10 +23,11 @@ PARKING_KEYWORDS = [
     "namecheap",
     "hostgator"
 ]
+PARKING_RE = make_keyword_matcher(PARKING_KEYWORDS)
 
 
-def get_web_fingerprint(domain: str) -> dict:
-    result = {
+def _empty_result() -> dict:
+    return {
         "has_website": False,
         "http_status": None,
         "https": False,
@@ -33,6 +38,39 @@ def get_web_fingerprint(domain: str) -> dict:
         "looks_legit": False       # 👈 NUEVO
     }
 
+
+def _apply_html(result: dict, html: str):
+    # Solo <head> (title, meta description, favicon): corta en </head> / <body>
+    head = parse_head(html, max_bytes=MAX_BYTES)
+
+    result["title"] = head.title
+    if head.meta_description:
+        result["meta_description"] = head.meta_description
+    if head.has_favicon:
+        result["has_favicon"] = True
+
+    # Detectar parking REAL (una sola regex sobre el texto sin tags)
+    if PARKING_RE.search(visible_text(html, max_bytes=MAX_BYTES)):
+        result["is_empty"] = True
+        result["looks_legit"] = False
+    else:
+        # No es parking → aunque sea web simple
+        result["is_empty"] = False
+        result["looks_legit"] = True
+
+
+def _read_capped(resp, max_bytes: int = MAX_BYTES) -> str:
+    buf = bytearray()
+    for chunk in resp.iter_content(chunk_size=8192):
+        buf.extend(chunk)
+        if len(buf) >= max_bytes:
+            break
+    return bytes(buf[:max_bytes]).decode(resp.encoding or "utf-8", errors="ignore")
+
+
+def get_web_fingerprint(domain: str) -> dict:
+    result = _empty_result()
+
     urls = [
         f"https://{domain}",
         f"http://{domain}"
@@ -40,48 +78,22 @@ def get_web_fingerprint(domain: str) -> dict:
 
     for url in urls:
         try:
-            resp = requests.get(
+            with requests.get(
                 url,
                 headers=HEADERS,
                 timeout=TIMEOUT,
-                allow_redirects=True
-            )
-
-            result["http_status"] = resp.status_code
-
-            if resp.status_code >= 400:
-                continue
-
-            result["has_website"] = True
-            result["https"] = resp.url.startswith("https")
-
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            # Title
-            title = soup.title.string.strip() if soup.title and soup.title.string else None
-            result["title"] = title
+                allow_redirects=True,
+                stream=True
+            ) as resp:
+                result["http_status"] = resp.status_code
 
-            # Meta description
-            desc = soup.find("meta", attrs={"name": "description"})
-            if desc and desc.get("content"):
-                result["meta_description"] = desc["content"].strip()
+                if resp.status_code >= 400:
+                    continue
 
-            # Favicon
-            favicon = soup.find("link", rel=lambda x: x and "icon" in x.lower())
-            if favicon:
-                result["has_favicon"] = True
+                result["has_website"] = True
+                result["https"] = resp.url.startswith("https")
 
-            # Texto visible
-            text = soup.get_text(" ", strip=True).lower()
-
-            # Detectar parking REAL
-            if any(keyword in text for keyword in PARKING_KEYWORDS):
-                result["is_empty"] = True
-                result["looks_legit"] = False
-            else:
-                # No es parking → aunque sea web simple
-                result["is_empty"] = False
-                result["looks_legit"] = True
+                _apply_html(result, _read_capped(resp))
 
             break
 
@@ -89,3 +101,35 @@ def get_web_fingerprint(domain: str) -> dict:
             continue
 
     return result
+
+
+# --------------------------------------------------
+# Versión async (pool compartido, lectura acotada)
+# --------------------------------------------------
+def fingerprint_from_probe(probe) -> dict:
+    """Construye el fingerprint a partir de una DomainProbe (domain_probe)."""
+    result = _empty_result()
+    result["scheme"] = probe.scheme
+    result["http_status"] = probe.http_status
+
+    if not probe.reachable:
+        return result
+
+    result["has_website"] = True
+    result["https"] = (probe.final_url or "").startswith("https")
+    result["title"] = probe.title
+    if probe.meta_description:
+        result["meta_description"] = probe.meta_description
+    if probe.has_favicon:
+        result["has_favicon"] = True
+
+    # Detectar parking REAL
+    if any(k in probe.parking_hits for k in PARKING_KEYWORDS):
+        result["is_empty"] = True
+        result["looks_legit"] = False
+    else:
+        # No es parking → aunque sea web simple
+        result["is_empty"] = False
+        result["looks_legit"] = True
+
+    return result
@@ -0,0 +1,202 @@
+# backend/app/verifier/whois_store.py
+
+"""
+Store persistente de fechas de creación de dominios (WHOIS)
+-----------------------------------------------------------
+La fecha de creación de un dominio prácticamente nunca cambia, pero WHOIS es
+la señal más lenta y más limitada por rate-limit. Este store local (SQLite)
+se consulta primero y se alimenta con cada lookup en vivo.
+
+Formato compacto: una tabla WITHOUT ROWID (clustered por dominio) con la fecha
+como ordinal de días (INTEGER). Millones de dominios caben en unos cientos de MB
+y cada lectura es un lookup por clave primaria.
+
+Los lookups en vivo que responden sin fecha de creación se guardan aparte
+con un TTL corto (WHOIS_NO_DATE_TTL): no se repite WHOIS para ese dominio en
+cada verificación, pero se vuelve a intentar pasado el TTL. Los errores
+(timeout, rate-limit) no se guardan.
+
+Ruta: WHOIS_STORE_PATH; si es relativa (o no se define) se resuelve contra
+la raíz del proyecto, no contra el directorio de trabajo, para que API y
+worker usen el mismo fichero.
+
+Importación masiva desde CSV (dominio,fecha):
+    python -m app.verifier.whois_store import fechas.csv
+"""
+
+import os
+import sys
+import csv
+import sqlite3
+import time
+import logging
+import datetime
+import threading
+from typing import Iterable, Optional
+
+logger = logging.getLogger("whois_store")
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WHOIS_STORE_PATH = os.path.join(
+    _PROJECT_ROOT, os.environ.get("WHOIS_STORE_PATH", os.path.join("data", "whois_store.sqlite3"))
+)
+WHOIS_NO_DATE_TTL = int(os.environ.get("WHOIS_NO_DATE_TTL", str(7 * 24 * 3600)))
+IMPORT_CHUNK = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domain_created (
+    domain  TEXT PRIMARY KEY,
+    created INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS domain_no_date (
+    domain     TEXT PRIMARY KEY,
+    checked_at INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _parse_date(value) -> Optional[datetime.date]:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if not value:
+        return None
+    try:
+        # "2009-03-17", "2009-03-17T10:00:00Z", "2009-03-17 10:00:00"
+        return datetime.date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+class WhoisStore:
+    def __init__(self, path: str = WHOIS_STORE_PATH):
+        self.path = path
+        self._local = threading.local()   # una conexión SQLite por hilo
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --------------------------------------------------
+    # Lectura / escritura
+    # --------------------------------------------------
+    def get_creation_date(self, domain: str) -> Optional[datetime.date]:
+        row = self._conn().execute(
+            "SELECT created FROM domain_created WHERE domain = ?", (domain.lower(),)
+        ).fetchone()
+        return datetime.date.fromordinal(row[0]) if row else None
+
+    def put(self, domain: str, created) -> bool:
+        created = _parse_date(created)
+        if created is None:
+            return False
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO domain_created (domain, created) VALUES (?, ?)",
+                (domain.lower(), created.toordinal()),
+            )
+        return True
+
+    def put_no_date(self, domain: str, now: Optional[float] = None):
+        """WHOIS respondió sin fecha de creación."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO domain_no_date (domain, checked_at) VALUES (?, ?)",
+                (domain.lower(), int(time.time() if now is None else now)),
+            )
+
+    def has_recent_no_date(self, domain: str, ttl: int = WHOIS_NO_DATE_TTL,
+                           now: Optional[float] = None) -> bool:
+        row = self._conn().execute(
+            "SELECT checked_at FROM domain_no_date WHERE domain = ?", (domain.lower(),)
+        ).fetchone()
+        now = time.time() if now is None else now
+        return row is not None and now - row[0] < ttl
+
+    def bulk_import(self, rows: Iterable, chunk: int = IMPORT_CHUNK) -> int:
+        """
+        Importa (dominio, fecha) en transacciones de `chunk` filas.
+        Filas con fecha inválida se ignoran. Retorna filas importadas.
+        """
+        conn = self._conn()
+        total = 0
+        batch = []
+
+        def flush():
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO domain_created (domain, created) VALUES (?, ?)",
+                    batch,
+                )
+
+        for domain, created in rows:
+            created = _parse_date(created)
+            if not domain or created is None:
+                continue
+            batch.append((domain.strip().lower(), created.toordinal()))
+            if len(batch) >= chunk:
+                flush()
+                total += len(batch)
+                batch = []
+
+        if batch:
+            flush()
+            total += len(batch)
+
+        return total
+
+    def import_csv(self, path: str, domain_col: int = 0, date_col: int = 1) -> int:
+        """CSV dominio,fecha (ISO). Una cabecera no parseable se ignora sola."""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = (
+                (row[domain_col], row[date_col])
+                for row in csv.reader(f)
+                if len(row) > max(domain_col, date_col)
+            )
+            return self.bulk_import(rows)
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM domain_created").fetchone()[0]
+
+
+# --------------------------------------------------
+# Instancia compartida por proceso
+# --------------------------------------------------
+_store: Optional[WhoisStore] = None
+_store_lock = threading.Lock()
+
+
+def get_whois_store() -> Optional[WhoisStore]:
+    """Store del proceso; None si no se puede abrir (el WHOIS en vivo sigue funcionando)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = WhoisStore()
+                except Exception as e:
+                    logger.warning(f"WHOIS store unavailable ({WHOIS_STORE_PATH}): {e}")
+                    return None
+    return _store
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3 or sys.argv[1] != "import":
+        print("uso: python -m app.verifier.whois_store import <archivo.csv>")
+        sys.exit(1)
+    store = WhoisStore()
+    n = store.import_csv(sys.argv[2])
+    logger.info(f"Importados {n} dominios; total en store: {store.count()}")
@@ -36,118 +36,204 @@ Salida por email:
 Notas:
 - El motor es tolerant: usa fallback si alguno de los módulos no está presente.
 - Diseñado para correr dentro de un worker (ej: worker_full.py). No arranca servidores.
+- Ninguna etapa bloquea el event loop: DNS, HTTP y SMTP son async (SMTP con
+  aiosmtplib y PIPELINING) o corren en el executor (WHOIS), de modo que un
+  worker puede tener cientos de verificaciones en vuelo.
 """
+import os
+import asyncio
 import logging
-
-from app.verifier.dns_mx import get_mx_records, MXRecord
-from app.verifier.domain_classifier import classify_domain
-from app.verifier.smtp_verify import smtp_verify
-from app.verifier.web_fingerprint import get_web_fingerprint
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from app.domain_cache import DomainCache
+from app.verifier.dns_mx import MXRecord
+from app.verifier.domain_context import DomainContext
+from app.verifier.mx_capabilities import port_order
+from app.verifier.mx_health import MX_MAX_FAILOVER
+from app.verifier.rcpt_batcher import RcptBatcher
+from app.verifier.smtp_verify import NON_VERIFIABLE_DOMAINS, smtp_verify
+from app.verifier.smtp_verify_async import smtp_verify_async
 
 logger = logging.getLogger("verify_engine")
 
+# Límites por defecto de verify_batch (dominios en paralelo / emails en paralelo por dominio)
+BATCH_DOMAIN_CONCURRENCY = int(os.environ.get("VERIFY_BATCH_DOMAIN_CONCURRENCY", "50"))
+BATCH_PER_DOMAIN_CONCURRENCY = int(os.environ.get("VERIFY_BATCH_PER_DOMAIN_CONCURRENCY", "25"))
+
 ROLE_NAMES = {
     "info", "admin", "sales", "contact",
     "support", "hello", "team", "office"
 }
 
-# --------------------------------------------------
-# Verify single email (COMMERCIAL MODE)
-# --------------------------------------------------
-async def verify_single_email(email: str) -> dict:
-    # -------------------------------
-    # Syntax
-    # -------------------------------
-    if "@" not in email:
-        return {
-            "email": email,
-            "domain": "",
-            "status": "undeliverable",
-            "score": 0,
-            "reason": "Invalid syntax"
-        }
-
-    local, domain = email.split("@", 1)
-
-    # -------------------------------
-    # DNS MX
-    # -------------------------------
-    try:
-        mx_records: list[MXRecord] = get_mx_records(domain)
-    except Exception:
-        mx_records = []
+def no_mx_result(email: str, domain: str) -> dict:
+    """Veredicto para dominios sin MX utilizables (también usado en bloque por el worker)."""
+    return {
+        "email": email,
+        "domain": domain,
+        "status": "risky",
+        "score": 20,
+        "reason": "Domain has no MX records"
+    }
 
-    if not mx_records:
-        return {
-            "email": email,
-            "domain": domain,
-            "status": "risky",
-            "score": 20,
-            "reason": "Domain has no MX records"
-        }
 
-    # -------------------------------
-    # Domain classification
-    # -------------------------------
-    domain_info = classify_domain(domain, mx_records)
-
-    # -------------------------------
-    # Web fingerprint (Layer 4)
-    # -------------------------------
-    web = get_web_fingerprint(domain)
+def _result(state: "EmailState", status: str, score: int, reason: str) -> dict:
+    return {
+        "email": state.email,
+        "domain": state.domain,
+        "status": status,
+        "score": score,
+        "reason": reason
+    }
 
-    # -------------------------------
-    # Role-based
-    # -------------------------------
-    if local.lower() in ROLE_NAMES:
-        return {
-            "email": email,
-            "domain": domain,
-            "status": "risky",
-            "score": 40,
-            "reason": "Role-based email"
-        }
 
-    # -------------------------------
-    # SMTP (best effort)
-    # -------------------------------
-    smtp_res = None
+# --------------------------------------------------
+# Checks declarativos
+# --------------------------------------------------
+class EmailState:
+    """Estado que los checks van completando para un email."""
+    def __init__(self, email: str, ctx: DomainContext, retry_greylisted: bool = False):
+        self.email = email
+        self.ctx = ctx
+        self.retry_greylisted = retry_greylisted
+        self.local, _, self.domain = email.partition("@")
+        self.mx_records: list[MXRecord] = []
+        self.domain_info: dict = {}
+        self.smtp_res = None
+
+
+@dataclass(frozen=True)
+class Check:
+    """
+    name:     identificador del check
+    cost:     coste estimado relativo (0-9 = CPU, >=10 = red)
+    verdicts: status terminales que el check puede producir; () = nunca decide
+    run:      coroutine que retorna un resultado terminal o None para continuar
+    needed:   predicado opcional; si retorna False el check no aporta nada y se salta
+    final:    el check siempre decide (promoción heurística) -> se ejecuta el último
+    """
+    name: str
+    cost: int
+    verdicts: tuple
+    run: Callable[[EmailState], Awaitable[Optional[dict]]]
+    needed: Optional[Callable[[EmailState], bool]] = None
+    final: bool = False
+
+
+async def _check_syntax(state: EmailState) -> Optional[dict]:
+    if "@" not in state.email:
+        return _result(state, "undeliverable", 0, "Invalid syntax")
+    return None
+
+
+async def _check_role(state: EmailState) -> Optional[dict]:
+    if state.local.lower() in ROLE_NAMES:
+        return _result(state, "risky", 40, "Role-based email")
+    return None
+
+
+async def _check_mx(state: EmailState) -> Optional[dict]:
+    try:
+        state.mx_records = await state.ctx.mx(state.domain)
+    except Exception:
+        state.mx_records = []
+
+    if not state.mx_records:
+        return no_mx_result(state.email, state.domain)
+
+    state.domain_info = await state.ctx.classification(state.domain)
+    return None
+
+
+async def _smtp_batched(state: EmailState, hosts: list[str], known_catch_all: Optional[bool]):
+    """
+    RCPT TO agrupado con el resto de emails del dominio; failover host a host.
+    La salud del host la registra el RcptBatcher, una vez por sesión.
+    """
+    for mx_host in hosts:
+        # Puerto que ya respondió para este MX primero (sin timeouts repetidos)
+        ports = port_order(await state.ctx.mx_capabilities(mx_host))
+        try:
+            res = await state.ctx.rcpt_batcher.check(state.email, mx_host, known_catch_all, ports=ports)
+        except Exception:
+            logger.debug("SMTP check failed for %s via %s", state.email, mx_host, exc_info=True)
+            res = None
+        if res is not None and res.port is not None:
+            return res
+    return None
+
+
+async def _smtp_raced(state: EmailState, hosts: list[str], known_catch_all: Optional[bool]):
+    """Sesión propia (async), conectando en carrera escalonada contra MX / puertos."""
+    health = state.ctx.mx_health
+    ports = port_order(await state.ctx.mx_capabilities(hosts[0]))
+    res = await smtp_verify_async(
+        state.email, hosts[0], known_catch_all=known_catch_all,
+        ports=ports, fallback_hosts=hosts[1:],
+    )
+    # Solo cuentan como fallo los hosts con un intento fallido (no los que
+    # se descartaron porque otro respondió antes o no llegaron a probarse)
+    for mx_host in res.failed_hosts or ():
+        if mx_host != res.mx_host or res.port is None:
+            health.record_failure(mx_host, res.duration_ms)
+    if res.port is not None:
+        health.record(res.mx_host, res)
+        return res
+    return None
+
+
+async def _check_smtp(state: EmailState) -> Optional[dict]:
     try:
-        if domain_info.get("smtp_verifiable"):
-            smtp_res = smtp_verify(
-                email=email,
-                mx_host=mx_records[0].host
-            )
+        # Catch-all ya conocido del dominio: se omite el RCPT de prueba
+        known_catch_all = await state.ctx.catch_all(state.domain)
+
+        # Failover: MX por prioridad, saltando hosts con el circuito abierto
+        hosts = state.ctx.mx_health.order_hosts(state.mx_records)[:MX_MAX_FAILOVER]
+
+        if state.domain.lower() in NON_VERIFIABLE_DOMAINS:
+            # No se conecta: no cuenta para la salud del host
+            state.smtp_res = smtp_verify(email=state.email, mx_host=state.mx_records[0].host)
+        elif not hosts:
+            # Todos los MX con el circuito abierto: sin RCPT no hay base para
+            # promocionar por la web (un 550 pasaría por entregable)
+            return _result(state, "unknown", 0, "MX temporarily unavailable")
+        elif state.ctx.rcpt_batcher is not None:
+            state.smtp_res = await _smtp_batched(state, hosts, known_catch_all)
+        else:
+            state.smtp_res = await _smtp_raced(state, hosts, known_catch_all)
+
+        if state.smtp_res is not None and state.smtp_res.port is not None:
+            if state.smtp_res.catch_all_checked:
+                await state.ctx.record_catch_all(state.domain, state.smtp_res.is_catch_all)
+            await state.ctx.record_mx_capabilities(state.smtp_res)
     except Exception:
-        smtp_res = None
+        state.smtp_res = None
 
-    # -------------------------------
     # HARD FAIL (SMTP explicit invalid)
-    # -------------------------------
-    if smtp_res and smtp_res.smtp_status == "invalid":
-        return {
-            "email": email,
-            "domain": domain,
-            "status": "undeliverable",
-            "score": 5,
-            "reason": "Mailbox does not exist"
-        }
+    if state.smtp_res and state.smtp_res.smtp_status == "invalid":
+        return _result(state, "undeliverable", 5, "Mailbox does not exist")
 
-    # -------------------------------
     # Catch-all
-    # -------------------------------
-    if smtp_res and getattr(smtp_res, "is_catch_all", False):
-        return {
-            "email": email,
-            "domain": domain,
-            "status": "risky",
-            "score": 50,
-            "reason": "Catch-all domain"
-        }
+    if state.smtp_res and getattr(state.smtp_res, "is_catch_all", False):
+        return _result(state, "risky", 50, "Catch-all domain")
+
+    # Greylisting (450/451): si el llamador aún puede reintentar, marcador de
+    # reintento (el worker lo reprograma en app.greylist_queue); si no, sigue
+    # al check web como cualquier SMTP sin veredicto
+    if state.smtp_res and state.smtp_res.greylisted and state.retry_greylisted:
+        res = _result(state, "unknown", 0, "Greylisted, retry pending")
+        res["retry"] = True
+        return res
+
+    return None
 
+
+async def _check_web_promotion(state: EmailState) -> dict:
     # -------------------------------
     # COMMERCIAL HEURISTIC PROMOTION
     # -------------------------------
+    web = await state.ctx.web(state.domain)
     confidence = 0
 
     if web.get("has_website"):
@@ -163,50 +249,165 @@ async def verify_single_email(email: str) -> dict:
     if web.get("is_empty"):
         confidence -= 30
 
+    # Greylisting sin más reintentos: mismo veredicto, motivo propio
+    greylisted = bool(state.smtp_res and state.smtp_res.greylisted)
+
     # Dominio claramente inventado
     if confidence < 20:
-        return {
-            "email": email,
-            "domain": domain,
-            "status": "risky",
-            "score": 20,
-            "reason": "Low domain trust"
-        }
+        return _result(state, "risky", 20, "Greylisted, low domain trust" if greylisted else "Low domain trust")
 
     # -------------------------------
     # 🔥 ESTE ES EL CAMBIO CLAVE 🔥
     # -------------------------------
     # SMTP timeout + dominio real = DELIVERABLE
-    return {
-        "email": email,
-        "domain": domain,
-        "status": "deliverable",
-        "score": min(90, 70 + confidence),
-        "reason": "High probability of delivery"
-    }
-
-
-async def verify_batch(emails: list[str]) -> list[dict]:
-    return [await verify_single_email(e) for e in emails]
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    return _result(state, "deliverable", min(90, 70 + confidence),
+                   "Greylisted, high probability of delivery" if greylisted else "High probability of delivery")
+
+
+# En orden de precedencia: si dos checks deciden, gana el primero (p.ej. un
+# dominio sin MX es "Domain has no MX records" aunque la dirección sea de rol)
+CHECKS: tuple[Check, ...] = (
+    Check("syntax", 0, ("undeliverable",), _check_syntax),
+    Check("mx", 10, ("risky",), _check_mx),
+    Check("role", 1, ("risky",), _check_role),
+    Check("smtp", 100, ("undeliverable", "risky", "unknown"), _check_smtp,
+          needed=lambda st: bool(st.domain_info.get("smtp_verifiable"))),
+    Check("web", 50, ("risky", "deliverable"), _check_web_promotion, final=True),
+)
+
+
+def plan_checks(checks=CHECKS) -> list[tuple[int, Check]]:
+    """
+    Orden de ejecución: primero los checks baratos (CPU), luego los de red por
+    coste creciente; el check `final` (que siempre decide) va el último.
+    Cada check va con su precedencia (posición en `checks`) para run_plan.
+    """
+    ranked = list(enumerate(checks))
+    return sorted(ranked, key=lambda rc: (rc[1].final, rc[1].cost))
+
+
+_PLAN = plan_checks()
+
+
+async def run_plan(state: EmailState, plan=_PLAN) -> Optional[dict]:
+    """
+    Ejecuta el plan y retorna el veredicto del check de mayor precedencia.
+    Con un veredicto ya obtenido solo corre lo que aún puede cambiarlo: los
+    checks de mayor precedencia que declaran verdicts. Los de menor
+    precedencia (p.ej. SMTP y web tras un "Role-based email") se saltan.
+    """
+    decided: Optional[tuple[int, dict]] = None
+    for rank, check in plan:
+        if decided is not None and (rank > decided[0] or not check.verdicts):
+            continue
+        if check.needed is not None and not check.needed(state):
+            continue
+        result = await check.run(state)
+        if result is not None and (decided is None or rank < decided[0]):
+            decided = (rank, result)
+    return decided[1] if decided is not None else None
 
 
+# --------------------------------------------------
+# Verify single email (COMMERCIAL MODE)
+# --------------------------------------------------
+async def verify_single_email(email: str, ctx: Optional[DomainContext] = None,
+                              retry_greylisted: bool = False) -> dict:
+    """
+    `ctx` comparte las señales de dominio (MX, clasificación, web) entre
+    todos los emails de un mismo job. Sin ctx se usa uno efímero.
+
+    `retry_greylisted`: el llamador puede reprogramar un greylisting; el
+    resultado lleva entonces `"retry": True` en vez de un veredicto final.
+
+    Los checks se ejecutan según `plan_checks` / `run_plan`: baratos primero
+    y sin etapas de red que ya no puedan cambiar el veredicto.
+    """
+    own_ctx = ctx is None
+    if own_ctx:
+        ctx = DomainContext()
 
+    try:
+        state = EmailState(email, ctx, retry_greylisted)
+        result = await run_plan(state)
+        # None no debería ocurrir: el check final siempre decide
+        return result if result is not None else _result(state, "unknown", 0, "No verdict")
+    finally:
+        if own_ctx:
+            await ctx.aclose()
 
 
+# --------------------------------------------------
+# Batch (agrupado por dominio)
+# --------------------------------------------------
+def _domain_of(email: str) -> str:
+    return email.split("@", 1)[1].lower() if "@" in email else ""
+
+
+async def verify_batch(
+    emails: list[str],
+    concurrency: int = BATCH_DOMAIN_CONCURRENCY,
+    per_domain_concurrency: int = BATCH_PER_DOMAIN_CONCURRENCY,
+    on_result: Optional[Callable[[int, dict], Awaitable[None]]] = None,
+    cache: Optional[DomainCache] = None,
+    rcpt_batcher: Optional[RcptBatcher] = None,
+    retry_greylisted: Optional[Callable[[int], bool]] = None,
+) -> list[dict]:
+    """
+    Verifica una lista de emails agrupándolos por dominio.
+
+    - Los grupos (dominios) corren en paralelo, como máximo `concurrency` a la vez.
+    - Dentro de un dominio hay como máximo `per_domain_concurrency` emails en vuelo;
+      sus RCPT TO se agrupan en lotes sobre sesiones SMTP compartidas
+      (`rcpt_batcher`; el worker pasa uno compartido entre jobs, si no se pasa
+      se crea uno para esta llamada y se cierra al terminar).
+    - `on_result(index, result)` se invoca a medida que cada email termina
+      (útil para persistir progresivamente en jobs grandes).
+    - Las señales de dominio se calculan una sola vez por dominio (DomainContext)
+      y, si se pasa `cache`, se comparten entre workers vía Redis.
+    - `retry_greylisted(index)` indica si al email aún le queda un reintento
+      por greylisting (ver verify_single_email).
+
+    Retorna los resultados en el mismo orden que `emails`.
+    """
+    groups: dict[str, list[int]] = defaultdict(list)
+    for i, email in enumerate(emails):
+        groups[_domain_of(email)].append(i)
+
+    results: list[Optional[dict]] = [None] * len(emails)
+    own_batcher = rcpt_batcher is None
+    if own_batcher:
+        rcpt_batcher = RcptBatcher()
+    ctx = DomainContext(cache=cache, rcpt_batcher=rcpt_batcher)
+    domain_sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(i: int, sem: asyncio.Semaphore):
+        async with sem:
+            try:
+                retry = retry_greylisted is not None and retry_greylisted(i)
+                res = await verify_single_email(emails[i], ctx, retry_greylisted=retry)
+            except Exception:
+                logger.exception("verify_single_email failed for %s", emails[i])
+                res = {
+                    "email": emails[i],
+                    "domain": _domain_of(emails[i]),
+                    "status": "unknown",
+                    "score": 0,
+                    "reason": "Verification error"
+                }
+        results[i] = res
+        if on_result is not None:
+            await on_result(i, res)
+
+    async def run_group(indexes: list[int]):
+        async with domain_sem:
+            sem = asyncio.Semaphore(max(1, per_domain_concurrency))
+            await asyncio.gather(*(run_one(i, sem) for i in indexes))
 
+    try:
+        await asyncio.gather(*(run_group(ix) for ix in groups.values()))
+    finally:
+        await ctx.aclose()
+        if own_batcher:
+            await rcpt_batcher.close()
+    return results
@@ -24,6 +24,8 @@ import os
 import json
 import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 # Redis
 try:
@@ -33,10 +35,32 @@ except Exception:
 
 # Motor central
 try:
-    from app.verify_engine import verify_batch
+    from app.verify_engine import verify_batch, no_mx_result
+    from app.verifier.dns_prefetch import prefetch_domains
+    from app.verifier.rcpt_batcher import RcptBatcher
+    from smtp_async.redis_lua import RateLimiter
 except Exception as e:
     print("ERROR cargando verify_engine:", e)
     verify_batch = None
+    RcptBatcher = None
+
+# Cliente HTTP compartido de las sondas web
+try:
+    from app.verifier.http_client import close_http_session
+except Exception:
+    close_http_session = None
+
+# Cache compartido de dominios (L1 + Redis)
+try:
+    from app.domain_cache import get_domain_cache
+except Exception:
+    get_domain_cache = None
+
+# Cola diferida de reintentos por greylisting
+try:
+    from app.greylist_queue import GreylistQueue, GREYLIST_POLL_INTERVAL
+except Exception:
+    GreylistQueue = None
 
 # DB CRUD
 try:
@@ -52,7 +76,14 @@ logger = logging.getLogger("worker_full")
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 REDIS_QUEUE_KEY = os.environ.get("REDIS_QUEUE_KEY", "email_jobs")
 WORKER_SLEEP_EMPTY = float(os.environ.get("WORKER_SLEEP_EMPTY", "1.0"))
-WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "10"))
+# Dominios verificados en paralelo dentro de un job (ver verify_engine.verify_batch)
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "100"))
+# Hilos del executor por defecto del loop. DNS / HTTP / SMTP ya son async:
+# solo lo usan los loop.getaddrinfo de aiohttp y de las conexiones SMTP
+# (llamadas cortas; WHOIS tiene su propio executor en domain_infra).
+WORKER_IO_THREADS = int(os.environ.get("WORKER_IO_THREADS", "32"))
+# Jobs procesados a la vez: sus RCPT TO al mismo dominio comparten sesiones SMTP
+WORKER_MAX_JOBS = int(os.environ.get("WORKER_MAX_JOBS", "4"))
 
 # --------------------------------------------------
 # Normalización final (corregido)
@@ -121,20 +152,29 @@ async def persist_result(job_id: str, result: dict):
         logger.exception("Failed inserting result: %s", e)
 
 # --------------------------------------------------
-# Pipeline por email
+# Resultado final o reintento diferido
 # --------------------------------------------------
-async def verify_email_pipeline(job_id: str, email: str):
-    if verify_batch is None:
-        raise RuntimeError("verify_engine.verify_batch no cargado")
-
-    # verify_batch retorna resultado ya con status correcto
-    results = await verify_batch([email])
-    raw = results[0]
-
-    # Normalización final basada en status
-    normalized = normalize_result(raw)
+async def handle_result(job_id: str, index: int, email: str, raw: dict,
+                        attempt: int = 0, retry_queue=None, claimed: Optional[dict] = None) -> Optional[dict]:
+    """
+    Persiste el resultado normalizado, salvo que el motor marque reintento
+    (greylisting) y queden reintentos: entonces se aparca en la cola diferida
+    y retorna None. `attempt` = reintentos ya hechos para este email;
+    `claimed` = elemento de la cola que se está reintentando (se libera solo
+    tras guardar o reprogramar, así un fallo a mitad no lo pierde).
+    """
+    if raw.get("retry"):
+        try:
+            if retry_queue is not None and \
+                    await retry_queue.schedule(job_id, index, email, attempt, claimed=claimed):
+                return None
+        except Exception:
+            logger.exception("Failed scheduling retry for %s", email)
+        # No se pudo reprogramar: el resultado queda como final
+        raw = {**raw, "reason": "Greylisted, retry could not be scheduled"}
 
-    await persist_result(job_id, normalized)
+    res = normalize_result(raw)
+    await persist_result(job_id, res)
 
     if update_job_processed:
         try:
@@ -142,14 +182,162 @@ async def verify_email_pipeline(job_id: str, email: str):
         except Exception:
             logger.exception("Failed update_job_processed")
 
+    if attempt > 0 and retry_queue is not None:
+        try:
+            if await retry_queue.resolve(job_id, claimed=claimed) == 0:
+                logger.info("Job %s finished (greylisting retries resolved)", job_id)
+        except Exception:
+            logger.exception("Failed updating retry counter for job %s", job_id)
+
+    return res
+
+
+# --------------------------------------------------
+# Pipeline por job
+# --------------------------------------------------
+async def verify_job_pipeline(job_id: str, emails: list[str], rcpt_batcher=None,
+                              retry_queue=None) -> list[Optional[dict]]:
+    """
+    1. Prefetch DNS de todos los dominios distintos del job (un solo fan-out).
+    2. Los emails de dominios sin MX / con MX de parking se cierran en bloque.
+    3. El resto se verifica con verify_batch (agrupado por dominio), que ya
+       encuentra las respuestas DNS en cache.
+    Cada resultado se persiste en cuanto termina. `rcpt_batcher` es el
+    agregador de RCPT TO del worker, compartido con los demás jobs en curso.
+    Los emails con greylisting van a `retry_queue` (su posición queda a None)
+    y el job sigue abierto hasta que el scheduler los resuelve.
+    """
+    if verify_batch is None:
+        raise RuntimeError("verify_engine.verify_batch no cargado")
+
+    normalized: list[Optional[dict]] = [None] * len(emails)
+
+    async def on_result(index: int, raw: dict):
+        normalized[index] = await handle_result(job_id, index, emails[index], raw, retry_queue=retry_queue)
+
+    domains = [e.split("@", 1)[1].lower() for e in emails if "@" in e]
+    dns_info = await prefetch_domains(domains)
+
+    pending: list[int] = []
+    closed = []
+    for i, email in enumerate(emails):
+        domain = email.split("@", 1)[1].lower() if "@" in email else ""
+        info = dns_info.get(domain)
+        if info is not None and info.is_dead:
+            closed.append(on_result(i, no_mx_result(email, domain)))
+        else:
+            pending.append(i)
+    await asyncio.gather(*closed)
+
+    logger.info(
+        "Job %s: %d emails closed by DNS prefetch, %d to verify",
+        job_id, len(emails) - len(pending), len(pending)
+    )
+
+    async def on_pending_result(sub_index: int, raw: dict):
+        await on_result(pending[sub_index], raw)
+
+    cache = get_domain_cache() if get_domain_cache else None
+    await verify_batch(
+        [emails[i] for i in pending],
+        concurrency=WORKER_CONCURRENCY,
+        on_result=on_pending_result,
+        cache=cache,
+        rcpt_batcher=rcpt_batcher,
+        retry_greylisted=(lambda i: retry_queue.can_retry(0)) if retry_queue is not None else None,
+    )
+
+    if cache is not None:
+        logger.info("Domain cache stats: %s", cache.stats())
+
     return normalized
 
+# --------------------------------------------------
+# Scheduler de reintentos (greylisting)
+# --------------------------------------------------
+async def retry_due(items: list[dict], retry_queue, rcpt_batcher=None):
+    """Re-verifica un lote de reintentos vencidos (de uno o varios jobs)."""
+    async def on_retry_result(i: int, raw: dict):
+        item = items[i]
+        await handle_result(item["job_id"], item["index"], item["email"], raw,
+                            attempt=item["attempt"] + 1, retry_queue=retry_queue, claimed=item)
+
+    cache = get_domain_cache() if get_domain_cache else None
+    await verify_batch(
+        [item["email"] for item in items],
+        concurrency=WORKER_CONCURRENCY,
+        on_result=on_retry_result,
+        cache=cache,
+        rcpt_batcher=rcpt_batcher,
+        retry_greylisted=lambda i: retry_queue.can_retry(items[i]["attempt"] + 1),
+    )
+
+
+async def retry_scheduler(retry_queue, rcpt_batcher=None):
+    """Recoge los reintentos vencidos del sorted set y los lanza sin bloquear el loop."""
+    running: set[asyncio.Task] = set()
+    try:
+        while True:
+            try:
+                items = await retry_queue.pop_due()
+            except Exception:
+                logger.exception("Failed reading retry queue")
+                items = []
+            if not items:
+                await asyncio.sleep(GREYLIST_POLL_INTERVAL)
+                continue
+
+            logger.info("Retrying %d greylisted emails", len(items))
+            task = asyncio.create_task(retry_due(items, retry_queue, rcpt_batcher))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+
 # --------------------------------------------------
 # Loop principal del worker
 # --------------------------------------------------
+async def run_job(payload: dict, rcpt_batcher=None, retry_queue=None):
+    job_id = payload.get("job_id")
+    emails = payload.get("emails", [])
+
+    logger.info("Received job %s with %d emails", job_id, len(emails))
+
+    try:
+        results = await verify_job_pipeline(job_id, emails, rcpt_batcher=rcpt_batcher,
+                                            retry_queue=retry_queue)
+    except Exception:
+        logger.exception("Pipeline error for job %s", job_id)
+        return
+
+    deferred = 0
+    for res in results:
+        if res is None:
+            deferred += 1
+            continue
+        logger.info(
+            f"Result: {res['Email Address']} -> "
+            f"status={res.get('Status')} | "
+            f"score={res.get('Quality Score')} | "
+            f"reason={res.get('Reason')}"
+        )
+
+    if deferred:
+        logger.info("Job %s: %d emails waiting for greylisting retry", job_id, deferred)
+    else:
+        logger.info("Job %s finished", job_id)
+
+
 async def consume_loop():
     logger.info("Starting worker_full consume loop (async)")
 
+    # Executor por defecto: resoluciones getaddrinfo (ver WORKER_IO_THREADS)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_IO_THREADS, thread_name_prefix="verify-io")
+    )
+
     if aioredis is None:
         logger.error("redis.asyncio missing. Install redis>=4.2")
         return
@@ -157,10 +345,26 @@ async def consume_loop():
     r = aioredis.from_url(REDIS_URL, decode_responses=True)
     logger.info("Connected to Redis %s", REDIS_URL)
 
+    # Un solo agregador de RCPT TO para todos los jobs en curso, limitado por
+    # host MX con el token bucket compartido en Redis
+    rcpt_batcher = RcptBatcher(rate=RateLimiter(r)) if RcptBatcher is not None else None
+    job_slots = asyncio.Semaphore(max(1, WORKER_MAX_JOBS))
+    jobs: set[asyncio.Task] = set()
+
+    retry_queue = GreylistQueue(r) if GreylistQueue is not None else None
+    scheduler = asyncio.create_task(retry_scheduler(retry_queue, rcpt_batcher)) if retry_queue else None
+
     while True:
         try:
-            item = await r.blpop(REDIS_QUEUE_KEY, timeout=5)
+            # No se saca otro job de la cola hasta que haya hueco
+            await job_slots.acquire()
+            try:
+                item = await r.blpop(REDIS_QUEUE_KEY, timeout=5)
+            except BaseException:
+                job_slots.release()
+                raise
             if not item:
+                job_slots.release()
                 await asyncio.sleep(WORKER_SLEEP_EMPTY)
                 continue
 
@@ -168,35 +372,14 @@ async def consume_loop():
             try:
                 payload = json.loads(raw)
             except Exception:
+                job_slots.release()
                 logger.exception("Invalid payload, skipping")
                 continue
 
-            job_id = payload.get("job_id")
-            emails = payload.get("emails", [])
-
-            logger.info("Received job %s with %d emails", job_id, len(emails))
-
-            # Concurrency control
-            sem = asyncio.Semaphore(WORKER_CONCURRENCY)
-            async def sem_task(e):
-                async with sem:
-                    return await verify_email_pipeline(job_id, e)
-
-            tasks = [asyncio.create_task(sem_task(e)) for e in emails]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for res in results:
-                if isinstance(res, Exception):
-                    logger.exception("Pipeline error: %s", res)
-                else:
-                    logger.info(
-                        f"Result: {res['Email Address']} -> "
-                        f"status={res.get('Status')} | "
-                        f"score={res.get('Quality Score')} | "
-                        f"reason={res.get('Reason')}"
-                    )
-
-            logger.info("Job %s finished", job_id)
+            task = asyncio.create_task(run_job(payload, rcpt_batcher, retry_queue))
+            jobs.add(task)
+            task.add_done_callback(jobs.discard)
+            task.add_done_callback(lambda _: job_slots.release())
 
         except asyncio.CancelledError:
             break
@@ -204,6 +387,18 @@ async def consume_loop():
             logger.exception("Worker loop exception")
             await asyncio.sleep(1)
 
+    if jobs:
+        await asyncio.gather(*jobs, return_exceptions=True)
+    if scheduler is not None:
+        scheduler.cancel()
+        await asyncio.gather(scheduler, return_exceptions=True)
+    if rcpt_batcher is not None:
+        await rcpt_batcher.close()
+        logger.info("RCPT batcher stats: %s", rcpt_batcher.stats())
+
+    if close_http_session:
+        await close_http_session()
+
 
 def main():
     logger.info("Worker full starting (CTRL+C to stop)")
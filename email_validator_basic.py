@@ -10,7 +10,7 @@ import socket
 import logging
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
-from functools import lru_cache
+from cachetools import TTLCache
 import dns.resolver
 import dns.exception
 
@@ -79,12 +79,34 @@ def is_role_account(email: str) -> bool:
 DNS_TIMEOUT = 5.0  # segundos por consulta
 DNS_RETRIES = 1
 
-@lru_cache(maxsize=4096)
+# Cache: positivos 1h; negativos DEFINITIVOS (NXDOMAIN / sin MX ni A) 5 min.
+# Timeouts y errores transitorios NO se cachean: se reintentan en la próxima llamada.
+MX_POSITIVE_TTL = 3600
+MX_NEGATIVE_TTL = 300
+_mx_positive_cache = TTLCache(maxsize=4096, ttl=MX_POSITIVE_TTL)
+_mx_negative_cache = TTLCache(maxsize=4096, ttl=MX_NEGATIVE_TTL)
+
 def get_mx_records(domain: str, timeout: float = DNS_TIMEOUT) -> Tuple[bool, List[Tuple[int, str]]]:
     """
     Retorna (success, list_of_mx) donde list_of_mx es lista de tuplas (preference, exchange)
     Cacheada para reducir queries repetidas. Maneja excepciones y timeouts.
     """
+    cached = _mx_positive_cache.get(domain) or _mx_negative_cache.get(domain)
+    if cached is not None:
+        return cached
+
+    result, definitive = _lookup_mx_records(domain, timeout)
+    if result[0]:
+        _mx_positive_cache[domain] = result
+    elif definitive:
+        _mx_negative_cache[domain] = result
+    return result
+
+def _lookup_mx_records(domain: str, timeout: float) -> Tuple[Tuple[bool, List[Tuple[int, str]]], bool]:
+    """
+    Consulta sin cache. Retorna ((success, list_of_mx), definitive) donde
+    definitive indica si un resultado negativo es cacheable (NXDOMAIN / NoAnswer).
+    """
     resolver = dns.resolver.Resolver()
     resolver.lifetime = timeout
     resolver.timeout = timeout
@@ -103,7 +125,7 @@ def get_mx_records(domain: str, timeout: float = DNS_TIMEOUT) -> Tuple[bool, Lis
                 mxs.append((pref, exch))
             # Ordenar por preference (menor es preferido)
             mxs.sort(key=lambda x: x[0])
-            return True, mxs
+            return (True, mxs), True
         except dns.resolver.NoAnswer:
             # No hay registros MX; muchos dominios usan A records en lugar de MX.
             last_exception = dns.resolver.NoAnswer()
@@ -124,12 +146,14 @@ def get_mx_records(domain: str, timeout: float = DNS_TIMEOUT) -> Tuple[bool, Lis
         a_records = [str(r) for r in answers]
         # Simular MX con prioridad alta (ej. 0)
         mxs = [(0, domain)]
-        return True, mxs
+        return (True, mxs), True
     except Exception as e:
         logger.debug(f"Fallback A record fallo para {domain}: {e}")
         # Si tuvimos excepción previa, loggear
         logger.info(f"No se pudo resolver MX/A para dominio {domain}: {last_exception or e}")
-        return False, []
+        negative = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+        definitive = isinstance(last_exception, negative) and isinstance(e, negative)
+        return (False, []), definitive
 
 # ----------------------------
 # 3 Función pública compuesta
@@ -1,35 +1,78 @@
 # smtp_async/batcher.py
+"""
+Batcher por clave (dominio o host MX) dirigido por eventos.
+
+- Los dominios se registran solos al llegar su primer email y se eliminan en
+  cuanto su cola queda vacía: un dominio inactivo no tiene tarea, timer ni cola.
+- Un lote está listo al llenarse (batch_size) o cuando vence el timer de
+  max_wait del dominio (loop.call_later, sin polling).
+- Los lotes listos van a UNA cola global (`ready`) de la que consumen los
+  dispatchers del worker.
+"""
 import asyncio
-from collections import defaultdict
+from collections import deque
+
 
 class DomainBatcher:
     def __init__(self, batch_size=20, max_wait_ms=400):
-        self.queues = defaultdict(asyncio.Queue)
         self.batch_size = batch_size
         self.max_wait = max_wait_ms / 1000
+        self.queues: dict[str, deque] = {}                  # solo dominios con emails pendientes
+        self.timers: dict[str, asyncio.TimerHandle] = {}
+        self.ready: asyncio.Queue = asyncio.Queue()         # (domain, [emails])
 
     async def add_email(self, domain, email):
-        await self.queues[domain].put(email)
-
-    async def next_batch(self, domain):
-        q = self.queues[domain]
-        batch = []
-
-        try:
-            item = await asyncio.wait_for(q.get(), timeout=self.max_wait)
-            batch.append(item)
-        except asyncio.TimeoutError:
-            return []
-
-        start = asyncio.get_event_loop().time()
-        while len(batch) < self.batch_size:
-            elapsed = asyncio.get_event_loop().time() - start
-            if elapsed >= self.max_wait:
-                break
-            try:
-                item = await asyncio.wait_for(q.get(), timeout=self.max_wait - elapsed)
-                batch.append(item)
-            except asyncio.TimeoutError:
+        self.add_email_nowait(domain, email)
+
+    def add_email_nowait(self, domain, email):
+        q = self.queues.get(domain)
+        if q is None:
+            q = self.queues[domain] = deque()
+        q.append(email)
+
+        if len(q) >= self.batch_size:
+            self._dispatch(domain)
+        elif domain not in self.timers:
+            loop = asyncio.get_running_loop()
+            self.timers[domain] = loop.call_later(self.max_wait, self._dispatch, domain)
+
+    def _dispatch(self, domain):
+        """Pasa a `ready` los lotes del dominio; lo elimina si queda vacío."""
+        timer = self.timers.pop(domain, None)
+        if timer is not None:
+            timer.cancel()
+
+        q = self.queues.get(domain)
+        if q is None:
+            return
+
+        while q:
+            batch = [q.popleft() for _ in range(min(self.batch_size, len(q)))]
+            self.ready.put_nowait((domain, batch))
+            if len(q) < self.batch_size:
                 break
 
-        return batch
+        if q:
+            # Resto incompleto: espera su propio max_wait
+            loop = asyncio.get_running_loop()
+            self.timers[domain] = loop.call_later(self.max_wait, self._dispatch, domain)
+        else:
+            del self.queues[domain]
+
+    async def next_ready(self):
+        """Siguiente lote listo de cualquier dominio: (domain, [emails])."""
+        return await self.ready.get()
+
+    def defer(self, domain, batch, delay):
+        """Devuelve un lote a `ready` pasado `delay` (p.ej. rate limit)."""
+        loop = asyncio.get_running_loop()
+        loop.call_later(delay, self.ready.put_nowait, (domain, batch))
+
+    def flush(self):
+        """Marca como listos todos los lotes pendientes (cierre del worker)."""
+        for domain in list(self.queues):
+            self._dispatch(domain)
+
+    @property
+    def active_domains(self) -> int:
+        return len(self.queues)
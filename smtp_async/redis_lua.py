@@ -1,5 +1,5 @@
 # smtp_async/redis_lua.py
-import aioredis
+import time
 
 TOKEN_BUCKET_LUA = """
 local key = KEYS[1]
@@ -37,10 +37,10 @@ class RateLimiter:
     async def load(self):
         self.script = await self.redis.script_load(TOKEN_BUCKET_LUA)
 
-    async def allow(self, domain):
-        now = int(asyncio.get_event_loop().time())
-        return await self.redis.evalsha(
-            self.script,
-            keys=[f"bucket:{domain}"],
-            args=[now, 10, 20]  # refill_rate=10/s, capacity=20
-        )
+    async def allow(self, mx_host):
+        # Bucket por host MX: es el servidor remoto el que limita, no el dominio.
+        # Reloj de pared: el bucket se comparte en Redis entre procesos
+        now = time.time()
+        # redis-py: evalsha(sha, numkeys, *keys_and_args); refill_rate=10/s, capacity=20
+        allowed = await self.redis.evalsha(self.script, 1, f"bucket:mx:{mx_host}", now, 10, 20)
+        return bool(int(allowed))
@@ -1,35 +1,203 @@
 # smtp_async/smtp_pool.py
+"""
+Pool de conexiones aiosmtplib por MX.
+
+- Límites de concurrencia por host y global (semáforos asyncio, espera FIFO).
+  Antes de abrir un socket nuevo con el cupo global lleno se cierra la
+  conexión inactiva más antigua: los sockets abiertos no superan max_total.
+- Antes de reusar una conexión inactiva más de `noop_after` s se manda NOOP;
+  al devolverla se manda RSET para no arrastrar estado de transacción.
+- Una conexión que falla (NOOP/RSET o excepción durante el uso) se cierra.
+- Cada conexión inactiva expira a los `idle_timeout` s (loop.call_later) y la
+  entrada del host (semáforo incluido) se elimina en cuanto no tiene conexiones
+  ni esperas: la memoria no crece con los MX vistos.
+"""
+import os
+import time
 import asyncio
-import aiosmtplib
+import logging
 from contextlib import asynccontextmanager
-from collections import defaultdict
+
+import aiosmtplib
+
+logger = logging.getLogger("smtp_async.smtp_pool")
+
+POOL_MAX_PER_HOST = int(os.environ.get("SMTP_ASYNC_MAX_PER_HOST", "3"))
+POOL_MAX_TOTAL = int(os.environ.get("SMTP_ASYNC_MAX_TOTAL", "200"))
+POOL_IDLE_TIMEOUT = float(os.environ.get("SMTP_ASYNC_IDLE_TIMEOUT", "60"))
+POOL_NOOP_AFTER = 5
+POOL_CONNECT_TIMEOUT = 10
+
+
+class _HostEntry:
+    __slots__ = ("sem", "idle", "users")
+
+    def __init__(self, max_per_host):
+        self.sem = asyncio.Semaphore(max_per_host)
+        self.idle = []          # [(conn, last_used, timer)] — la más reciente al final
+        self.users = 0          # checkouts en curso + en espera
+
 
 class SMTPConnectionPool:
-    def __init__(self, max_connections_per_domain=3):
+    def __init__(self, max_connections_per_domain=POOL_MAX_PER_HOST, max_total=POOL_MAX_TOTAL,
+                 idle_timeout=POOL_IDLE_TIMEOUT, noop_after=POOL_NOOP_AFTER, port=25):
         self.max = max_connections_per_domain
-        self.pools = defaultdict(list)
-        self.locks = defaultdict(asyncio.Lock)
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.port = port
+        self.pools: dict[str, _HostEntry] = {}
+        self._total = None      # Semaphore global, creado dentro del loop
+        self._in_use = 0        # conexiones prestadas ahora mismo
+        self.created_total = 0
+        self.closed_total = 0
 
-    async def _create_connection(self, mx_host):
-        return await aiosmtplib.SMTP(
-            hostname=mx_host,
-            port=25,
-            timeout=10
-        ).connect()
+    # --------------------------------------------------
+    # Conexiones
+    # --------------------------------------------------
+    async def _create_connection(self, mx_host, factory=None):
+        if factory is not None:
+            smtp = await factory(mx_host)
+        else:
+            smtp = aiosmtplib.SMTP(hostname=mx_host, port=self.port, timeout=POOL_CONNECT_TIMEOUT)
+            await smtp.connect()
+        self.created_total += 1
+        return smtp
 
+    def _close(self, conn):
+        self.closed_total += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    async def _alive(self, conn, last_used) -> bool:
+        if not conn.is_connected:
+            return False
+        if time.monotonic() - last_used < self.noop_after:
+            return True
+        try:
+            resp = await conn.noop()
+            return resp.code == 250
+        except Exception:
+            return False
+
+    async def _reset(self, conn) -> bool:
+        try:
+            resp = await conn.rset()
+            return resp.code == 250
+        except Exception:
+            return False
+
+    # --------------------------------------------------
+    # Entradas por host
+    # --------------------------------------------------
+    def _entry(self, mx_host) -> _HostEntry:
+        entry = self.pools.get(mx_host)
+        if entry is None:
+            entry = self.pools[mx_host] = _HostEntry(self.max)
+        return entry
+
+    def _drop_if_unused(self, mx_host, entry):
+        if not entry.idle and not entry.users and self.pools.get(mx_host) is entry:
+            del self.pools[mx_host]
+
+    def _expire(self, mx_host, entry, conn):
+        for i, (c, _, _) in enumerate(entry.idle):
+            if c is conn:
+                del entry.idle[i]
+                self._close(conn)
+                break
+        self._drop_if_unused(mx_host, entry)
+
+    def _idle_count(self) -> int:
+        return sum(len(e.idle) for e in self.pools.values())
+
+    def _make_room(self):
+        """Con el cupo global lleno de sockets (en uso + inactivos), cierra el inactivo más antiguo."""
+        if self._in_use + self._idle_count() <= self.max_total:
+            return
+        oldest = None
+        for host, entry in self.pools.items():
+            if entry.idle and (oldest is None or entry.idle[0][1] < oldest[1].idle[0][1]):
+                oldest = (host, entry)
+        if oldest is not None:
+            host, entry = oldest
+            conn, _, timer = entry.idle.pop(0)
+            timer.cancel()
+            self._close(conn)
+            self._drop_if_unused(host, entry)
+
+    def _take_idle(self, entry):
+        conn, last_used, timer = entry.idle.pop()
+        timer.cancel()
+        return conn, last_used
+
+    # --------------------------------------------------
+    # API
+    # --------------------------------------------------
     @asynccontextmanager
-    async def acquire(self, mx_host):
-        async with self.locks[mx_host]:
-            if self.pools[mx_host]:
-                conn = self.pools[mx_host].pop()
-            else:
-                conn = await self._create_connection(mx_host)
+    async def acquire(self, mx_host, factory=None):
+        """
+        Conexión para `mx_host` (inactiva si hay, nueva si no). `factory`
+        (opcional): coroutine mx_host -> conexión ya conectada, para quien
+        necesite otra forma de conectar (puertos en carrera, EHLO/STARTTLS...).
+        """
+        if self._total is None:
+            self._total = asyncio.Semaphore(self.max_total)
 
+        entry = self._entry(mx_host)
+        entry.users += 1
         try:
-            yield conn
+            # Primero el cupo del host: esperar por un MX saturado no retiene
+            # cupo global que otros hosts podrían usar
+            async with entry.sem:
+                async with self._total:
+                    self._in_use += 1
+                    try:
+                        conn = None
+                        while entry.idle:
+                            candidate, last_used = self._take_idle(entry)
+                            if await self._alive(candidate, last_used):
+                                conn = candidate
+                                break
+                            logger.debug("dropping dead pooled connection to %s", mx_host)
+                            self._close(candidate)
+                        if conn is None:
+                            self._make_room()
+                            conn = await self._create_connection(mx_host, factory)
+
+                        reusable = False
+                        try:
+                            yield conn
+                            reusable = True
+                        finally:
+                            if reusable and len(entry.idle) < self.max and await self._reset(conn):
+                                loop = asyncio.get_running_loop()
+                                timer = loop.call_later(self.idle_timeout, self._expire, mx_host, entry, conn)
+                                entry.idle.append((conn, time.monotonic(), timer))
+                            else:
+                                self._close(conn)
+                    finally:
+                        self._in_use -= 1
         finally:
-            async with self.locks[mx_host]:
-                if len(self.pools[mx_host]) < self.max:
-                    self.pools[mx_host].append(conn)
-                else:
-                    await conn.quit()
+            entry.users -= 1
+            self._drop_if_unused(mx_host, entry)
+
+    def stats(self) -> dict:
+        idle = self._idle_count()
+        return {
+            "hosts": len(self.pools),
+            "idle": idle,
+            "in_use": self._in_use,
+            "open": idle + self._in_use,
+            "created_total": self.created_total,
+            "closed_total": self.closed_total,
+        }
+
+    async def close(self):
+        for entry in list(self.pools.values()):
+            while entry.idle:
+                conn, _ = self._take_idle(entry)
+                self._close(conn)
+        self.pools.clear()
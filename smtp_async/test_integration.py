@@ -18,6 +18,6 @@ async def test_end_to_end():
     asyncio.create_task(worker.start(domain_map))
 
     for i in range(50):
-        await worker.batcher.add_email("example.com", f"user{i}@example.com")
+        await worker.submit(f"user{i}@example.com")
 
     await asyncio.sleep(3)
@@ -1,38 +1,106 @@
 # smtp_async/worker.py
+"""
+Worker SMTP async dirigido por eventos.
+
+- `submit(email)` resuelve el MX del dominio (DNS async cacheado) y encola el
+  email por HOST MX: dominios distintos alojados en el mismo MX comparten
+  lote y conexión. No hace falta conocer el mapa dominio -> MX al arrancar
+  (start(domain_to_mx) sigue aceptándolo).
+- N dispatchers consumen la cola única de lotes listos del DomainBatcher:
+  los MX inactivos no consumen CPU y la concurrencia SMTP la acotan los
+  dispatchers, no el número de dominios.
+- El rate limit es por host MX (lo que el servidor remoto ve); un lote sin
+  token se reprograma sin bloquear al dispatcher.
+"""
+import os
 import asyncio
+import logging
+
+from cachetools import TTLCache
+
 from smtp_async.smtp_pool import SMTPConnectionPool
 from smtp_async.batcher import DomainBatcher
 from smtp_async.redis_lua import RateLimiter
+from app.verifier.dns_mx import resolve_mx
+
+logger = logging.getLogger("smtp_async.worker")
+
+WORKER_DISPATCHERS = int(os.environ.get("SMTP_ASYNC_DISPATCHERS", "50"))
+RATE_LIMIT_RETRY = 0.5
+MX_MAP_SIZE = 100_000
+MX_MAP_TTL = 3600
+
 
 class AsyncWorker:
-    def __init__(self, redis, validate_smtp_func):
+    def __init__(self, redis, validate_smtp_func, dispatchers=WORKER_DISPATCHERS, on_no_mx=None):
         self.redis = redis
         self.batcher = DomainBatcher()
         self.pool = SMTPConnectionPool()
         self.validate_smtp = validate_smtp_func
         self.rate = RateLimiter(redis)
+        self.dispatchers = dispatchers
+        self.on_no_mx = on_no_mx              # async (domain, [email]) -> None
+        self.mx_map = TTLCache(maxsize=MX_MAP_SIZE, ttl=MX_MAP_TTL)
+        self._tasks: list[asyncio.Task] = []
 
-    async def process_domain(self, domain, mx_host):
-        while True:
-            batch = await self.batcher.next_batch(domain)
-            if not batch:
-                continue
+    # --------------------------------------------------
+    # Entrada
+    # --------------------------------------------------
+    def register_domain(self, domain, mx_host):
+        self.mx_map[domain] = mx_host.lower()
+
+    async def submit(self, email):
+        domain = email.split("@", 1)[1].lower()
+        mx_host = await self._mx_for(domain)
+        if mx_host is None:
+            if self.on_no_mx is not None:
+                await self.on_no_mx(domain, [email])
+            return
+        await self.batcher.add_email(mx_host, email)
+
+    async def _mx_for(self, domain):
+        mx_host = self.mx_map.get(domain)
+        if mx_host is None:
+            records = await resolve_mx(domain)
+            if not records:
+                return None
+            mx_host = self.mx_map[domain] = records[0].host.lower()
+        return mx_host
 
-            allowed = await self.rate.allow(domain)
-            if not allowed:
-                await asyncio.sleep(0.5)
-                continue
+    # --------------------------------------------------
+    # Dispatch
+    # --------------------------------------------------
+    async def process_batch(self, mx_host, batch):
+        if not await self.rate.allow(mx_host):
+            self.batcher.defer(mx_host, batch, RATE_LIMIT_RETRY)
+            return
 
-            async with self.pool.acquire(mx_host) as conn:
-                tasks = [self.validate_smtp(email, conn) for email in batch]
-                await asyncio.gather(*tasks)
+        # Una conexión SMTP es una sola sesión: los comandos van en serie. La
+        # concurrencia por MX viene del pool (varias conexiones por host).
+        async with self.pool.acquire(mx_host) as conn:
+            for email in batch:
+                await self.validate_smtp(email, conn)
 
-    async def start(self, domain_to_mx):
+    async def _dispatcher(self):
+        while True:
+            mx_host, batch = await self.batcher.next_ready()
+            try:
+                await self.process_batch(mx_host, batch)
+            except Exception:
+                logger.exception("batch failed for %s (%d emails)", mx_host, len(batch))
+
+    async def start(self, domain_to_mx=None):
         await self.rate.load()
 
-        tasks = [
-            asyncio.create_task(self.process_domain(domain, mx))
-            for domain, mx in domain_to_mx.items()
-        ]
+        for domain, mx in (domain_to_mx or {}).items():
+            self.register_domain(domain, mx)
+
+        self._tasks = [asyncio.create_task(self._dispatcher()) for _ in range(self.dispatchers)]
+        await asyncio.gather(*self._tasks)
 
-        await asyncio.gather(*tasks)
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.pool.close()
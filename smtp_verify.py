@@ -10,7 +10,8 @@ API principal:
                 max_retries=3,
                 ports=(25, 465),
                 starttls_preference=True,
-                check_catch_all_count=1)
+                check_catch_all_count=1,
+                known_catch_all=None)
 
 Retorna un SMTPVerifyResult (dataclass) con detalles y metadatos.
 """
@@ -24,6 +25,8 @@ import string
 from dataclasses import dataclass, asdict
 from typing import Optional, List, Tuple, Union
 
+from cachetools import TTLCache
+
 # -------------------------
 # Dataclasses de salida
 # -------------------------
@@ -53,6 +56,19 @@ class SMTPVerifyResult:
     attempts: List[SMTPAttempt]
     warnings: List[str]
     duration: float
+    # Greylisting / 4xx: segundos tras los que conviene reintentar (cola diferida
+    # del llamador, ver app.greylist_queue); None si no aplica
+    retry_after: Optional[float] = None
+
+# -------------------------
+# Cache de veredictos catch-all por dominio
+# -------------------------
+# Catch-all es propiedad del dominio: se prueba una vez y se reutiliza
+CATCH_ALL_CACHE_TTL = 24 * 3600
+_catch_all_cache: TTLCache = TTLCache(maxsize=50_000, ttl=CATCH_ALL_CACHE_TTL)
+
+# Greylisting: el servidor acepta el reintento pasados unos minutos
+GREYLIST_RETRY_AFTER = 300
 
 # -------------------------
 # Helpers
@@ -149,10 +165,15 @@ def smtp_verify(email: str,
                 max_retries: int = 3,
                 ports: Tuple[int, ...] = (25, 465),
                 starttls_preference: bool = True,
-                check_catch_all_count: int = 1) -> SMTPVerifyResult:
+                check_catch_all_count: int = 1,
+                known_catch_all: Optional[bool] = None) -> SMTPVerifyResult:
     """
     Verifica email con servidor MX (mx_record puede ser 'mx.host.tld' o (pref, 'mx.host.tld')).
     - check_catch_all_count: número de pruebas aleatorias para detectar catch-all (0 para deshabilitar).
+    - known_catch_all: veredicto catch-all ya conocido del dominio; si se pasa (o está en
+      el cache del proceso) no se abren sesiones de prueba.
+    - max_retries: intentos ante errores de conexión (sin espera entre ellos). Un 4xx no
+      se reintenta aquí: el resultado lleva `retry_after`.
     """
     t0 = time.time()
     warnings = []
@@ -168,14 +189,14 @@ def smtp_verify(email: str,
     # Ensure helo_host doesn't contain brackets etc.
     helo = helo_host
 
-    # Retry loop with exponential backoff for transient errors (connection, timeout, 4xx)
+    # Reintentos inmediatos solo para errores de conexión; 4xx -> retry_after
     last_code = None
     last_msg = None
     temp_error_flag = False
     final_is_valid = None
+    retry_after = None
 
     for attempt in range(1, max_retries + 1):
-        backoff = (2 ** (attempt - 1)) + random.random() * 0.1
         for port in ports:
             try:
                 start = time.time()
@@ -211,7 +232,7 @@ def smtp_verify(email: str,
                     # Transient error (greylisting / temp)
                     temp_error_flag = True
                     warnings.append(f"Respuesta temporal {code}: {msg}")
-                    # try next port or retry after backoff
+                    # try next port; si sigue en 4xx se devuelve retry_after
                 elif 500 <= code < 600:
                     # Permanent rejection (user unknown / mailbox unavailable)
                     final_is_valid = False
@@ -235,8 +256,11 @@ def smtp_verify(email: str,
         if final_is_valid is not None and not temp_error_flag:
             # tenemos decisión final (accept or reject)
             break
-        # si temp_error_flag entonces backoff y retry
-        time.sleep(backoff)
+        if last_code is not None and 400 <= last_code < 500:
+            # Greylisting: reintentar en segundos no sirve y bloquearía al worker
+            retry_after = GREYLIST_RETRY_AFTER
+            break
+        # Error de conexión: siguiente intento sin esperar
 
     # Si aún no decidimos y tenemos códigos de intento, inferir a partir del último código
     if final_is_valid is None:
@@ -255,9 +279,17 @@ def smtp_verify(email: str,
 
     # ----- Detectar catch-all si aplica -----
     is_catch_all = None
-    if check_catch_all_count and final_is_valid is True:
+    if known_catch_all is None:
+        known_catch_all = _catch_all_cache.get(domain)
+    if check_catch_all_count and final_is_valid is True and known_catch_all is not None:
+        is_catch_all = known_catch_all
+        if is_catch_all:
+            warnings.append("Dominio parece aceptar direcciones arbitrarias (catch-all)")
+    elif check_catch_all_count and final_is_valid is True:
         # Hacer pruebas con direcciones aleatorias en el mismo dominio
         accept_count = 0
+        probe_errors = 0
+        inconclusive = 0
         total_checks = max(1, check_catch_all_count)
         for i in range(total_checks):
             random_local = f"noexist_{_random_localpart(10)}"
@@ -273,10 +305,16 @@ def smtp_verify(email: str,
                                                            use_starttls=starttls_preference)
                 if code_r is not None and 200 <= code_r < 300:
                     accept_count += 1
+                elif code_r is None or code_r < 500:
+                    # 4xx (greylisting, 421) o sin código: no dice nada del dominio
+                    inconclusive += 1
             except Exception as e:
+                probe_errors += 1
                 warnings.append(f"Error durante prueba catch-all: {e}")
         # heurística: si la mayoría acepta -> probable catch-all
         is_catch_all = (accept_count == total_checks)
+        if not probe_errors and not inconclusive:
+            _catch_all_cache[domain] = is_catch_all
         if is_catch_all:
             warnings.append("Dominio parece aceptar direcciones arbitrarias (catch-all)")
 
@@ -292,7 +330,8 @@ def smtp_verify(email: str,
         temp_error=temp_error_flag,
         attempts=attempts,
         warnings=warnings,
-        duration=duration_total
+        duration=duration_total,
+        retry_after=retry_after if final_is_valid is None else None,
     )
     return result
 
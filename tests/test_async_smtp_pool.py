@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from smtp_async.smtp_pool import SMTPConnectionPool
+
+
+class FakeConn:
+    def __init__(self, host):
+        self.host = host
+        self.is_connected = True
+        self.commands = []
+    async def noop(self):
+        self.commands.append("NOOP")
+        return SimpleNamespace(code=250 if self.is_connected else 421)
+    async def rset(self):
+        self.commands.append("RSET")
+        return SimpleNamespace(code=250)
+    def close(self):
+        self.is_connected = False
+
+
+def make_pool(**kwargs):
+    pool = SMTPConnectionPool(**kwargs)
+    pool.opened = []
+
+    async def create(mx_host, factory=None):
+        await asyncio.sleep(0)
+        conn = FakeConn(mx_host)
+        pool.opened.append(conn)
+        pool.created_total += 1
+        return conn
+
+    pool._create_connection = create
+    return pool
+
+
+def test_reuse_sends_rset_and_host_entry_is_kept_while_idle():
+    async def run():
+        pool = make_pool()
+        async with pool.acquire("mx.a.com") as c1:
+            pass
+        async with pool.acquire("mx.a.com") as c2:
+            pass
+        return pool, c1, c2
+
+    pool, c1, c2 = asyncio.run(run())
+    assert c1 is c2 and len(pool.opened) == 1
+    assert c1.commands == ["RSET", "RSET"]
+    assert pool.stats()["idle"] == 1
+
+
+def test_per_host_and_global_limits():
+    async def run():
+        pool = make_pool(max_connections_per_domain=2, max_total=3)
+        active = {"a": 0, "total": 0, "max_a": 0, "max_total": 0}
+
+        async def use(host):
+            async with pool.acquire(host):
+                key = "a" if host == "mx.a.com" else "b"
+                active[key] = active.get(key, 0) + 1
+                active["total"] += 1
+                active["max_a"] = max(active["max_a"], active["a"])
+                active["max_total"] = max(active["max_total"], active["total"])
+                await asyncio.sleep(0.01)
+                active[key] -= 1
+                active["total"] -= 1
+
+        await asyncio.gather(*[use("mx.a.com") for _ in range(6)], *[use("mx.b.com") for _ in range(6)])
+        return pool, active
+
+    pool, active = asyncio.run(run())
+    assert active["max_a"] <= 2 and active["max_total"] <= 3
+    assert pool.stats()["open"] <= 3
+
+
+def test_dead_connection_is_replaced_and_error_discards():
+    async def run():
+        pool = make_pool(noop_after=0)
+        async with pool.acquire("mx.a.com") as c1:
+            pass
+        c1.is_connected = False
+        async with pool.acquire("mx.a.com") as c2:
+            pass
+        with pytest.raises(RuntimeError):
+            async with pool.acquire("mx.a.com") as c3:
+                raise RuntimeError("boom")
+        return pool, c1, c2, c3
+
+    pool, c1, c2, c3 = asyncio.run(run())
+    assert c2 is not c1 and c3 is c2
+    assert not c3.is_connected
+    assert "mx.a.com" not in pool.pools
+
+
+def test_idle_connections_and_host_entries_expire():
+    async def run():
+        pool = make_pool(idle_timeout=0.05)
+        for host in ("mx.a.com", "mx.b.com"):
+            async with pool.acquire(host):
+                pass
+        assert len(pool.pools) == 2
+        await asyncio.sleep(0.1)
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool.pools == {}
+    assert all(not c.is_connected for c in pool.opened)
+
+
+def test_stats_count_connections_in_use():
+    async def run():
+        pool = make_pool(max_total=5)
+        async with pool.acquire("mx.a.com"):
+            async with pool.acquire("mx.b.com"):
+                during = pool.stats()
+        return during, pool.stats()
+
+    during, after = asyncio.run(run())
+    assert during["in_use"] == 2 and during["open"] == 2
+    assert after["in_use"] == 0 and after["idle"] == 2
@@ -0,0 +1,70 @@
+import asyncio
+import dns.exception
+import dns.resolver
+import pytest
+from app.verifier import dns_mx
+
+
+class FakeMX:
+    def __init__(self, preference, exchange):
+        self.preference = preference
+        self.exchange = exchange
+
+
+class FakeAnswer(list):
+    def __init__(self, records, ttl):
+        super().__init__(records)
+        self.rrset = type("RRset", (), {"ttl": ttl})()
+
+
+class FakeResolver:
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = []
+
+    async def resolve(self, name, rdtype, lifetime=None):
+        self.calls.append((name, rdtype))
+        await asyncio.sleep(0)
+        outcome = self.outcomes[name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    fake = FakeResolver({
+        "acme.com.": FakeAnswer([FakeMX(20, "mx2.acme.com."), FakeMX(10, "mx1.acme.com.")], ttl=600),
+        "typo-domian.com.": dns.resolver.NXDOMAIN(),
+        "slow.com.": dns.exception.Timeout(),
+    })
+    dns_mx.clear_dns_cache()
+    monkeypatch.setattr(dns_mx, "_async_resolver", fake)
+    yield fake
+    dns_mx.clear_dns_cache()
+
+
+def test_positive_answers_are_cached_and_shared(resolver):
+    async def run():
+        return await asyncio.gather(*(dns_mx.resolve_mx("acme.com") for _ in range(10)))
+
+    results = asyncio.run(run())
+    asyncio.run(dns_mx.resolve_mx("acme.com"))
+
+    assert [r.host for r in results[0]] == ["mx1.acme.com", "mx2.acme.com"]
+    assert resolver.calls == [("acme.com.", "MX")]
+
+
+def test_nxdomain_is_negatively_cached(resolver):
+    assert asyncio.run(dns_mx.resolve_mx("typo-domian.com")) == []
+    assert asyncio.run(dns_mx.resolve_mx("typo-domian.com")) == []
+    assert len(resolver.calls) == 1
+    cached = dns_mx._dns_cache[("typo-domian.com", "MX")]
+    assert cached.status == "nxdomain"
+
+
+def test_timeouts_are_never_cached(resolver):
+    for _ in range(2):
+        with pytest.raises(dns_mx.MXLookupError):
+            asyncio.run(dns_mx.resolve_mx("slow.com"))
+    assert len(resolver.calls) == 2
@@ -0,0 +1,152 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from smtp_async.batcher import DomainBatcher
+from smtp_async.worker import AsyncWorker
+
+
+def test_full_batch_is_ready_immediately_and_domain_is_evicted():
+    async def run():
+        b = DomainBatcher(batch_size=3, max_wait_ms=10_000)
+        for i in range(3):
+            await b.add_email("a.com", f"u{i}@a.com")
+        ready = await asyncio.wait_for(b.next_ready(), timeout=1)
+        return ready, b.active_domains, b.timers
+
+    (domain, batch), active, timers = asyncio.run(run())
+    assert domain == "a.com" and batch == ["u0@a.com", "u1@a.com", "u2@a.com"]
+    assert active == 0 and not timers
+
+
+def test_partial_batch_is_ready_after_max_wait():
+    async def run():
+        b = DomainBatcher(batch_size=10, max_wait_ms=50)
+        await b.add_email("a.com", "x@a.com")
+        await b.add_email("b.com", "y@b.com")
+        assert b.ready.empty()
+        first = await asyncio.wait_for(b.next_ready(), timeout=1)
+        second = await asyncio.wait_for(b.next_ready(), timeout=1)
+        return {first[0]: first[1], second[0]: second[1]}, b.active_domains
+
+    ready, active = asyncio.run(run())
+    assert ready == {"a.com": ["x@a.com"], "b.com": ["y@b.com"]}
+    assert active == 0
+
+
+class FakeRate:
+    def __init__(self):
+        self.calls = 0
+        self.keys = []
+
+    async def load(self):
+        pass
+
+    async def allow(self, mx_host):
+        self.keys.append(mx_host)
+        self.calls += 1
+        return self.calls > 1       # primer lote sin token: se reprograma
+
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self, mx_host):
+        yield mx_host
+
+    async def close(self):
+        pass
+
+
+def test_worker_registers_domains_dynamically(monkeypatch):
+    validated = []
+
+    async def validate(email, conn):
+        validated.append((email, conn))
+
+    async def fake_resolve_mx(domain):
+        from app.verifier.dns_mx import MXRecord
+        return [MXRecord(f"mx.{domain}", 10)]
+
+    monkeypatch.setattr("smtp_async.worker.resolve_mx", fake_resolve_mx)
+    monkeypatch.setattr("smtp_async.worker.RATE_LIMIT_RETRY", 0.01)
+
+    async def run():
+        worker = AsyncWorker(redis=None, validate_smtp_func=validate, dispatchers=2)
+        worker.rate = FakeRate()
+        worker.pool = FakePool()
+        worker.batcher = DomainBatcher(batch_size=2, max_wait_ms=20)
+        runner = asyncio.create_task(worker.start())
+        for email in ["a@one.com", "b@one.com", "c@two.com"]:
+            await worker.submit(email)
+        for _ in range(100):
+            if len(validated) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        runner.cancel()
+        return worker
+
+    worker = asyncio.run(run())
+    assert sorted(validated) == [("a@one.com", "mx.one.com"), ("b@one.com", "mx.one.com"),
+                                 ("c@two.com", "mx.two.com")]
+    assert worker.batcher.active_domains == 0
+
+
+def test_worker_batches_domains_sharing_an_mx_host(monkeypatch):
+    batches = []
+
+    async def validate(email, conn):
+        pass
+
+    async def fake_resolve_mx(domain):
+        from app.verifier.dns_mx import MXRecord
+        return [MXRecord("ASPMX.L.GOOGLE.COM", 1)]
+
+    monkeypatch.setattr("smtp_async.worker.resolve_mx", fake_resolve_mx)
+    monkeypatch.setattr("smtp_async.worker.RATE_LIMIT_RETRY", 0.01)
+
+    async def run():
+        worker = AsyncWorker(redis=None, validate_smtp_func=validate, dispatchers=1)
+        worker.rate = FakeRate()
+        worker.pool = FakePool()
+        worker.batcher = DomainBatcher(batch_size=3, max_wait_ms=20)
+        original = worker.process_batch
+
+        async def process_batch(mx_host, batch):
+            batches.append((mx_host, list(batch)))
+            await original(mx_host, batch)
+
+        worker.process_batch = process_batch
+        runner = asyncio.create_task(worker.start())
+        for email in ["a@one.com", "b@two.com", "c@three.com"]:
+            await worker.submit(email)
+        for _ in range(100):
+            if worker.rate.calls >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        runner.cancel()
+        return worker
+
+    worker = asyncio.run(run())
+    assert batches[0] == ("aspmx.l.google.com", ["a@one.com", "b@two.com", "c@three.com"])
+    assert set(worker.rate.keys) == {"aspmx.l.google.com"}
+
+
+def test_process_batch_validates_sequentially_on_one_connection():
+    active = {"now": 0, "max": 0}
+
+    async def validate(email, conn):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+
+    async def run():
+        worker = AsyncWorker(redis=None, validate_smtp_func=validate, dispatchers=1)
+        worker.rate = FakeRate()
+        worker.rate.calls = 1       # con token
+        worker.pool = FakePool()
+        await worker.process_batch("mx.one.com", ["a@one.com", "b@one.com", "c@one.com"])
+
+    asyncio.run(run())
+    assert active["max"] == 1
@@ -0,0 +1,45 @@
+import asyncio
+import fakeredis.aioredis
+from app.domain_cache import DomainCache
+
+
+def test_l1_l2_hits_and_shared_redis():
+    redis = fakeredis.aioredis.FakeRedis()
+
+    async def run():
+        worker_a = DomainCache(redis=redis)
+        worker_b = DomainCache(redis=redis)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"has_spf": True, "domain_age_days": None}
+
+        first = await worker_a.get_or_compute("infra", "acme.com", compute)
+        again = await worker_a.get_or_compute("infra", "acme.com", compute)
+        other = await worker_b.get_or_compute("infra", "acme.com", compute)
+        ttl = await redis.ttl("dc:infra:acme.com")
+        return calls, first, again, other, ttl, worker_a.stats(), worker_b.stats()
+
+    calls, first, again, other, ttl, stats_a, stats_b = asyncio.run(run())
+    assert calls == [1]
+    assert first == again == other == {"has_spf": True, "domain_age_days": None}
+    assert 0 < ttl <= 24 * 3600
+    assert stats_a["infra"]["l1_hits"] == 1 and stats_a["infra"]["misses"] == 1
+    assert stats_b["infra"]["l2_hits"] == 1
+
+
+def test_redis_errors_degrade_to_l1():
+    class BrokenRedis:
+        async def get(self, *a, **kw):
+            raise ConnectionError("down")
+
+        async def set(self, *a, **kw):
+            raise ConnectionError("down")
+
+    async def run():
+        cache = DomainCache(redis=BrokenRedis())
+        await cache.set("mx", "acme.com", [["mx.acme.com", 10]])
+        return await cache.get("mx", "acme.com")
+
+    assert asyncio.run(run()) == [["mx.acme.com", 10]]
@@ -0,0 +1,142 @@
+import asyncio
+import fakeredis.aioredis
+from app.domain_cache import DomainCache
+from app.verifier import domain_context
+from app.verifier.dns_mx import MXRecord, DNSResult, NOANSWER_TTL
+
+
+def patch_mx(monkeypatch, fake, status="ok", ttl=600):
+    async def fake_resolve_mx_result(domain):
+        return await fake(domain), DNSResult(status, [], ttl)
+
+    monkeypatch.setattr(domain_context, "resolve_mx_result", fake_resolve_mx_result)
+
+
+def test_concurrent_callers_share_one_lookup(monkeypatch):
+    calls = []
+
+    async def fake_resolve_mx(domain):
+        calls.append(domain)
+        await asyncio.sleep(0.01)
+        return [MXRecord("mx1.acme.com", 10)]
+
+    patch_mx(monkeypatch, fake_resolve_mx)
+
+    async def run():
+        ctx = domain_context.DomainContext()
+        results = await asyncio.gather(*(ctx.mx("acme.com") for _ in range(20)))
+        info = await ctx.classification("ACME.com")
+        return results, info
+
+    results, info = asyncio.run(run())
+    assert calls == ["acme.com"]
+    assert all(r[0].host == "mx1.acme.com" for r in results)
+    assert info["type"] == "business"
+
+
+def test_failures_are_not_memoized(monkeypatch):
+    calls = []
+
+    async def flaky_resolve_mx(domain):
+        calls.append(domain)
+        if len(calls) == 1:
+            raise RuntimeError("timeout")
+        return [MXRecord("mx.acme.com", 0)]
+
+    patch_mx(monkeypatch, flaky_resolve_mx)
+
+    async def run():
+        ctx = domain_context.DomainContext()
+        try:
+            await ctx.mx("acme.com")
+        except RuntimeError:
+            pass
+        return await ctx.mx("acme.com")
+
+    assert asyncio.run(run())[0].host == "mx.acme.com"
+    assert len(calls) == 2
+
+
+def test_catch_all_verdict_is_reused_and_revalidated_when_stale(monkeypatch):
+    probes = []
+
+    async def fake_resolve_mx(domain):
+        return [MXRecord("mx.acme.com", 10)]
+
+    async def fake_probe(domain, mx_host):
+        probes.append((domain, mx_host))
+        return False
+
+    patch_mx(monkeypatch, fake_resolve_mx)
+    monkeypatch.setattr(domain_context, "probe_catch_all", fake_probe)
+
+    async def run():
+        ctx = domain_context.DomainContext()
+        unknown = await ctx.catch_all("acme.com")
+        await ctx.record_catch_all("acme.com", True)
+        fresh = await ctx.catch_all("ACME.com")
+
+        # Veredicto vencido: se devuelve el antiguo y se refresca en segundo plano
+        ctx._catch_all["acme.com"]["checked_at"] -= domain_context.CATCH_ALL_FRESH_TTL + 1
+        stale = await ctx.catch_all("acme.com")
+        await ctx._tasks[("catch_all_refresh", "acme.com")]
+        refreshed = await ctx.catch_all("acme.com")
+        return unknown, fresh, stale, refreshed
+
+    unknown, fresh, stale, refreshed = asyncio.run(run())
+    assert unknown is None
+    assert fresh is True
+    assert stale is True
+    assert refreshed is False
+    assert probes == [("acme.com", "mx.acme.com")]
+
+
+def test_aclose_waits_for_refresh_then_cancels_leftovers(monkeypatch):
+    async def fake_resolve_mx(domain):
+        return [MXRecord(f"mx.{domain}", 10)]
+
+    async def fake_probe(domain, mx_host):
+        await asyncio.sleep(0.01 if domain == "fast.com" else 60)
+        return False
+
+    patch_mx(monkeypatch, fake_resolve_mx)
+    monkeypatch.setattr(domain_context, "probe_catch_all", fake_probe)
+
+    async def run():
+        ctx = domain_context.DomainContext()
+        for domain in ("fast.com", "slow.com"):
+            await ctx.record_catch_all(domain, True)
+            ctx._catch_all[domain]["checked_at"] -= domain_context.CATCH_ALL_FRESH_TTL + 1
+            await ctx.catch_all(domain)
+        await ctx.aclose(timeout=0.2)
+        return ctx
+
+    ctx = asyncio.run(run())
+    assert ctx._catch_all["fast.com"]["catch_all"] is False      # refresco completado
+    assert ctx._tasks[("catch_all_refresh", "slow.com")].cancelled()
+
+
+
+def test_mx_l2_ttl_follows_dns_answer(monkeypatch):
+    redis = fakeredis.aioredis.FakeRedis()
+
+    async def fake_resolve_mx(domain):
+        return [MXRecord("mx.acme.com", 10)] if domain != "no-mx.com" else []
+
+    async def ttl_for(status, ttl, domain):
+        patch_mx(monkeypatch, fake_resolve_mx, status=status, ttl=ttl)
+        ctx = domain_context.DomainContext(cache=DomainCache(redis=redis))
+        await ctx.mx(domain)
+        return await redis.ttl(f"dc:mx:{domain}")
+
+    async def run():
+        return (
+            await ttl_for("ok", 60, "acme.com"),
+            await ttl_for("ok", 86400, "big.com"),
+            await ttl_for("noanswer", NOANSWER_TTL, "no-mx.com"),
+        )
+
+    short, capped, negative = asyncio.run(run())
+    assert 0 < short <= 60
+    assert 3000 < capped <= 3600
+    assert 0 < negative <= NOANSWER_TTL
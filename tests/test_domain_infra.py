@@ -0,0 +1,112 @@
+import asyncio
+import time
+from app.verifier import domain_infra
+from app.verifier.domain_infra_score import score_domain_infra
+from app.verifier.domain_probe import DomainProbe
+
+
+def test_async_infra_returns_partial_signals_on_deadline(monkeypatch):
+    def slow_whois(domain):
+        time.sleep(0.5)
+        return 4000
+
+    async def spf(domain):
+        return True
+
+    async def dmarc(domain):
+        raise TimeoutError("dns timeout")
+
+    async def probe():
+        return DomainProbe(domain="acme.com", scheme="https", http_status=200,
+                           final_url="https://acme.com", https_valid=True, text_length=5000)
+
+    monkeypatch.setattr(domain_infra, "get_domain_age_days", slow_whois)
+    monkeypatch.setattr(domain_infra, "has_spf_async", spf)
+    monkeypatch.setattr(domain_infra, "has_dmarc_async", dmarc)
+
+    async def run():
+        t0 = time.monotonic()
+        infra = await domain_infra.evaluate_domain_infra_async("acme.com", deadline=0.1, probe_factory=probe)
+        return infra, time.monotonic() - t0
+
+    infra, elapsed = asyncio.run(run())
+    assert elapsed < 0.3
+
+    assert sorted(infra["missing"]) == ["domain_age_days", "has_dmarc"]
+    assert infra["has_spf"] is True
+    assert infra["web_status"] == "active" and infra["https"] is True
+
+    score = score_domain_infra(infra)
+    # 50 base + SPF 10 + web 15 + https 5, sin penalizar DMARC ausente
+    assert score["infra_score"] == 80
+    assert score["infra_missing"] == ["domain_age_days", "has_dmarc"]
+
+
+def _race_with(scheme, status, body=b"", final_url=None):
+    from app.verifier.http_client import FetchResult, RaceResult
+
+    async def race(domain, usable, max_bytes=None):
+        url = final_url or f"{scheme}://{domain}"
+        resp = FetchResult(url, url, status, body, False, "utf-8")
+        ok = usable(resp)
+        return RaceResult(scheme if ok else None, resp, ok, {scheme: resp})
+    return race
+
+
+def test_probe_https_valid_does_not_depend_on_the_race(monkeypatch):
+    from app.verifier import domain_probe
+    tls = []
+
+    async def tls_ok(domain):
+        tls.append(domain)
+        return True
+
+    async def tls_bad(domain):
+        tls.append(domain)
+        return False
+
+    # http gana la carrera (https cancelado): decide el handshake TLS
+    monkeypatch.setattr(domain_probe, "race_schemes", _race_with("http", 200, b"<title>Acme</title>"))
+    monkeypatch.setattr(domain_probe, "has_valid_https_async", tls_ok)
+    assert asyncio.run(domain_probe.probe_domain("acme.com")).https_valid is True
+
+    # una respuesta 5xx por https no prueba nada
+    monkeypatch.setattr(domain_probe, "race_schemes", _race_with("https", 503))
+    monkeypatch.setattr(domain_probe, "has_valid_https_async", tls_bad)
+    assert asyncio.run(domain_probe.probe_domain("acme.com")).https_valid is False
+    assert tls == ["acme.com", "acme.com"]
+
+    # https gana con 200: sin handshake extra
+    monkeypatch.setattr(domain_probe, "race_schemes", _race_with("https", 200, b"<title>Acme</title>"))
+    assert asyncio.run(domain_probe.probe_domain("acme.com")).https_valid is True
+    assert tls == ["acme.com", "acme.com"]
+
+
+def test_parking_keywords_detected_on_4xx_pages(monkeypatch):
+    from app.verifier import domain_probe
+
+    async def tls_bad(domain):
+        return False
+
+    keyword = domain_infra.WEB_PARKING_KEYWORDS[0]
+    body = f"<html><body>{keyword}</body></html>".encode()
+    monkeypatch.setattr(domain_probe, "race_schemes", _race_with("http", 404, body))
+    monkeypatch.setattr(domain_probe, "has_valid_https_async", tls_bad)
+
+    probe = asyncio.run(domain_probe.probe_domain("parked.example"))
+    assert not probe.reachable
+    assert domain_infra.web_status_from_probe(probe) == "parking"
+
+
+def test_whois_runs_on_its_own_bounded_executor(monkeypatch):
+    threads = []
+
+    def whois_lookup(domain):
+        import threading
+        threads.append(threading.current_thread().name)
+        return 100
+
+    monkeypatch.setattr(domain_infra, "get_domain_age_days", whois_lookup)
+    assert asyncio.run(domain_infra.get_domain_age_days_async("acme.com")) == 100
+    assert threads[0].startswith("whois")
+    assert domain_infra._get_whois_executor()._max_workers == domain_infra.WHOIS_THREADS
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import fakeredis.aioredis
+
+from app import worker_full
+from app.greylist_queue import GreylistQueue
+
+
+def test_due_items_are_popped_once_and_pending_counter_tracks_job():
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    async def run():
+        q = GreylistQueue(redis, key="t_retry", delays=(60, 120))
+        assert await q.schedule("job1", 0, "a@grey.example", attempt=0)
+        assert await q.schedule("job1", 1, "b@grey.example", attempt=0)
+        pending = await q.pending("job1")
+
+        not_yet = await q.pop_due(now=time.time())
+        due = await q.pop_due(now=time.time() + 61)
+        again = await q.pop_due(now=time.time() + 61)
+
+        # Segundo reintento: sigue contando como el mismo pendiente
+        a, b = sorted(due, key=lambda i: i["email"])
+        assert await q.schedule("job1", 0, "a@grey.example", attempt=1, claimed=a)
+        exhausted = await q.schedule("job1", 0, "a@grey.example", attempt=2)
+        return pending, not_yet, due, again, exhausted, await q.pending("job1"), \
+            await q.resolve("job1", claimed=b), await q.resolve("job1"), await q.size()
+
+    pending, not_yet, due, again, exhausted, still, left1, left0, size = asyncio.run(run())
+    assert pending == 2
+    assert not_yet == [] and again == []
+    assert sorted(i["email"] for i in due) == ["a@grey.example", "b@grey.example"]
+    assert all(i["job_id"] == "job1" and i["attempt"] == 0 for i in due)
+    assert exhausted is False and still == 2
+    assert (left1, left0) == (1, 0)
+    assert size == 1
+
+
+def test_worker_defers_greylisted_and_persists_after_retry(monkeypatch):
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    persisted = []
+
+    async def fake_persist(job_id, res):
+        persisted.append((job_id, res["Email Address"], res["Status"]))
+
+    monkeypatch.setattr(worker_full, "persist_result", fake_persist)
+    monkeypatch.setattr(worker_full, "update_job_processed", None)
+
+    greylisted = {"email": "a@grey.example", "status": "unknown", "score": 0,
+                  "reason": "Greylisted, retry pending", "retry": True}
+    accepted = {"email": "a@grey.example", "status": "deliverable", "score": 90, "reason": "ok"}
+
+    async def run():
+        q = GreylistQueue(redis, key="t_retry2", delays=(0,))
+        first = await worker_full.handle_result("job2", 0, "a@grey.example", greylisted, retry_queue=q)
+        pending = await q.pending("job2")
+        item, = await q.pop_due()
+        final = await worker_full.handle_result(item["job_id"], item["index"], item["email"], accepted,
+                                                attempt=item["attempt"] + 1, retry_queue=q, claimed=item)
+        return first, pending, final, await q.pending("job2"), await q.size()
+
+    first, pending, final, remaining, size = asyncio.run(run())
+    assert first is None and pending == 1
+    assert final["Status"] == "deliverable"
+    assert persisted == [("job2", "a@grey.example", "deliverable")]
+    assert remaining == 0 and size == 0
+
+
+def test_claimed_items_survive_a_crash_until_their_lease_expires():
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    async def run():
+        q = GreylistQueue(redis, key="t_retry3", delays=(0, 0), lease=30)
+        await q.schedule("job3", 0, "a@grey.example", attempt=0)
+        now = time.time()
+        claimed = await q.pop_due(now=now)
+        # El worker muere sin guardar: sigue en Redis, pero no se re-entrega antes de tiempo
+        in_flight = await q.size()
+        early = await q.pop_due(now=now + 10)
+        reclaimed = await q.pop_due(now=now + 31)
+        # El primer worker llega tarde: no descuenta; el que lo reclamó sí
+        stale = await q.resolve("job3", claimed=claimed[0])
+        final = await q.resolve("job3", claimed=reclaimed[0])
+        return claimed, in_flight, early, reclaimed, stale, final, await q.size()
+
+    claimed, in_flight, early, reclaimed, stale, final, size = asyncio.run(run())
+    assert [i["email"] for i in claimed] == ["a@grey.example"]
+    assert in_flight == 1 and early == []
+    assert [i["email"] for i in reclaimed] == ["a@grey.example"]
+    assert (stale, final, size) == (1, 0, 0)
@@ -0,0 +1,52 @@
+# Benchmark: parser incremental de <head> vs. el fingerprint anterior con BeautifulSoup.
+#   pytest tests/test_html_head_bench.py --benchmark-only
+import pytest
+from bs4 import BeautifulSoup
+from app.verifier.web_fingerprint import PARKING_KEYWORDS, _apply_html
+
+pytest.importorskip("pytest_benchmark")
+
+HEAD = (
+    "<!doctype html><html><head><meta charset='utf-8'>"
+    "<title> Acme Industrial Supplies </title>"
+    "<meta name='description' content='Valves, pumps and fittings since 1978'>"
+    "<link rel='shortcut icon' href='/favicon.ico'>"
+    "<script>window.dataLayer = [];</script></head>"
+)
+BODY = "<body>" + "<div class='row'><p>Product catalogue, quotes and support.</p></div>" * 1200 + "</body></html>"
+LEGIT_PAGE = HEAD + BODY
+PARKED_PAGE = "<html><head><title>acme.io</title></head><body><h1>Buy this domain</h1></body></html>"
+
+
+def soup_fingerprint(html: str) -> dict:
+    """Implementación anterior (árbol completo + get_text sobre todo el documento)."""
+    result = {"title": None, "meta_description": None, "has_favicon": False}
+    soup = BeautifulSoup(html, "html.parser")
+    result["title"] = soup.title.string.strip() if soup.title and soup.title.string else None
+    desc = soup.find("meta", attrs={"name": "description"})
+    if desc and desc.get("content"):
+        result["meta_description"] = desc["content"].strip()
+    if soup.find("link", rel=lambda x: x and "icon" in x.lower()):
+        result["has_favicon"] = True
+    text = soup.get_text(" ", strip=True).lower()
+    result["is_empty"] = any(k in text for k in PARKING_KEYWORDS)
+    return result
+
+
+def head_fingerprint(html: str) -> dict:
+    result = {"title": None, "meta_description": None, "has_favicon": False}
+    _apply_html(result, html)
+    return {k: result[k] for k in ("title", "meta_description", "has_favicon", "is_empty")}
+
+
+@pytest.mark.parametrize("page", [LEGIT_PAGE, PARKED_PAGE])
+def test_head_parser_matches_soup(page):
+    assert head_fingerprint(page) == soup_fingerprint(page)
+
+
+def test_bench_soup_fingerprint(benchmark):
+    benchmark(soup_fingerprint, LEGIT_PAGE)
+
+
+def test_bench_head_fingerprint(benchmark):
+    benchmark(head_fingerprint, LEGIT_PAGE)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from app.verifier import http_client
+from app.verifier.http_client import FetchResult
+
+
+def fake_fetch(delays, started, cancelled):
+    async def fetch(url, max_bytes=None):
+        scheme = url.split(":", 1)[0]
+        started.append(scheme)
+        try:
+            await asyncio.sleep(delays[scheme])
+        except asyncio.CancelledError:
+            cancelled.append(scheme)
+            raise
+        return FetchResult(url, url, 200, b"<title>x</title>", False, "utf-8")
+    return fetch
+
+
+def test_http_wins_when_https_hangs(monkeypatch):
+    started, cancelled = [], []
+    monkeypatch.setattr(http_client, "fetch_capped", fake_fetch({"https": 5, "http": 0.01}, started, cancelled))
+
+    async def run():
+        t0 = time.monotonic()
+        race = await http_client.race_schemes("acme.com", usable=lambda r: True, head_start=0.05)
+        await asyncio.sleep(0)
+        return race, time.monotonic() - t0
+
+    race, elapsed = asyncio.run(run())
+    assert race.scheme == "http" and race.usable
+    assert elapsed < 1
+    assert cancelled == ["https"]
+
+
+def test_https_within_head_start_skips_http(monkeypatch):
+    started, cancelled = [], []
+    monkeypatch.setattr(http_client, "fetch_capped", fake_fetch({"https": 0.01, "http": 0.01}, started, cancelled))
+
+    race = asyncio.run(http_client.race_schemes("acme.com", usable=lambda r: True, head_start=0.5))
+    assert race.scheme == "https"
+    assert started == ["https"]
+
+
+def test_unknown_charset_falls_back_to_utf8():
+    resp = FetchResult("https://acme.com", "https://acme.com", 200, "<title>Año</title>".encode(), False, "utf8mb4")
+    assert resp.text == "<title>Año</title>"
@@ -0,0 +1,61 @@
+import asyncio
+
+from app.domain_cache import DomainCache
+from app.verifier import rcpt_batcher as rb
+from app.verifier.domain_context import DomainContext
+from app.verifier.mx_capabilities import MXCapabilities, port_order, capabilities_from_result
+from app.verifier.smtp_verify import SMTPVerifyResult
+
+
+def _res(port, features=None, starttls=False):
+    return SMTPVerifyResult(
+        smtp_status="deliverable", code=250, message="OK", mx_host="MX.Acme.com",
+        is_catch_all=False, anti_spam=False, greylisted=False, duration_ms=1,
+        port=port, starttls=starttls, esmtp_features=features,
+    )
+
+
+def test_port_order_puts_known_port_first():
+    assert port_order(None) == (25, 587, 465)
+    assert port_order(MXCapabilities("mx.acme.com", 587)) == (587, 25, 465)
+
+
+def test_capabilities_keep_previous_features_when_session_did_not_report_them():
+    first = capabilities_from_result(_res(587, ["pipelining", "size"], starttls=True))
+    again = capabilities_from_result(_res(587), previous=first)
+
+    assert first.host == "mx.acme.com" and first.pipelining
+    assert again.esmtp_features == ["pipelining", "size"]
+    assert capabilities_from_result(_res(None)) is None
+
+
+def test_capabilities_are_shared_through_domain_cache():
+    cache = DomainCache()
+
+    async def run():
+        await DomainContext(cache=cache).record_mx_capabilities(_res(465, ["8bitmime"]))
+        return await DomainContext(cache=cache).mx_capabilities("mx.acme.com")
+
+    caps = asyncio.run(run())
+    assert caps == MXCapabilities("mx.acme.com", 465, False, ["8bitmime"])
+
+
+def test_batch_passes_port_order_and_reports_session(monkeypatch):
+    seen = {}
+
+    async def fake_batch(from_address, mx_host, emails, ports=(), session_info=None, **kwargs):
+        seen["ports"] = ports
+        session_info.update(port=587, starttls=True, esmtp_features=["pipelining"])
+        return {e: (250, "OK") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_wait=0.01)
+        return await batcher.check("a@acme.com", "mx.acme.com", known_catch_all=False,
+                                   ports=port_order(MXCapabilities("mx.acme.com", 587)))
+
+    res = asyncio.run(run())
+    assert seen["ports"] == (587, 25, 465)
+    assert res.smtp_status == "deliverable"
+    assert (res.port, res.starttls, res.esmtp_features) == (587, True, ["pipelining"])
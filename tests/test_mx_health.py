@@ -0,0 +1,159 @@
+import asyncio
+
+from app.verifier import mx_health as mh
+from app.verifier.dns_mx import MXRecord
+from app.verifier.smtp_verify import SMTPVerifyResult
+
+RECORDS = [MXRecord("mx2.acme.com", 20), MXRecord("mx1.acme.com", 10), MXRecord("mx3.acme.com", 20)]
+
+
+def _res(host, port, ms=50):
+    return SMTPVerifyResult(
+        smtp_status="deliverable" if port else "unknown", code=250 if port else 0, message="",
+        mx_host=host, is_catch_all=False, anti_spam=False, greylisted=False,
+        duration_ms=ms, port=port,
+    )
+
+
+def test_order_honours_priority_then_latency():
+    health = mh.MXHealth()
+    health.record_success("mx2.acme.com", 900)
+    health.record_success("mx3.acme.com", 100)
+    assert health.order_hosts(RECORDS) == ["mx1.acme.com", "mx3.acme.com", "mx2.acme.com"]
+
+
+def test_open_circuit_is_skipped_and_half_opens(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(mh.time, "monotonic", lambda: now[0])
+    health = mh.MXHealth(threshold=2, open_seconds=60)
+
+    for _ in range(2):
+        assert not health.record("mx1.acme.com", _res("mx1.acme.com", None))
+    assert "mx1.acme.com" not in health.order_hosts(RECORDS)
+
+    now[0] += 61
+    assert "mx1.acme.com" in health.order_hosts(RECORDS)      # prueba half-open
+    assert "mx1.acme.com" not in health.order_hosts(RECORDS)  # solo una
+
+    assert health.record("mx1.acme.com", _res("mx1.acme.com", 25))
+    assert health.order_hosts(RECORDS)[0] == "mx1.acme.com"
+
+
+def test_engine_fails_over_to_secondary_mx(monkeypatch):
+    from app import verify_engine
+    from app.verifier.domain_context import DomainContext
+
+    tried = []
+
+    class FakeBatcher:
+        async def check(self, email, mx_host, known_catch_all=None, ports=()):
+            tried.append(mx_host)
+            if mx_host == "mx1.acme.com":
+                return _res(mx_host, None, ms=4000)   # primario sin respuesta
+            return _res(mx_host, 25)
+
+    async def run():
+        ctx = DomainContext(rcpt_batcher=FakeBatcher(), mx_health=mh.MXHealth())
+        state = verify_engine.EmailState("john@acme.com", ctx)
+        state.mx_records = RECORDS
+        await verify_engine._check_smtp(state)
+        return state, ctx
+
+    state, ctx = asyncio.run(run())
+    assert tried == ["mx1.acme.com", "mx2.acme.com"]
+    assert state.smtp_res.mx_host == "mx2.acme.com"
+
+
+def test_batched_session_records_health_once(monkeypatch):
+    from app.verifier import rcpt_batcher as rb
+
+    async def failing_batch(from_address, mx_host, emails, **kwargs):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", failing_batch)
+    health = mh.MXHealth(threshold=3)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=25, max_wait=0.05, mx_health=health)
+        await asyncio.gather(*(
+            batcher.check(f"user{i}@corp{i}.example", "mx.shared.example", known_catch_all=False)
+            for i in range(10)
+        ))
+        await batcher.close()
+
+    asyncio.run(run())
+    # Una sesión fallida con 10 emails = un fallo; el circuito sigue cerrado
+    snap = health.snapshot("mx.shared.example")
+    assert snap["consecutive_failures"] == 1 and not snap["open"]
+
+
+def test_open_circuit_skips_smtp_without_web_promotion():
+    from app import verify_engine
+    from app.verifier.domain_context import DomainContext
+
+    health = mh.MXHealth(threshold=1)
+    for r in RECORDS:
+        health.record_failure(r.host)
+
+    async def run():
+        ctx = DomainContext(rcpt_batcher=object(), mx_health=health)
+        state = verify_engine.EmailState("john@acme.com", ctx)
+        state.mx_records = RECORDS
+        return await verify_engine._check_smtp(state)
+
+    res = asyncio.run(run())
+    assert res["status"] == "unknown"
+    assert res["reason"] == "MX temporarily unavailable"
+
+
+def test_raced_session_records_failure_only_for_failed_hosts(monkeypatch):
+    from app import verify_engine
+    from app.verifier.domain_context import DomainContext
+
+    async def fake_verify_async(email, mx_host, known_catch_all=None, ports=(), fallback_hosts=()):
+        res = _res("mx3.acme.com", 25)
+        res.failed_hosts = ["mx1.acme.com"]
+        return res
+
+    monkeypatch.setattr(verify_engine, "smtp_verify_async", fake_verify_async)
+
+    async def run():
+        ctx = DomainContext(mx_health=mh.MXHealth())
+        state = verify_engine.EmailState("john@acme.com", ctx)
+        hosts = ["mx1.acme.com", "mx2.acme.com", "mx3.acme.com"]
+        return await verify_engine._smtp_raced(state, hosts, None), ctx
+
+    res, ctx = asyncio.run(run())
+    assert res.mx_host == "mx3.acme.com"
+    assert ctx.mx_health.snapshot("mx1.acme.com")["consecutive_failures"] == 1
+    assert ctx.mx_health.snapshot("mx2.acme.com") is None       # nunca se intentó
+
+
+def test_greylisted_reply_returns_retry_marker():
+    from app import verify_engine
+    from app.verifier.domain_context import DomainContext
+
+    class GreyBatcher:
+        async def check(self, email, mx_host, known_catch_all=None, ports=()):
+            res = _res(mx_host, 25)
+            res.smtp_status, res.code, res.greylisted = "unknown", 451, True
+            return res
+
+    class GreyContext(DomainContext):
+        async def web(self, domain):
+            return {"has_website": True, "https": True, "title": "Acme"}
+
+    async def run(retry):
+        ctx = GreyContext(rcpt_batcher=GreyBatcher(), mx_health=mh.MXHealth())
+        state = verify_engine.EmailState("john@acme.com", ctx, retry_greylisted=retry)
+        state.mx_records = RECORDS
+        res = await verify_engine._check_smtp(state)
+        return res if res is not None else await verify_engine._check_web_promotion(state)
+
+    res = asyncio.run(run(True))
+    assert res["status"] == "unknown" and res["retry"] is True
+
+    # Sin reintentos disponibles: promoción web con motivo propio, sin marcador
+    res = asyncio.run(run(False))
+    assert res["status"] == "deliverable" and "retry" not in res
+    assert res["reason"] == "Greylisted, high probability of delivery"
@@ -0,0 +1,39 @@
+import asyncio
+import inspect
+
+from redis.asyncio import Redis
+
+from smtp_async.redis_lua import RateLimiter, TOKEN_BUCKET_LUA
+
+
+class SignatureCheckedRedis:
+    """Valida cada llamada contra la firma real de redis.asyncio.Redis."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def script_load(self, script):
+        inspect.signature(Redis.script_load).bind(self, script)
+        assert script == TOKEN_BUCKET_LUA
+        return "sha1"
+
+    async def evalsha(self, *args, **kwargs):
+        inspect.signature(Redis.evalsha).bind(self, *args, **kwargs)
+        self.calls.append((args, kwargs))
+        return self.replies.pop(0)
+
+
+def test_allow_calls_evalsha_with_redis_py_signature_keyed_by_mx():
+    redis = SignatureCheckedRedis([1, 0])
+
+    async def run():
+        rate = RateLimiter(redis)
+        await rate.load()
+        return await rate.allow("mx.google.com"), await rate.allow("mx.google.com")
+
+    first, second = asyncio.run(run())
+    assert (first, second) == (True, False)
+    args, kwargs = redis.calls[0]
+    assert kwargs == {}
+    assert args[:3] == ("sha1", 1, "bucket:mx:mx.google.com")
@@ -0,0 +1,232 @@
+import types
+import asyncio
+
+from app.verifier import rcpt_batcher as rb
+
+
+def test_same_domain_emails_share_one_batch(monkeypatch):
+    calls = []
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append((mx_host, list(emails)))
+        return {e: (250, "OK") if e.startswith("good") else (550, "no such user") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=10, max_wait=0.05)
+        return await asyncio.gather(
+            batcher.check("good1@corp.example", "mx.corp.example"),
+            batcher.check("bad@corp.example", "mx.corp.example"),
+            batcher.check("good2@corp.example", "mx.corp.example"),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert calls[0][1][:3] == ["good1@corp.example", "bad@corp.example", "good2@corp.example"]
+    assert len(calls[0][1]) == 4   # + dirección aleatoria para catch-all
+    assert [r.smtp_status for r in results] == ["deliverable", "invalid", "deliverable"]
+    assert not any(r.is_catch_all for r in results)
+
+
+def test_full_batch_flushes_without_waiting_and_detects_catch_all(monkeypatch):
+    calls = []
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append(list(emails))
+        return {e: (250, "OK") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=2, max_wait=60)
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.check("a@catchall.example", "mx.catchall.example"),
+            batcher.check("b@catchall.example", "mx.catchall.example"),
+        ), timeout=2)
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r.is_catch_all for r in results)
+
+
+def test_known_catch_all_skips_random_probe(monkeypatch):
+    calls = []
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append(list(emails))
+        return {e: (250, "OK") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=10, max_wait=0.01)
+        return await batcher.check("a@known.example", "mx.known.example", known_catch_all=True)
+
+    result = asyncio.run(run())
+
+    assert calls == [["a@known.example"]]
+    assert result.is_catch_all and not result.catch_all_checked
+
+
+def test_temporary_probe_reply_is_not_a_catch_all_verdict(monkeypatch):
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        # Greylisting: el email y la prueba aleatoria responden 451
+        return {e: (451, "4.7.1 greylisted") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=1, max_wait=0)
+        res = await batcher.check("x@grey.example", "mx.grey.example")
+        probe = await rb.probe_catch_all("grey.example", "mx.grey.example")
+        await batcher.close()
+        return res, probe
+
+    res, probe = asyncio.run(run())
+    assert res.greylisted and not res.is_catch_all
+    assert res.catch_all_checked is False     # no se cachea como "no catch-all"
+    assert probe is None
+
+
+def test_shared_batcher_coalesces_jobs_and_close_flushes(monkeypatch):
+    calls = []
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append(list(emails))
+        return {e: (250, "OK") if e.startswith("ok") else (550, "no such user") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def job(batcher, emails):
+        return await asyncio.gather(*(batcher.check(e, "mx.shared.example") for e in emails))
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=10, max_wait=60)
+        jobs = [
+            asyncio.ensure_future(job(batcher, ["ok1@shared.example", "bad@shared.example"])),
+            asyncio.ensure_future(job(batcher, ["ok1@shared.example", "ok2@shared.example"])),
+        ]
+        await asyncio.sleep(0.01)
+        # Nada ha llegado a max_batch ni a max_wait: close() envía lo pendiente
+        await batcher.close()
+        return await asyncio.gather(*jobs), batcher.stats()
+
+    (first, second), stats = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert calls[0][:3] == ["ok1@shared.example", "bad@shared.example", "ok2@shared.example"]
+    assert [r.smtp_status for r in first] == ["deliverable", "invalid"]
+    assert [r.smtp_status for r in second] == ["deliverable", "deliverable"]
+    assert stats["sessions"] == 1 and stats["pending_keys"] == 0
+
+
+def test_domains_on_same_mx_share_session_with_per_domain_catch_all(monkeypatch):
+    calls = []
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append((mx_host, list(emails)))
+        # catchall.example acepta todo; strict.example solo a "ok"
+        return {e: (250, "OK") if e.endswith("@catchall.example") or e.startswith("ok@")
+                else (550, "no such user") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=10, max_wait=0.01)
+        return await asyncio.gather(
+            batcher.check("x@catchall.example", "MX.Hosting.example"),
+            batcher.check("ok@strict.example", "mx.hosting.example"),
+            batcher.check("known@cached.example", "mx.hosting.example", known_catch_all=False),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    mx_host, rcpts = calls[0]
+    assert mx_host == "mx.hosting.example"
+    assert rcpts[:3] == ["x@catchall.example", "ok@strict.example", "known@cached.example"]
+    assert len(rcpts) == 5          # una sonda por dominio sin veredicto
+    catch_all, strict, cached = results
+    assert catch_all.is_catch_all and catch_all.catch_all_checked
+    assert not strict.is_catch_all and strict.catch_all_checked
+    assert not cached.is_catch_all and not cached.catch_all_checked
+
+
+def test_sessions_per_mx_are_capped_by_the_pool(monkeypatch):
+    monkeypatch.setattr(rb, "RCPT_MAX_SESSIONS_PER_MX", 1)
+    active = {"now": 0, "max": 0}
+
+    class FakeSession:
+        is_connected = True
+
+        async def rset(self):
+            return types.SimpleNamespace(code=250)
+
+        def close(self):
+            pass
+
+    async def fake_batch(from_address, mx_host, emails, pool=None, **kwargs):
+        async def factory(host):
+            return FakeSession()
+
+        async with pool.acquire(mx_host, factory=factory):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.02)
+            active["now"] -= 1
+        return {e: (250, "OK") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=1, max_wait=0)
+        results = await asyncio.gather(*(
+            batcher.check(f"user{i}@corp{i}.example", "mx.shared.example", known_catch_all=False)
+            for i in range(3)
+        ))
+        sessions = batcher.pool.stats()["created_total"]
+        await batcher.close()
+        return results, sessions
+
+    results, sessions = asyncio.run(run())
+    assert all(r.smtp_status == "deliverable" for r in results)
+    assert active["max"] == 1
+    assert sessions == 1        # los lotes siguientes reusan la conexión
+
+
+def test_batches_wait_for_the_mx_token_bucket(monkeypatch):
+    monkeypatch.setattr(rb, "RCPT_RATE_LIMIT_RETRY", 0)
+    calls = []
+
+    class FakeRedis:
+        def __init__(self, replies):
+            self.replies = list(replies)
+            self.keys = []
+
+        async def script_load(self, script):
+            return "sha1"
+
+        async def evalsha(self, sha, numkeys, key, *args):
+            self.keys.append(key)
+            return self.replies.pop(0)
+
+    async def fake_batch(from_address, mx_host, emails, **kwargs):
+        calls.append(list(emails))
+        return {e: (250, "OK") for e in emails}
+
+    monkeypatch.setattr(rb, "batch_rcpt_check_async", fake_batch)
+    redis = FakeRedis([0, 0, 1])
+
+    async def run():
+        batcher = rb.RcptBatcher(max_batch=1, max_wait=0, rate=rb.RateLimiter(redis))
+        result = await batcher.check("user@corp.example", "MX.Shared.example", known_catch_all=False)
+        return result, batcher.stats()
+
+    result, stats = asyncio.run(run())
+    assert result.smtp_status == "deliverable"
+    assert redis.keys == ["bucket:mx:mx.shared.example"] * 3
+    assert stats["rate_limited"] == 2
+    assert len(calls) == 1
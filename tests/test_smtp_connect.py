@@ -0,0 +1,84 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from app.verifier import smtp_connect
+
+
+def _server(greet: bool):
+    """Servidor TCP local: saluda con 220 o acepta y se queda callado (tarpit)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(5)
+    conns = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            conns.append(conn)
+            if greet:
+                conn.sendall(b"220 fast.example ESMTP\r\n")
+
+    threading.Thread(target=serve, daemon=True).start()
+    return sock, sock.getsockname()[1]
+
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_first_greeting_wins_over_silent_host():
+    slow, slow_port = _server(greet=False)
+    fast, fast_port = _server(greet=True)
+    try:
+        start = time.monotonic()
+        conn = smtp_connect.connect_first(
+            [("127.0.0.1", slow_port), ("127.0.0.1", fast_port)], timeout=3, stagger=0.1
+        )
+        elapsed = time.monotonic() - start
+        conn.server.close()
+    finally:
+        slow.close()
+        fast.close()
+
+    assert conn.port == fast_port and conn.code == 220
+    assert elapsed < 1.0     # sin esperar el timeout del primero
+
+
+def test_refused_candidate_starts_next_immediately_and_all_failed_raises():
+    fast, fast_port = _server(greet=True)
+    try:
+        conn = smtp_connect.connect_first(
+            [("127.0.0.1", _closed_port()), ("127.0.0.1", fast_port)], timeout=3, stagger=5
+        )
+        conn.server.close()
+    finally:
+        fast.close()
+    assert conn.port == fast_port
+
+    with pytest.raises(smtp_connect.SMTPConnectError):
+        smtp_connect.connect_first([("127.0.0.1", _closed_port())], timeout=1, stagger=0.1)
+
+
+def test_failed_hosts_lists_only_hosts_that_failed():
+    fast, fast_port = _server(greet=True)
+    failed = set()
+    try:
+        conn = smtp_connect.connect_first(
+            [("127.0.0.1", _closed_port()), ("localhost", fast_port), ("unused.invalid", 25)],
+            timeout=3, stagger=5, failed_hosts=failed,
+        )
+        conn.server.close()
+    finally:
+        fast.close()
+    assert conn.host == "localhost"
+    assert failed == {"127.0.0.1"}      # el no intentado no cuenta
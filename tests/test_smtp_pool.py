@@ -0,0 +1,95 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.smtp_pool import SMTPPool
+
+
+class DummyServer:
+    def __init__(self, *args, **kwargs):
+        self.alive = True
+        self.noops = 0
+        self.closed = False
+    def ehlo(self, name=None): return (250, b'OK')
+    def has_extn(self, ext): return False
+    def noop(self):
+        self.noops += 1
+        return (250, b'OK') if self.alive else (421, b'closing')
+    def quit(self): self.closed = True
+    def close(self): self.closed = True
+
+
+@patch("app.smtp_pool.smtplib.SMTP", side_effect=DummyServer)
+def test_connection_is_reused(mock_smtp):
+    pool = SMTPPool()
+    with pool.get_connection("mx.a.com") as c1:
+        pass
+    with pool.get_connection("mx.a.com") as c2:
+        assert c2 is c1
+    assert mock_smtp.call_count == 1
+    stats = pool.stats()
+    assert stats["open"] == 1 and stats["idle"] == 1 and stats["in_use"] == 0
+    assert stats["created_total"] == 1
+
+
+@patch("app.smtp_pool.smtplib.SMTP", side_effect=DummyServer)
+def test_dead_connection_fails_noop_and_is_replaced(mock_smtp):
+    pool = SMTPPool(noop_after=0)
+    with pool.get_connection("mx.a.com") as c1:
+        pass
+    c1.server.alive = False
+    with pool.get_connection("mx.a.com") as c2:
+        assert c2 is not c1
+    assert c1.server.closed
+    assert mock_smtp.call_count == 2
+
+
+@patch("app.smtp_pool.smtplib.SMTP", side_effect=DummyServer)
+def test_connection_discarded_on_exception(mock_smtp):
+    pool = SMTPPool()
+    with pytest.raises(RuntimeError):
+        with pool.get_connection("mx.a.com") as c1:
+            raise RuntimeError("boom")
+    assert c1.server.closed
+    assert pool.stats()["open"] == 0
+
+
+def test_slow_host_does_not_block_other_hosts():
+    release = threading.Event()
+
+    def factory(host=None, port=None, timeout=None):
+        if host == "mx.slow.com":
+            release.wait(2)
+        return DummyServer()
+
+    with patch("app.smtp_pool.smtplib.SMTP", side_effect=factory):
+        pool = SMTPPool()
+
+        def slow():
+            with pool.get_connection("mx.slow.com"):
+                pass
+
+        t = threading.Thread(target=slow)
+        t.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        with pool.get_connection("mx.fast.com"):
+            pass
+        assert time.monotonic() - start < 0.5
+        release.set()
+        t.join()
+
+
+@patch("app.smtp_pool.smtplib.SMTP", side_effect=DummyServer)
+def test_idle_connections_evicted_by_wheel(mock_smtp):
+    pool = SMTPPool(idle_timeout=0.2, tick=0.05)
+    with pool.get_connection("mx.a.com") as c1:
+        pass
+    deadline = time.monotonic() + 2
+    while pool.pools and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not pool.pools
+    assert c1.server.closed
+    assert pool.stats()["evicted_total"] == 1
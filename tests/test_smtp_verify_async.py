@@ -0,0 +1,205 @@
+import asyncio
+
+from app.verifier import smtp_verify_async as sva
+
+
+class FakeMX:
+    """
+    Servidor SMTP mínimo en 127.0.0.1. Responde a todo lo recibido en un
+    segmento con UNA sola escritura (como un MTA real con PIPELINING).
+    """
+
+    def __init__(self, pipelining=True, max_rcpt=None):
+        self.pipelining = pipelining
+        self.max_rcpt = max_rcpt
+        self.segments = []      # comandos recibidos por lectura
+        self.connections = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 fake.mx ESMTP\r\n")
+        in_tx = 0
+        buf = b""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            buf += data
+            *lines, buf = buf.split(b"\r\n")
+            if not lines:
+                continue
+            self.segments.append([line.split(b":")[0].split(b" ")[0] for line in lines])
+            out = b""
+            for line in lines:
+                cmd = line.upper()
+                if cmd.startswith(b"EHLO"):
+                    ext = b"250-PIPELINING\r\n" if self.pipelining else b""
+                    out += b"250-fake.mx\r\n" + ext + b"250 SIZE 1000\r\n"
+                elif cmd.startswith(b"MAIL"):
+                    in_tx = 0
+                    out += b"250 OK\r\n"
+                elif cmd.startswith(b"RCPT"):
+                    if self.max_rcpt and in_tx >= self.max_rcpt:
+                        out += b"452 4.5.3 Too many recipients\r\n"
+                    elif b"good" in line:
+                        in_tx += 1
+                        out += b"250 OK\r\n"
+                    else:
+                        in_tx += 1
+                        out += b"550 5.1.1 No such user\r\n"
+                elif cmd.startswith(b"QUIT"):
+                    writer.write(b"221 bye\r\n")
+                    await writer.drain()
+                    writer.close()
+                    return
+                else:
+                    out += b"250 OK\r\n"
+            writer.write(out)
+            await writer.drain()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_pipelined_batch_uses_one_round_trip():
+    mx = FakeMX(pipelining=True)
+
+    async def run():
+        port = await mx.start()
+        info = {}
+        emails = ["good1@acme.com", "bad@acme.com", "good2@acme.com"]
+        replies = await sva.batch_rcpt_check_async(
+            "verify@checker.com", "127.0.0.1", emails, ports=(port,), session_info=info
+        )
+        mx.server.close()
+        return replies, info
+
+    replies, info = _run(run())
+    assert [replies[e][0] for e in ("good1@acme.com", "bad@acme.com", "good2@acme.com")] == [250, 550, 250]
+    assert "pipelining" in info["esmtp_features"]
+    # MAIL + 3 RCPT en un solo segmento
+    assert [b"MAIL", b"RCPT", b"RCPT", b"RCPT"] in mx.segments
+
+
+def test_pinned_aiosmtplib_has_pipelining_internals():
+    # _PipeliningProtocol depende de internos de SMTPProtocol: al subir la
+    # versión fijada en requirements.txt hay que revisar que sigan igual
+    import aiosmtplib
+    from aiosmtplib.protocol import SMTPProtocol
+
+    assert aiosmtplib.__version__ == "5.0.0"
+    async def run():
+        return SMTPProtocol()
+
+    protocol = _run(run())
+    assert all(hasattr(protocol, attr) for attr in sva._PIPELINING_INTERNALS)
+
+
+def test_missing_internals_fall_back_to_sequential_commands(monkeypatch):
+    monkeypatch.setattr(sva, "_PIPELINING_INTERNALS", sva._PIPELINING_INTERNALS + ("_gone",))
+    mx = FakeMX(pipelining=True)
+
+    async def run():
+        port = await mx.start()
+        emails = ["good1@acme.com", "bad@acme.com"]
+        replies = await sva.batch_rcpt_check_async("verify@checker.com", "127.0.0.1", emails, ports=(port,))
+        mx.server.close()
+        return replies
+
+    replies = _run(run())
+    assert replies["good1@acme.com"][0] == 250 and replies["bad@acme.com"][0] == 550
+    assert [b"MAIL", b"RCPT", b"RCPT"] not in mx.segments
+
+
+def test_pooled_batches_reuse_one_session():
+    from smtp_async.smtp_pool import SMTPConnectionPool
+    mx = FakeMX(pipelining=True)
+
+    async def run():
+        port = await mx.start()
+        pool = SMTPConnectionPool(max_connections_per_domain=1)
+        first, second = {}, {}
+        r1 = await sva.batch_rcpt_check_async("verify@checker.com", "127.0.0.1", ["good1@acme.com"],
+                                              ports=(port,), session_info=first, pool=pool)
+        r2 = await sva.batch_rcpt_check_async("verify@checker.com", "127.0.0.1", ["bad@acme.com"],
+                                              ports=(port,), session_info=second, pool=pool)
+        await pool.close()
+        mx.server.close()
+        return r1, r2, first, second
+
+    r1, r2, first, second = _run(run())
+    assert r1["good1@acme.com"][0] == 250 and r2["bad@acme.com"][0] == 550
+    assert mx.connections == 1
+    assert first == second and "pipelining" in second["esmtp_features"]
+
+
+def test_batch_rcpt_check_succeeds_without_pipelining():
+    # Antes tests/test_smtp_batch.py::test_batch_rcpt_check_succeeds (camino síncrono)
+    mx = FakeMX(pipelining=False)
+
+    async def run():
+        port = await mx.start()
+        replies = await sva.batch_rcpt_check_async("verifier@our.com", "127.0.0.1",
+                                                   ["good@ok.com", "b@nope.com"], ports=(port,))
+        mx.server.close()
+        return replies
+
+    replies = _run(run())
+    assert replies["good@ok.com"][0] == 250
+    assert replies["b@nope.com"][0] == 550
+    assert [b"MAIL", b"RCPT", b"RCPT"] not in mx.segments     # un comando por escritura
+
+
+def test_too_many_recipients_split_without_pipelining():
+    mx = FakeMX(pipelining=False, max_rcpt=2)
+
+    async def run():
+        port = await mx.start()
+        emails = [f"good{i}@acme.com" for i in range(5)]
+        replies = await sva.batch_rcpt_check_async("verify@checker.com", "127.0.0.1", emails, ports=(port,))
+        mx.server.close()
+        return replies
+
+    replies = _run(run())
+    assert all(code == 250 for code, _ in replies.values()) and len(replies) == 5
+    assert sum(seg.count(b"MAIL") for seg in mx.segments) == 3
+
+
+def test_too_many_recipients_keeps_per_address_codes():
+    mx = FakeMX(pipelining=False, max_rcpt=2)
+    emails = ["good-a@acme.com", "good-b@acme.com", "nope-c@acme.com", "good-d@acme.com", "good-e@acme.com"]
+
+    async def run():
+        port = await mx.start()
+        replies = await sva.batch_rcpt_check_async("verify@checker.com", "127.0.0.1", emails, ports=(port,))
+        mx.server.close()
+        return replies
+
+    replies = _run(run())
+    assert [replies[e][0] for e in emails] == [250, 250, 550, 250, 250]
+    commands = [cmd for seg in mx.segments for cmd in seg if cmd in (b"MAIL", b"RCPT", b"RSET")]
+    # El RCPT rechazado con 452 se repite en la transacción siguiente
+    assert commands == [b"MAIL", b"RCPT", b"RCPT", b"RCPT", b"RSET",
+                        b"MAIL", b"RCPT", b"RCPT", b"RCPT", b"RSET",
+                        b"MAIL", b"RCPT"]
+
+
+def test_smtp_verify_async_contract():
+    mx = FakeMX(pipelining=True)
+
+    async def run():
+        port = await mx.start()
+        good = await sva.smtp_verify_async("good@acme.com", "127.0.0.1", ports=(port,))
+        bad = await sva.smtp_verify_async("nobody@acme.com", "127.0.0.1", ports=(port,), known_catch_all=False)
+        mx.server.close()
+        return good, bad
+
+    good, bad = _run(run())
+    assert good.smtp_status == "deliverable" and good.catch_all_checked and not good.is_catch_all
+    assert bad.smtp_status == "invalid" and not bad.catch_all_checked
+    assert good.port is not None and "pipelining" in good.esmtp_features
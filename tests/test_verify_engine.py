@@ -0,0 +1,81 @@
+import asyncio
+from app import verify_engine
+
+
+def test_verify_batch_keeps_input_order_and_limits_per_domain(monkeypatch):
+    in_flight = {}
+    peak = {}
+
+    async def fake_verify(email, ctx=None, retry_greylisted=False):
+        domain = email.split("@", 1)[1]
+        in_flight[domain] = in_flight.get(domain, 0) + 1
+        peak[domain] = max(peak.get(domain, 0), in_flight[domain])
+        # los emails más cortos terminan después, para desordenar la finalización
+        await asyncio.sleep(0.01 * (10 - len(email) % 10))
+        in_flight[domain] -= 1
+        return {"email": email, "status": "deliverable"}
+
+    monkeypatch.setattr(verify_engine, "verify_single_email", fake_verify)
+
+    emails = [f"user{i}@{'a' if i % 2 else 'b'}.com" for i in range(12)]
+    seen = []
+
+    async def on_result(index, res):
+        seen.append(index)
+
+    results = asyncio.run(verify_engine.verify_batch(
+        emails, concurrency=2, per_domain_concurrency=2, on_result=on_result
+    ))
+
+    assert [r["email"] for r in results] == emails
+    assert sorted(seen) == list(range(len(emails)))
+    assert peak == {"a.com": 2, "b.com": 2}
+
+
+class RecordingContext:
+    def __init__(self, mx=True):
+        self.calls = []
+        self.has_mx = mx
+
+    async def mx(self, domain):
+        self.calls.append("mx")
+        return [verify_engine.MXRecord("mx.acme.com", 10)] if self.has_mx else []
+
+    async def classification(self, domain):
+        return {"smtp_verifiable": False}
+
+    async def web(self, domain):
+        self.calls.append("web")
+        return {"has_website": True, "https": True, "title": "Acme", "is_empty": False}
+
+
+def test_cheap_checks_short_circuit_network_stages():
+    ctx = RecordingContext()
+    res = asyncio.run(verify_engine.verify_single_email("info@acme.com", ctx))
+    assert res["reason"] == "Role-based email"
+    # el MX aún puede cambiar el veredicto; web/SMTP ya no
+    assert ctx.calls == ["mx"]
+
+    ctx = RecordingContext()
+    res = asyncio.run(verify_engine.verify_single_email("no-at-sign", ctx))
+    assert res["reason"] == "Invalid syntax"
+    assert ctx.calls == []
+
+
+def test_mx_verdict_takes_precedence_over_role():
+    ctx = RecordingContext(mx=False)
+    res = asyncio.run(verify_engine.verify_single_email("info@acme.com", ctx))
+    assert res["reason"] == "Domain has no MX records"
+    assert ctx.calls == ["mx"]
+
+
+def test_web_fetch_skipped_when_mx_decides():
+    ctx = RecordingContext(mx=False)
+    res = asyncio.run(verify_engine.verify_single_email("jane@acme.com", ctx))
+    assert res["reason"] == "Domain has no MX records"
+    assert ctx.calls == ["mx"]
+
+    ctx = RecordingContext()
+    res = asyncio.run(verify_engine.verify_single_email("jane@acme.com", ctx))
+    assert res["status"] == "deliverable"
+    assert ctx.calls == ["mx", "web"]
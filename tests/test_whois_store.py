@@ -0,0 +1,64 @@
+import datetime
+from app.verifier import domain_infra
+from app.verifier.whois_store import WhoisStore, WHOIS_NO_DATE_TTL
+
+
+def test_bulk_import_and_lookup(tmp_path):
+    csv_path = tmp_path / "created.csv"
+    csv_path.write_text(
+        "domain,created\n"
+        "Acme.com,1998-04-02\n"
+        "newco.io,2024-11-30T08:15:00Z\n"
+        "broken.net,not-a-date\n"
+    )
+    store = WhoisStore(str(tmp_path / "whois.sqlite3"))
+
+    assert store.import_csv(str(csv_path)) == 2
+    assert store.count() == 2
+    assert store.get_creation_date("acme.com") == datetime.date(1998, 4, 2)
+    assert store.get_creation_date("broken.net") is None
+
+
+def test_domain_age_uses_store_before_live_whois(tmp_path, monkeypatch):
+    store = WhoisStore(str(tmp_path / "whois.sqlite3"))
+    store.put("acme.com", datetime.date(2000, 1, 1))
+
+    class NoLiveWhois:
+        @staticmethod
+        def whois(domain):
+            raise AssertionError("live WHOIS should not be called")
+
+    monkeypatch.setattr(domain_infra, "get_whois_store", lambda: store)
+    monkeypatch.setattr(domain_infra, "whois", NoLiveWhois)
+
+    expected = (datetime.datetime.utcnow().date() - datetime.date(2000, 1, 1)).days
+    assert domain_infra.get_domain_age_days("acme.com") == expected
+
+
+def test_no_date_results_are_cached_with_short_ttl(tmp_path, monkeypatch):
+    store = WhoisStore(str(tmp_path / "whois.sqlite3"))
+    calls = []
+
+    class DatelessWhois:
+        @staticmethod
+        def whois(domain):
+            calls.append(domain)
+            return type("W", (), {"creation_date": None})()
+
+    monkeypatch.setattr(domain_infra, "get_whois_store", lambda: store)
+    monkeypatch.setattr(domain_infra, "whois", DatelessWhois)
+
+    assert domain_infra.get_domain_age_days("nodate.io") is None
+    assert domain_infra.get_domain_age_days("nodate.io") is None
+    assert calls == ["nodate.io"]
+
+    # Pasado el TTL se vuelve a consultar
+    later = datetime.datetime.now().timestamp() + WHOIS_NO_DATE_TTL + 1
+    assert not store.has_recent_no_date("nodate.io", now=later)
+
+
+def test_default_path_does_not_depend_on_working_directory():
+    import os
+    from app.verifier import whois_store
+    assert os.path.isabs(whois_store.WHOIS_STORE_PATH)
+    assert whois_store.WHOIS_STORE_PATH.endswith(os.path.join("data", "whois_store.sqlite3"))